@@ -0,0 +1,47 @@
+###########
+# Imports #
+###########
+# Data
+import os
+import argparse
+import time
+from modules.data_retrieval.synthetic_instance import SIZES
+from modules.data_retrieval.synthetic_instance import generate_instance
+
+################
+# Command line #
+################
+# python generate_instance.py --size tiny --seed 1 --output instances/tiny.db
+# writes a synthetic database with the schema of final_database_master_thesis.db, which can be simulated with
+# python simulation_model.py --database instances/tiny.db
+# The knobs of a size can be overridden, e.g. --size production --n-auditors 20
+parser = argparse.ArgumentParser()
+parser.add_argument("--size", choices = SIZES.keys(), default = "tiny", help = "Preset for the number of facilities, audits, auditors and depots")
+parser.add_argument("--output", default = None, help = "Path of the database (default: instances/<size>_<seed>.db)")
+parser.add_argument("--seed", type = int, default = 0)
+parser.add_argument("--n-facilities", type = int)
+parser.add_argument("--audits-per-year", type = int)
+parser.add_argument("--n-auditors", type = int)
+parser.add_argument("--n-depots", type = int)
+parser.add_argument("--vehicles-per-depot", type = int)
+parser.add_argument("--first-year", type = int)
+parser.add_argument("--last-year", type = int)
+parser.add_argument("--duration-median", type = float, help = "Median audit duration in hours")
+parser.add_argument("--duration-sigma", type = float, help = "Spread of the log-normal audit durations")
+parser.add_argument("--max-duration", type = float, help = "Longest audit duration in hours")
+args = parser.parse_args()
+
+if __name__ == "__main__":
+    knobs = dict(SIZES[args.size])
+    for name in ["n_facilities", "audits_per_year", "n_auditors", "n_depots", "vehicles_per_depot", "first_year", "last_year",
+                 "duration_median", "duration_sigma", "max_duration"]:
+        if getattr(args, name) is not None:
+            knobs[name] = getattr(args, name)
+    output = args.output or f"instances/{args.size}_{args.seed}.db"
+    os.makedirs(os.path.dirname(output) or ".", exist_ok = True)
+
+    start_time = time.perf_counter()
+    rows = generate_instance(output, seed = args.seed, **knobs)
+    print(f"Wrote {output} in {time.perf_counter() - start_time:.1f} seconds")
+    for table, n_rows in rows.items():
+        print(f"{table:<24}{n_rows:>12}")
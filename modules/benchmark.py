@@ -0,0 +1,275 @@
+###########
+# Imports #
+###########
+# Data
+import numpy as np
+import pandas as pd
+import os
+import io
+import json
+import sqlite3
+import platform
+import subprocess
+import datetime
+from contextlib import redirect_stdout
+from contextlib import closing
+from modules.data_retrieval.simulation_context import SimulationContext
+from modules.data_retrieval.synthetic_instance import generate_instance
+from modules.simulation_state import SimulationState
+
+# Sets and parameters
+from modules.data_retrieval.retrieve_sets_params import get_audits_as_list
+from modules.data_retrieval.retrieve_sets_params import get_on_site_audits
+from modules.data_retrieval.retrieve_sets_params import get_depots
+from modules.data_retrieval.retrieve_sets_params import get_employees
+from modules.data_retrieval.retrieve_sets_params import get_due_dates
+from modules.data_retrieval.retrieve_sets_params import get_objective_val
+from modules.data_retrieval.retrieve_sets_params import get_processing_times
+from modules.data_retrieval.retrieve_sets_params import get_n_vehicles
+from modules.data_retrieval.retrieve_sets_params import get_daily_employee_capacity
+
+# Matrices
+from modules.data_retrieval.retrieve_matrices import get_auditor_depot_matrix
+from modules.data_retrieval.retrieve_matrices import get_accomplice_matrix
+from modules.data_retrieval.retrieve_matrices import get_travel_time_matrix
+
+# Dates
+from modules.utils.date_utils import convert_date_to_id
+from modules.utils.date_utils import get_day_type
+
+# Simulation
+from modules.utils.output_utils import generate_simulation_dataframe
+from modules.optimization.backends import get_backend
+
+# Timing
+import time
+
+
+##############
+# Benchmarks #
+##############
+# Every case is a day with n_audits open audits on a synthetic instance (see modules.data_retrieval.synthetic_instance)
+# with n_auditors auditors and n_depots depots. The instance is generated once with a fixed seed and kept in the instance folder.
+# The instance has AUDITS_PER_AUDIT audits a year for each audit of the day, so relax_release_dates also grows with the case.
+CASES = [{"name": "audits_10", "n_audits": 10, "n_auditors": 15, "n_depots": 5},
+         {"name": "audits_25", "n_audits": 25, "n_auditors": 30, "n_depots": 10},
+         {"name": "audits_50", "n_audits": 50, "n_auditors": 45, "n_depots": 15},
+         {"name": "audits_100", "n_audits": 100, "n_auditors": 60, "n_depots": 20}]
+AUDITS_PER_AUDIT = 40
+FACILITIES_PER_AUDIT = 40
+
+# The timed stages of a simulated day, in the order they happen in the simulation loop.
+# subtour_separation_time is the part of solve_time, which is spent finding and adding subtour cuts.
+STAGES = ["relax_release_dates_time", "travel_time_matrix_time", "accomplice_matrix_time", "build_time",
+          "solve_time", "subtour_separation_time", "state_update_time"]
+
+
+#############
+# Functions #
+#############
+def get_case_instance(case: dict, seed: int, instance_dir: str, regenerate: bool = False) -> str:
+    """
+    Returns the path of the synthetic instance of a case and generates it, if it does not exist.
+    """
+    path = os.path.join(instance_dir, f"{case['name']}_seed_{seed}.db")
+    if regenerate or not os.path.exists(path):
+        os.makedirs(instance_dir, exist_ok = True)
+        generate_instance(path,
+                          n_facilities = FACILITIES_PER_AUDIT * case["n_audits"],
+                          audits_per_year = AUDITS_PER_AUDIT * case["n_audits"],
+                          n_auditors = case["n_auditors"],
+                          n_depots = case["n_depots"],
+                          first_year = 2021,
+                          last_year = 2023,
+                          seed = seed)
+    return path
+
+
+def run_case(context: SimulationContext,
+             case: dict,
+             seed: int,
+             solver_backend: str,
+             time_limit: float,
+             repeats: int,
+             first_date: str = "2022-01-01",
+             last_date: str = "2022-12-31",
+             phi: int = 15,
+             epsilon: int = 5,
+             km_pr_hour: int = 80) -> dict:
+    """
+    Times the stages of one simulated day of a case and returns the median of each stage over the repeats,
+    together with the size and the result of the solve.
+    The day is the first workday a month after first_date, and its audits are a seeded sample of the open audits.
+    """
+    first_day = convert_date_to_id(first_date, context)
+    last_day = convert_date_to_id(last_date, context)
+    day = first_day + 30
+    while get_day_type(day, context) != "workday":
+        day += 1
+    rng = np.random.default_rng(seed)
+    sample = None
+
+    times = {stage: [] for stage in STAGES}
+    for _ in range(repeats):
+        # Relax release dates and select the audits of the day
+        start = time.perf_counter()
+        sim_audits = generate_simulation_dataframe(context, phi, epsilon, first_day, last_day)
+        times["relax_release_dates_time"].append(time.perf_counter() - start)
+        state = SimulationState(sim_audits, first_day)
+        open_audits = state.get_open_audits(day)
+        if sample is None:
+            sample = np.sort(rng.choice(len(open_audits), size = min(case["n_audits"], len(open_audits)), replace = False))
+        daily_audits = open_audits.iloc[sample]
+
+        t = day
+        O = get_on_site_audits(daily_audits)
+        V = get_audits_as_list(daily_audits)
+        L = get_depots(context)
+        E = get_employees(context)
+        d = get_due_dates(daily_audits)
+        u = get_objective_val(d, t)
+        p = {i: (5 if p_i > 8 else p_i) for i, p_i in get_processing_times(daily_audits).items()} # Multi-day audits are split
+        q = get_daily_employee_capacity(day, context)
+        K = get_n_vehicles(day, context, 6, 18)
+        b = get_auditor_depot_matrix(context)
+
+        # Matrices (the travel times are computed again in every repeat, not read from the rows cached by the previous repeat)
+        context.travel_times.computed[:] = False
+        start = time.perf_counter()
+        c = get_travel_time_matrix(daily_audits, L, context, km_pr_hour)
+        times["travel_time_matrix_time"].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        g = get_accomplice_matrix(daily_audits, context)
+        times["accomplice_matrix_time"].append(time.perf_counter() - start)
+
+        # Build and solve (the backends print their progress, which is not part of the benchmark)
+        backend = get_backend(solver_backend, solve_policy = {"time_limit": time_limit, "no_rel_heur_time": 0})
+        with redirect_stdout(io.StringIO()), closing(backend):
+            start = time.perf_counter()
+            backend.build(day, t, V, O, L, E, p, c, g, q, K, d, u, b)
+            times["build_time"].append(time.perf_counter() - start)
+            start = time.perf_counter()
+            termination = backend.solve()
+            times["solve_time"].append(time.perf_counter() - start)
+            route_dict, audit_dict = backend.get_solution()
+        stats = backend.get_solve_stats()
+        times["subtour_separation_time"].append(stats["callback_time"] or 0.0)
+
+        # Schedule the solution and select the audits of the next day
+        start = time.perf_counter()
+        for auditor, audits in audit_dict.items():
+            for i in audits:
+                state.schedule(i, day, auditor)
+        state.get_open_audits(day + 1)
+        times["state_update_time"].append(time.perf_counter() - start)
+
+    return {**{stage: float(np.median(values)) for stage, values in times.items()},
+            "n_audits": len(V),
+            "n_on_site_audits": len(O),
+            "n_auditors": len(E),
+            "n_depots": len(L),
+            "n_scheduled": sum(len(audits) for audits in audit_dict.values()),
+            "termination": termination,
+            "status": stats["status"],
+            "num_vars": stats["num_vars"],
+            "num_constrs": stats["num_constrs"],
+            "lazy_cuts": stats["lazy_cuts"],
+            "obj_val": stats["obj_val"]}
+
+
+def get_git_commit() -> str:
+    """
+    Returns the current git commit (None outside a git repository).
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output = True, text = True, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(cases: list[dict] = CASES,
+                  seed: int = 0,
+                  solver_backend: str = "highs",
+                  time_limit: float = 10,
+                  repeats: int = 3,
+                  instance_dir: str = "outputs/benchmarks/instances",
+                  regenerate: bool = False,
+                  label: str = None) -> dict:
+    """
+    Runs every case and returns the run: its settings, the git commit and the results of each case.
+    The default backend is HiGHS, since the larger cases do not fit in the size-limited Gurobi license.
+    """
+    results = {}
+    for case in cases:
+        path = get_case_instance(case, seed, instance_dir, regenerate)
+        con = sqlite3.connect(path)
+        context = SimulationContext(con)
+        con.close()
+        print(f"Running {case['name']}")
+        results[case["name"]] = run_case(context, case, seed, solver_backend, time_limit, repeats)
+    return {"label": label,
+            "timestamp": datetime.datetime.now().isoformat(timespec = "seconds"),
+            "git_commit": get_git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.node(),
+            "solver_backend": solver_backend,
+            "time_limit": time_limit,
+            "repeats": repeats,
+            "seed": seed,
+            "results": results}
+
+
+def load_history(path: str) -> list[dict]:
+    """
+    Returns the runs in a JSON history file (an empty list if it does not exist).
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path) as fp:
+        return json.load(fp)
+
+
+def append_history(path: str, run: dict):
+    """
+    Appends a run to a JSON history file.
+    """
+    history = load_history(path)
+    history.append(run)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok = True)
+    with open(path, "w") as fp:
+        json.dump(history, fp, indent = 2)
+
+
+def find_run(history: list[dict], key: str) -> dict:
+    """
+    Returns a run from the history by its label or by its position (e.g. "-1" for the last run).
+    The last run with the label is used, if more runs have the same label.
+    """
+    for run in reversed(history):
+        if run["label"] == key:
+            return run
+    try:
+        return history[int(key)]
+    except (ValueError, IndexError):
+        raise ValueError(f"No run with the label or position {key} in the history")
+
+
+def compare_runs(baseline: dict, current: dict, threshold: float = 0.2, min_seconds: float = 0.005) -> pd.DataFrame:
+    """
+    Compares the stage times of the cases in both runs. A stage is flagged as slower if it takes more than
+    threshold (relative) and more than min_seconds (absolute, to ignore timer noise) longer than in the baseline.
+    """
+    rows = []
+    for case, results in current["results"].items():
+        if case not in baseline["results"]:
+            continue
+        for stage in STAGES:
+            before, after = baseline["results"][case][stage], results[stage]
+            ratio = after / before if before > 0 else np.inf if after > 0 else 1.0
+            rows.append({"case": case,
+                         "stage": stage,
+                         "baseline": before,
+                         "current": after,
+                         "ratio": ratio,
+                         "slower": bool(after > before * (1 + threshold) and after - before > min_seconds)})
+    return pd.DataFrame(rows)
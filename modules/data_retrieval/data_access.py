@@ -0,0 +1,71 @@
+###########
+# Imports #
+###########
+# Data retrieval
+import pandas as pd
+import sqlite3
+from contextlib import closing
+
+
+###########
+# Indexes #
+###########
+# The lookups by date and time slot, which are not covered by a primary key: (index name, table, column)
+INDEXES = [("time_slots_date_id", "time_slots", "date_id"),
+           ("employee_availability_time_slot_id", "employee_availability", "time_slot_id"),
+           ("vehicle_availability_time_slot_id", "vehicle_availability", "time_slot_id")]
+
+
+#############
+# Functions #
+#############
+def create_indexes(con: sqlite3.Connection) -> bool:
+    """
+    Creates the indexes in INDEXES, if they do not exist, so the availability of a day is found with index seeks.
+    Returns False if the database is read-only.
+    """
+    try:
+        with closing(con.cursor()) as cur:
+            for name, table, column in INDEXES:
+                cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table}({column})")
+        con.commit()
+    except sqlite3.OperationalError as error:
+        print(f"The indexes were not created: {error}")
+        return False
+    return True
+
+
+def fetch_all(con: sqlite3.Connection, sql: str, params: tuple = ()) -> list[tuple]:
+    """
+    Runs a query with bound parameters and returns all rows.
+    The SQL text is the same for every call, so sqlite3 reuses the prepared statement.
+    """
+    with closing(con.cursor()) as cur:
+        return cur.execute(sql, params).fetchall()
+
+
+def fetch_one(con: sqlite3.Connection, sql: str, params: tuple = ()) -> tuple:
+    """
+    Runs a query with bound parameters and returns the first row (None if there is no row).
+    """
+    with closing(con.cursor()) as cur:
+        return cur.execute(sql, params).fetchone()
+
+
+def read_sql_in(con: sqlite3.Connection, sql: str, values: list[int], params: tuple = ()) -> pd.DataFrame:
+    """
+    Runs a query with an IN-list and returns a dataframe. The values are written to the temporary table in_values
+    with executemany, and the query refers to them as (SELECT value FROM temp.in_values).
+    This works for any number of values (also one or none) and uses the index on the column.
+    """
+    in_transaction = con.in_transaction
+    with closing(con.cursor()) as cur:
+        cur.execute("CREATE TEMP TABLE IF NOT EXISTS in_values(value INTEGER PRIMARY KEY)")
+        cur.execute("DELETE FROM temp.in_values")
+        cur.executemany("INSERT OR IGNORE INTO temp.in_values VALUES (?)", [(int(value),) for value in values])
+    try:
+        return pd.read_sql(sql, con, params = params)
+    finally:
+        # Only the temporary table was written, so the transaction is ended unless the caller had one open
+        if not in_transaction:
+            con.commit()
@@ -3,9 +3,11 @@
 ##########
 # Data retrieval and wrangling
 import pandas as pd
+import numpy as np
 import modules.data_retrieval.retrieve_sets_params as get_sets_params
 import sqlite3
 from contextlib import closing
+from modules.data_retrieval.simulation_context import SimulationContext
 
 # Travel time matrix
 from sklearn.metrics.pairwise import haversine_distances
@@ -17,10 +19,13 @@ import modules.utils.utils as utils
 # Functions #
 #############
 
-def get_auditor_depot_matrix(con: sqlite3.Connection) -> dict[int, dict[int, int]]:
+def get_auditor_depot_matrix(con: sqlite3.Connection | SimulationContext) -> dict[int, dict[int, int]]:
     """
     Returns the auditor-depot matrix.
     """
+    if isinstance(con, SimulationContext):
+        return con.get_auditor_depot_matrix()
+
     with closing(con.cursor()) as cur:
         employee_depots = cur.execute("""SELECT
                                             facilities.ID AS facility_id,
@@ -43,12 +48,18 @@ def get_auditor_depot_matrix(con: sqlite3.Connection) -> dict[int, dict[int, int
 
 def get_travel_time_matrix(audits: pd.DataFrame,
                         depots: list[int],
-                        con: sqlite3.Connection,
+                        con: sqlite3.Connection | SimulationContext,
                         km_pr_hour: int = 80) -> dict[dict[float]]:
     """
     Returns the travel-time matrix.
+    With a SimulationContext the travel times are sliced from its TravelTimeStore instead of being recomputed.
     """
     physical_audits = audits[audits["on_site_audit"] == 1]
+    if isinstance(con, SimulationContext):
+        ids = [*depots, *physical_audits["ID"]]
+        travel_times = con.travel_times.get_travel_times([*depots, *physical_audits["facility_id"]], km_pr_hour).tolist()
+        return {id_1: dict(zip(ids, row)) for id_1, row in zip(ids, travel_times)}
+
     locations = []
     for depot in depots:
         for _, coords in utils.get_lat_long(con, depot).items():
@@ -70,29 +81,57 @@ def get_travel_time_matrix(audits: pd.DataFrame,
     return distance_matrix
 
 
+def get_skill_matrix(employees_tbl: pd.DataFrame,
+                     skills_tbl: pd.DataFrame) -> tuple[np.ndarray, dict[int, int]]:
+    """
+    Returns the skill levels as an (employee x audit type) array and a dictionary from audit type ID to column.
+    The rows follow the order of the employee table. Missing skills are NaN, so they never meet a requirement.
+    If a skill is listed more than once, the first row is used.
+    """
+    employee_index = {empl: n for n, empl in enumerate(employees_tbl["ID"].astype(int).to_list())}
+    skills = skills_tbl.drop_duplicates(subset = ["employee_id", "audit_type_id"], keep = "first")
+    skills = skills[skills["employee_id"].astype(int).isin(employee_index.keys())]
+    audit_types = sorted(skills["audit_type_id"].astype(int).unique().tolist())
+    audit_type_index = {audit_type: n for n, audit_type in enumerate(audit_types)}
+
+    skill_matrix = np.full((len(employee_index), len(audit_types)), np.nan)
+    rows = skills["employee_id"].astype(int).map(employee_index).to_numpy()
+    cols = skills["audit_type_id"].astype(int).map(audit_type_index).to_numpy()
+    skill_matrix[rows, cols] = skills["skill_level"].to_numpy(dtype = float)
+    return skill_matrix, audit_type_index
+
+
+def get_accomplice_array(audits: pd.DataFrame,
+                         con: sqlite3.Connection | SimulationContext) -> tuple[np.ndarray, list[int]]:
+    """
+    Returns the accomplice matrix as an (employee x audit) array of zeros and ones, and the employee IDs of the rows.
+    The columns follow the order of the audits.
+    """
+    if isinstance(con, SimulationContext):
+        employees = con.employees_tbl["ID"].to_list()
+        skill_matrix, audit_type_index = con.skill_matrix, con.audit_type_index
+    else:
+        employees_tbl = pd.read_sql("SELECT * FROM employees", con)
+        employees = employees_tbl["ID"].to_list()
+        skill_matrix, audit_type_index = get_skill_matrix(employees_tbl,
+                                                          pd.read_sql("SELECT * FROM skills", con))
+
+    # Audit types, which no employee has a skill for, get a column of NaN
+    skill_matrix = np.hstack([skill_matrix, np.full((len(employees), 1), np.nan)])
+    cols = np.array([audit_type_index.get(int(audit_type), -1) for audit_type in audits["audit_type_id"]], dtype = np.int64)
+    required = audits["required_skill_level"].to_numpy(dtype = float)
+    accomplice_array = (skill_matrix[:, cols] >= required).astype(np.int8)
+    return accomplice_array, employees
+
+
 def get_accomplice_matrix(audits: pd.DataFrame,
-                          con: sqlite3.Connection) -> dict[int, dict[int, int]]:
+                          con: sqlite3.Connection | SimulationContext) -> dict[int, dict[int, int]]:
     """
     Returns the accomplice matrix
     """
-    employees_tbl = pd.read_sql("SELECT * FROM employees", con)
-    skills_tbl = pd.read_sql("SELECT * FROM skills", con)
-
-    employees = employees_tbl["ID"].to_list()
+    accomplice_array, employees = get_accomplice_array(audits, con)
+    audit_ids = audits["ID"].to_list()
     accomplice_matrix = {}
-
-    for empl in employees:
-        accomplice_matrix[empl] = {}
-
-    for i, row in audits.iterrows():
-        audit_id = row["ID"]
-        audit_type = row["audit_type_id"]
-        skill_req = row["required_skill_level"]
-        for empl in employees:
-            accomplice_matrix[empl][audit_id] = []
-            skill_level = skills_tbl[(skills_tbl["employee_id"].astype(int) == int(empl)) & (skills_tbl["audit_type_id"].astype(int) == int(audit_type))]["skill_level"].to_list()[0]
-            if skill_level >= skill_req:
-                accomplice_matrix[empl][audit_id] = 1
-            else:
-                accomplice_matrix[empl][audit_id] = 0
-    return accomplice_matrix
\ No newline at end of file
+    for empl, row in zip(employees, accomplice_array.tolist()):
+        accomplice_matrix[empl] = dict(zip(audit_ids, row))
+    return accomplice_matrix
@@ -10,6 +10,32 @@ from contextlib import closing
 # Dates
 import modules.utils.date_utils as date_utils
 
+# Preloaded data
+from modules.data_retrieval.simulation_context import SimulationContext
+
+# Parameterized queries
+from modules.data_retrieval.data_access import read_sql_in
+
+# Audits which are not part of the simulation: Bornholm (zip codes 3700-3799) and Greenland (audit type 9)
+BORNHOLM_ZIP_CODES = (3700, 3799)
+GREENLAND_AUDIT_TYPE = 9
+
+# Columns of the simulation dataframe and their dtypes.
+# duration stays float64, since the simulation subtracts the hours of multi-day audits from it.
+SIMULATION_DTYPES = {"ID": "int32",
+                     "facility_id": "int32",
+                     "release_date_id": "int32",
+                     "audit_date_id": "int32",
+                     "due_date_id": "int32",
+                     "duration": "float64",
+                     "audit_type_id": "int16",
+                     "required_skill_level": "int8",
+                     "priority_before_audit": "int8",
+                     "employee_id": "float64",
+                     "lat": "float32",
+                     "long": "float32",
+                     "on_site_audit": "int8"}
+
 ########################
 # Auxilliary functions #
 ########################
@@ -18,7 +44,8 @@ import modules.utils.date_utils as date_utils
 
 def get_all_audits(con: sqlite3.Connection) -> pd.DataFrame:
     """ 
-    Returns a dataframe containing all audits and geographic information
+    Returns a dataframe containing all audits and geographic information.
+    The simulation uses get_simulation_audits, which only loads the columns and rows it needs.
     """
     return pd.read_sql("""SELECT
                                 all_tasks.ID,
@@ -41,6 +68,55 @@ def get_all_audits(con: sqlite3.Connection) -> pd.DataFrame:
                            """, con)
 
 
+def get_simulation_audits(con: sqlite3.Connection | SimulationContext,
+                          first_day: int = None,
+                          last_day: int = None) -> pd.DataFrame:
+    """
+    Returns the audits of the simulation with compact dtypes (see SIMULATION_DTYPES).
+    Bornholm and Greenland are removed in the query, and only the columns used by the simulation are selected.
+    If first_day and last_day are given, only the audits released between them are returned
+    (audits released before the first day or after the last day are never scheduled).
+    The audits are not scheduled yet, so audit_date_id is -1 and employee_id is NaN.
+    A SimulationContext without preloaded audits reads them from its database file.
+    """
+    if isinstance(con, SimulationContext) and con.simulation_audits is None:
+        if con.database_path == "":
+            raise ValueError("The audits of an in-memory database must be preloaded")
+        with closing(sqlite3.connect(con.database_path)) as database:
+            return get_simulation_audits(database, first_day, last_day)
+
+    if isinstance(con, SimulationContext):
+        audits = con.simulation_audits
+        if first_day is not None and last_day is not None:
+            audits = audits[(audits["release_date_id"] >= first_day) & (audits["release_date_id"] <= last_day)]
+        return audits.copy()
+
+    query = """SELECT
+                    all_tasks.ID,
+                    all_tasks.facility_id,
+                    all_tasks.release_date_id,
+                    -1 AS audit_date_id,
+                    all_tasks.due_date_id,
+                    all_tasks.duration,
+                    all_tasks.audit_type_id,
+                    all_tasks.required_skill_level,
+                    all_tasks.priority_before_audit,
+                    NULL AS employee_id,
+                    facilities.lat,
+                    facilities.long,
+                    audit_types.on_site_audit
+               FROM all_tasks
+               INNER JOIN audit_types ON all_tasks.audit_type_id = audit_types.ID
+               INNER JOIN facilities ON all_tasks.facility_id = facilities.ID
+               WHERE (facilities.zip_code IS NULL OR facilities.zip_code NOT BETWEEN ? AND ?)
+               AND all_tasks.audit_type_id != ?"""
+    params = (*BORNHOLM_ZIP_CODES, GREENLAND_AUDIT_TYPE)
+    if first_day is not None and last_day is not None:
+        query += " AND all_tasks.release_date_id BETWEEN ? AND ?"
+        params += (first_day, last_day)
+    return pd.read_sql(query, con, params = params).astype(SIMULATION_DTYPES)
+
+
 def get_daily_audits(date: str,
                     con: sqlite3.Connection,
                     task_tbl: pd.DataFrame) -> pd.DataFrame:
@@ -55,16 +131,19 @@ def get_daily_audits(date: str,
 # ----- Returns dictionaries -----
 
 def get_daily_vehicle_capacity(date_id: int,
-                               con: sqlite3.Connection,
+                               con: sqlite3.Connection | SimulationContext,
                                start_hour: int = 7,
                                end_hour: int = 17) -> pd.DataFrame:
-    time_slots = date_utils.get_date_time_slots(date_id, con)
     """
     Returns a dictionary that stores how many time slots a vehicle is available between a start hour and an end hour
     """
+    if isinstance(con, SimulationContext):
+        return con.get_daily_vehicle_capacity(date_id, start_hour, end_hour)
+
+    time_slots = date_utils.get_date_time_slots(date_id, con)
     time_slot_range = [time_slots[i] for i in range(start_hour, end_hour)]
 
-    availability = pd.read_sql(f"SELECT * FROM vehicle_availability WHERE time_slot_id in {tuple(time_slot_range)}", con)
+    availability = read_sql_in(con, "SELECT * FROM vehicle_availability WHERE time_slot_id IN (SELECT value FROM temp.in_values)", time_slot_range)
     availability = availability.groupby("vehicle_id", as_index=False)["available"].sum()
     vehicles = availability["vehicle_id"].to_list()
     capacity = availability["available"].to_list()
@@ -76,10 +155,13 @@ def get_daily_vehicle_capacity(date_id: int,
     return return_dict
 
 
-def get_depots_and_vehicles(con: sqlite3.Connection) -> dict[int, list[int]]:
+def get_depots_and_vehicles(con: sqlite3.Connection | SimulationContext) -> dict[int, list[int]]:
     """
     Returns a dictionary containing a list of all vehicles associated with a depot.
     """
+    if isinstance(con, SimulationContext):
+        return con.get_depots_and_vehicles()
+
     with closing(con.cursor()) as cur:
         vehicle_depots = cur.execute("""SELECT
                                             facilities.ID AS facility_id,
@@ -99,28 +181,37 @@ def get_depots_and_vehicles(con: sqlite3.Connection) -> dict[int, list[int]]:
 ################################
 
 # ----- Sets -----
-def get_employees(con:sqlite3.Connection) -> list[int]:
+def get_employees(con: sqlite3.Connection | SimulationContext) -> list[int]:
     """
     Returns a list of auditors, which represent E
     """
+    if isinstance(con, SimulationContext):
+        return list(con.employees)
+
     with closing(con.cursor()) as cur:
         employees = cur.execute("SELECT ID FROM employees").fetchall()
     return [em[0] for em in employees]
 
 
-def get_vehicles(con:sqlite3.Connection) -> list[int]:
+def get_vehicles(con: sqlite3.Connection | SimulationContext) -> list[int]:
     """
     Returns a list of vehicles
     """
+    if isinstance(con, SimulationContext):
+        return list(con.vehicles)
+
     with closing(con.cursor()) as cur:
         vehicles = cur.execute("SELECT ID FROM vehicles").fetchall()
     return [vehicle[0] for vehicle in vehicles]
 
 
-def get_depots(con: sqlite3.Connection) -> list[int]:
+def get_depots(con: sqlite3.Connection | SimulationContext) -> list[int]:
     """
     Returns a list of depots, which represents L
     """
+    if isinstance(con, SimulationContext):
+        return list(con.depots)
+
     with closing(con.cursor()) as cur:
         depots = cur.execute("""SELECT
                                     facilities.ID AS facility_id
@@ -171,12 +262,15 @@ def get_due_dates(audits: pd.DataFrame) -> dict[int, int]:
 
 
 def get_daily_employee_capacity(date_id: str,
-                                con: sqlite3.Connection) -> pd.DataFrame:
+                                con: sqlite3.Connection | SimulationContext) -> pd.DataFrame:
     """
     Returns a dictionary of daily auditor capacities, which represent q_e
     """
+    if isinstance(con, SimulationContext):
+        return con.get_daily_employee_capacity(date_id)
+
     time_slots = date_utils.get_date_time_slots(date_id, con)
-    availability = pd.read_sql(f"SELECT * FROM employee_availability WHERE time_slot_id in {tuple(time_slots)}", con)
+    availability = read_sql_in(con, "SELECT * FROM employee_availability WHERE time_slot_id IN (SELECT value FROM temp.in_values)", time_slots)
     
     availability = availability.groupby("employee_id", as_index=False)["available"].sum()
     employees = availability["employee_id"].to_list()
@@ -200,7 +294,7 @@ def get_objective_val(due_dates: list[int], t: int) -> dict[int, int]:
 
 
 def get_n_vehicles(date_id: int,
-                   con: sqlite3.Connection,
+                   con: sqlite3.Connection | SimulationContext,
                    start_hour: int = 6,
                    end_hour: int = 18) -> dict[int, int]:
     """
@@ -0,0 +1,220 @@
+###########
+# Imports #
+###########
+# Data retrieval and wrangling
+import numpy as np
+import pandas as pd
+import sqlite3
+from contextlib import closing
+from modules.data_retrieval.travel_times import TravelTimeStore
+
+
+###########
+# Classes #
+###########
+class SimulationContext:
+    """
+    Loads the calendar, time-slot, availability, depot, employee, skill and audit tables once and keeps them in memory.
+    Availability is stored in NumPy arrays indexed by date and time-slot, so daily lookups do not query the database.
+    The context can be passed instead of a connection to the functions in modules.data_retrieval and modules.utils.
+    It does not hold the connection, so it can be shared with worker processes.
+    Distances between facilities are kept in a TravelTimeStore, which can be cached on disk with travel_time_cache.
+    With preload_audits = False the audits are not kept in memory, but read from the database file when they are needed.
+    """
+    def __init__(self, con: sqlite3.Connection, travel_time_cache: str = None, preload_audits: bool = True):
+        self._load_dates(con)
+        self._load_time_slots(con)
+        self._load_employees_and_depots(con)
+        self._load_vehicles(con)
+        self.employee_availability = self._load_availability(con, "employee_availability", "employee_id", self.employees)
+        self.vehicle_availability = self._load_availability(con, "vehicle_availability", "vehicle_id", self.vehicles)
+        self._load_audits_and_skills(con, preload_audits)
+        self.travel_times = TravelTimeStore(self.facility_locations, travel_time_cache)
+
+    # ----- Loading -----
+    def _load_dates(self, con: sqlite3.Connection):
+        """
+        Loads the dates table into arrays, which are indexed by the position of the date ID.
+        """
+        with closing(con.cursor()) as cur:
+            dates = cur.execute("SELECT ID, date, day_type FROM dates ORDER BY ID").fetchall()
+        self.date_ids = np.array([date[0] for date in dates], dtype=np.int64)
+        self.dates = np.array([date[1] for date in dates], dtype=object)
+        self.day_types = np.array([date[2] for date in dates], dtype=object)
+
+        # Date ID -> array position (-1 if the ID is not in the dates table)
+        self.first_date_id = int(self.date_ids[0])
+        self._date_pos = np.full(int(self.date_ids[-1]) - self.first_date_id + 1, -1, dtype=np.int64)
+        self._date_pos[self.date_ids - self.first_date_id] = np.arange(len(self.date_ids))
+
+        # Dictionaries and the holiday prefix sum of modules.utils.date_utils (imported here, because date_utils imports the context)
+        from modules.utils.date_utils import DateCalendar
+        self.calendar = DateCalendar(self.date_ids, self.dates, self.day_types)
+
+
+    def _load_time_slots(self, con: sqlite3.Connection):
+        """
+        Loads the time slots into a (date x slot) array. Slots are ordered by ID within each date, and missing slots are -1.
+        """
+        with closing(con.cursor()) as cur:
+            slots = np.array(cur.execute("SELECT ID, date_id FROM time_slots ORDER BY date_id, ID").fetchall(), dtype=np.int64).reshape(-1, 2)
+        slot_ids, slot_dates = slots[:, 0], self._positions(slots[:, 1])
+
+        # Position of each slot within its date
+        date_starts = np.searchsorted(slot_dates, slot_dates, side="left")
+        slot_hours = np.arange(len(slot_ids)) - date_starts
+        n_slots = int(slot_hours.max()) + 1 if len(slot_hours) > 0 else 0
+
+        self.time_slots = np.full((len(self.date_ids), n_slots), -1, dtype=np.int64)
+        self.time_slots[slot_dates, slot_hours] = slot_ids
+
+        # Slot ID -> (date position, slot position)
+        order = np.argsort(slot_ids)
+        self._slot_ids = slot_ids[order]
+        self._slot_dates = slot_dates[order]
+        self._slot_hours = slot_hours[order]
+
+
+    def _load_employees_and_depots(self, con: sqlite3.Connection):
+        """
+        Loads the employees, the depots and the auditor-depot matrix.
+        """
+        with closing(con.cursor()) as cur:
+            self.employees = [em[0] for em in cur.execute("SELECT ID FROM employees").fetchall()]
+            self.depots = [depot[0] for depot in cur.execute("""SELECT
+                                                                    facilities.ID AS facility_id
+                                                                FROM facilities
+                                                                WHERE facilities.facility_type_id = 15""").fetchall()]
+            self.employee_depots = cur.execute("""SELECT
+                                                    facilities.ID AS facility_id,
+                                                    employees.ID AS employee_id
+                                                FROM facilities
+                                                INNER JOIN employees ON facilities.ID = employees.depot_id""").fetchall()
+
+
+    def _load_vehicles(self, con: sqlite3.Connection):
+        """
+        Loads the vehicles and the depot they belong to.
+        """
+        with closing(con.cursor()) as cur:
+            self.vehicles = [vehicle[0] for vehicle in cur.execute("SELECT ID FROM vehicles").fetchall()]
+            self.vehicle_depots = cur.execute("""SELECT
+                                                    facilities.ID AS facility_id,
+                                                    vehicles.ID AS vehicle_id
+                                                FROM facilities
+                                                INNER JOIN vehicles ON facilities.ID = vehicles.depot_id""").fetchall()
+
+
+    def _load_audits_and_skills(self, con: sqlite3.Connection, preload_audits: bool = True):
+        """
+        Loads the audits of the simulation (see get_simulation_audits), the employee and skill tables, the (employee x audit type) skill matrix and the coordinates of all facilities.
+        """
+        # Imported here, since both modules import this module
+        import modules.data_retrieval.retrieve_sets_params as get_sets_params
+        from modules.data_retrieval.retrieve_matrices import get_skill_matrix
+        self.simulation_audits = get_sets_params.get_simulation_audits(con) if preload_audits else None
+        self.employees_tbl = pd.read_sql("SELECT * FROM employees", con)
+        self.skills_tbl = pd.read_sql("SELECT * FROM skills", con)
+        self.skill_matrix, self.audit_type_index = get_skill_matrix(self.employees_tbl, self.skills_tbl)
+        with closing(con.cursor()) as cur:
+            facilities = cur.execute("SELECT ID, lat, long FROM facilities").fetchall()
+            self.database_path = [path for _, name, path in cur.execute("PRAGMA database_list").fetchall() if name == "main"][0]
+        self.facility_locations = {}
+        for facility_id, lat, long in facilities:
+            self.facility_locations[facility_id] = [long, lat]
+
+
+    def _load_availability(self,
+                           con: sqlite3.Connection,
+                           table: str,
+                           id_column: str,
+                           ids: list[int]) -> np.ndarray:
+        """
+        Loads an availability table into a (date x slot x resource) array.
+        """
+        availability = pd.read_sql(f"SELECT {id_column}, time_slot_id, available FROM {table}", con)
+        resource_pos = pd.Series(np.arange(len(ids)), index=ids)
+        slot_pos = np.searchsorted(self._slot_ids, availability["time_slot_id"].to_numpy())
+
+        array = np.zeros((*self.time_slots.shape, len(ids)), dtype=np.int16)
+        np.add.at(array,
+                  (self._slot_dates[slot_pos],
+                   self._slot_hours[slot_pos],
+                   resource_pos.loc[availability[id_column]].to_numpy()),
+                  availability["available"].to_numpy().astype(np.int16))
+        return array
+
+
+    def _positions(self, date_ids: np.ndarray) -> np.ndarray:
+        """
+        Converts an array of date IDs into array positions.
+        """
+        return self._date_pos[np.asarray(date_ids) - self.first_date_id]
+
+
+    def _position(self, date_id: int) -> int:
+        """
+        Converts a date ID into an array position.
+        """
+        pos = date_id - self.first_date_id
+        if pos < 0 or pos >= len(self._date_pos) or self._date_pos[pos] < 0:
+            raise KeyError(f"Date ID {date_id} is not in the dates table")
+        return int(self._date_pos[pos])
+
+    # ----- Lookups -----
+    def get_day_type(self, date_id: int) -> str:
+        """
+        Takes a date ID and returns a string representing the day type.
+        """
+        return self.day_types[self._position(date_id)]
+
+
+    def get_date_time_slots(self, date_id: int) -> list[int]:
+        """
+        Takes a date ID and returns a list of integers representing the IDs of the time-slots associated with that date.
+        """
+        time_slots = self.time_slots[self._position(date_id)]
+        return time_slots[time_slots >= 0].tolist()
+
+
+    def get_daily_employee_capacity(self, date_id: int) -> dict[int, int]:
+        """
+        Returns a dictionary of daily auditor capacities, which represent q_e
+        """
+        capacity = self.employee_availability[self._position(date_id)].sum(axis=0)
+        return dict(zip(self.employees, capacity.tolist()))
+
+
+    def get_daily_vehicle_capacity(self, date_id: int, start_hour: int, end_hour: int) -> dict[int, int]:
+        """
+        Returns a dictionary that stores how many time slots a vehicle is available between a start hour and an end hour
+        """
+        capacity = self.vehicle_availability[self._position(date_id), start_hour:end_hour].sum(axis=0)
+        return dict(zip(self.vehicles, capacity.tolist()))
+
+
+    def get_depots_and_vehicles(self) -> dict[int, list[int]]:
+        """
+        Returns a dictionary containing a list of all vehicles associated with a depot.
+        """
+        return_dict = {}
+        for depot, _ in self.vehicle_depots:
+            return_dict[depot] = []
+
+        for depot, vehicle in self.vehicle_depots:
+            return_dict[depot].append(vehicle)
+        return return_dict
+
+
+    def get_auditor_depot_matrix(self) -> dict[int, dict[int, int]]:
+        """
+        Returns the auditor-depot matrix.
+        """
+        return_dict = {}
+        for depot in self.depots:
+            return_dict[depot] = {}
+
+        for dep, empl in self.employee_depots:
+            for depot in self.depots:
+                return_dict[depot][empl] = 1 if depot == dep else 0
+        return return_dict
@@ -0,0 +1,332 @@
+###########
+# Imports #
+###########
+# Data
+import os
+import sqlite3
+import datetime
+import numpy as np
+from contextlib import closing
+from sklearn.metrics.pairwise import haversine_distances
+from modules.data_retrieval.data_access import create_indexes
+
+
+##########
+# Schema #
+##########
+# The tables of final_database_master_thesis.db (see chapter 6.2 of the thesis).
+# Date IDs count from 2000-01-01 (ID 1) as in the real database, so the IDs of a date are the same in both databases.
+TABLES = """
+CREATE TABLE facility_types(ID INTEGER PRIMARY KEY, type TEXT);
+CREATE TABLE zip_codes(zip_code INTEGER PRIMARY KEY);
+CREATE TABLE facilities(ID INTEGER PRIMARY KEY, name TEXT, n_machines INTEGER, n_betting INTEGER,
+                        facility_type_id INTEGER REFERENCES facility_types(ID), active INTEGER, address TEXT,
+                        zip_code INTEGER REFERENCES zip_codes(zip_code), city TEXT, country TEXT, lat REAL, long REAL);
+CREATE TABLE employees(ID INTEGER PRIMARY KEY, name TEXT, depot_id INTEGER REFERENCES facilities(ID));
+CREATE TABLE districts(zip_code INTEGER REFERENCES zip_codes(zip_code), facility_type_id INTEGER REFERENCES facility_types(ID),
+                       employee_id INTEGER REFERENCES employees(ID), PRIMARY KEY(zip_code, facility_type_id));
+CREATE TABLE audit_types(ID INTEGER PRIMARY KEY, type TEXT, on_site_audit INTEGER);
+CREATE TABLE skills(employee_id INTEGER REFERENCES employees(ID), audit_type_id INTEGER REFERENCES audit_types(ID),
+                    skill_level INTEGER, PRIMARY KEY(employee_id, audit_type_id));
+CREATE TABLE dates(ID INTEGER PRIMARY KEY, date TEXT, weekday TEXT, day_type TEXT);
+CREATE TABLE time_slots(ID INTEGER PRIMARY KEY, date_id INTEGER REFERENCES dates(ID), hour INTEGER);
+CREATE TABLE vehicles(ID INTEGER PRIMARY KEY, depot_id INTEGER REFERENCES facilities(ID));
+CREATE TABLE vehicle_availability(vehicle_id INTEGER REFERENCES vehicles(ID), time_slot_id INTEGER REFERENCES time_slots(ID),
+                                  available INTEGER, PRIMARY KEY(vehicle_id, time_slot_id));
+CREATE TABLE employee_availability(employee_id INTEGER REFERENCES employees(ID), time_slot_id INTEGER REFERENCES time_slots(ID),
+                                   available INTEGER, PRIMARY KEY(employee_id, time_slot_id));
+CREATE TABLE all_tasks(ID INTEGER PRIMARY KEY, facility_id INTEGER REFERENCES facilities(ID), priority_before_audit INTEGER,
+                       release_date_id INTEGER REFERENCES dates(ID), audit_date_id INTEGER REFERENCES dates(ID),
+                       due_date_id INTEGER REFERENCES dates(ID), priority_after_audit INTEGER, duration REAL,
+                       audit_type_id INTEGER REFERENCES audit_types(ID), employee_id INTEGER REFERENCES employees(ID),
+                       required_skill_level INTEGER);
+"""
+
+FACILITY_TYPES = ["BUT, Kiosk/butik", "DISBUT, Spilsted kun med lotteri", "REST, Restauration", "SHTIL, Spillehal, tilstødende",
+                  "SPBH, Spillebutik og spillehal", "SBBK, Spillebutik, butik/kiosk", "SHBE, Spillehal, bemandet",
+                  "SHBUTKIO, Spillehal og butik/kiosk", "SBSHBK, Spillebutik, spillehal, butik/kiosk",
+                  "SRS, Spillebutik, restauration og spillehal", "SPBUT, Spillebutik", "KA, Kasino", "SR, Spillebutik og restauration",
+                  "KOMBI, Kombi-spillehal", "DEPO, Depot", "TILL, Tilladelsesindehaver"]
+DEPOT_TYPE = 15
+
+# (type, on_site_audit). Types 1-7 are desk audits, 10-15 are the yearly on-site projects and 9 is Greenland.
+AUDIT_TYPES = [("wrong h numbers", 0), ("tax fees", 0), ("missing connection", 0), ("night opening", 0),
+               ("past permission date", 0), ("no permission proj", 0), ("service calls", 0), ("base DK machines", 1),
+               ("base non DK", 1), ("filling sproj", 1), ("minors using machines proj", 1), ("illegal lottery proj", 1),
+               ("money laundering proj", 1), ("betting terminals proj", 1), ("lottery proj", 1), ("service visits", 1)]
+DESK_TYPES = [1, 2, 3, 4, 5, 6, 7]
+PROJECT_TYPES = [10, 11, 12, 13, 14, 15]
+ON_SITE_TYPES, ON_SITE_WEIGHTS = [8, 9, 16], [0.55, 0.05, 0.4]
+
+# (city, first zip code, number of zip codes, lat, long, weight). The weight is roughly the share of the facilities.
+# The first five cities are the depots of the DGA (Odense, Roskilde, Fredensborg, Aalborg and Højbjerg).
+CITIES = [("Odense", 5000, 30, 55.40, 10.40, 6), ("Roskilde", 4000, 10, 55.64, 12.08, 3), ("Fredensborg", 3480, 10, 55.97, 12.40, 2),
+          ("Aalborg", 9000, 30, 57.05, 9.92, 6), ("Højbjerg", 8270, 1, 56.11, 10.20, 1), ("København", 1000, 1500, 55.68, 12.57, 25),
+          ("Aarhus", 8000, 30, 56.16, 10.21, 10), ("Esbjerg", 6700, 20, 55.48, 8.46, 4), ("Kolding", 6000, 10, 55.49, 9.47, 3),
+          ("Vejle", 7100, 20, 55.71, 9.54, 3), ("Randers", 8900, 40, 56.46, 10.04, 3), ("Horsens", 8700, 2, 55.86, 9.85, 3),
+          ("Herning", 7400, 1, 56.14, 8.97, 2), ("Silkeborg", 8600, 1, 56.17, 9.55, 2), ("Viborg", 8800, 1, 56.45, 9.40, 2),
+          ("Næstved", 4700, 1, 55.23, 11.76, 2), ("Slagelse", 4200, 1, 55.40, 11.35, 2), ("Holbæk", 4300, 1, 55.72, 11.72, 2),
+          ("Helsingør", 3000, 1, 56.03, 12.59, 2), ("Fredericia", 7000, 1, 55.57, 9.75, 2), ("Sønderborg", 6400, 1, 54.91, 9.79, 2),
+          ("Svendborg", 5700, 1, 55.06, 10.61, 1), ("Hjørring", 9800, 1, 57.46, 9.98, 1), ("Frederikshavn", 9900, 1, 57.44, 10.54, 1),
+          ("Thisted", 7700, 1, 56.96, 8.69, 1), ("Nykøbing F", 4800, 1, 54.77, 11.87, 1), ("Rønne", 3700, 90, 55.10, 14.70, 1)]
+
+# Knobs of each size. Production is the scale of the DGA: around 6500 facilities, 15 auditors, 5 depots and 2700-6000 audits a year.
+SIZES = {"tiny": {"n_facilities": 150, "audits_per_year": 250, "n_auditors": 4, "n_depots": 2},
+         "small": {"n_facilities": 1000, "audits_per_year": 800, "n_auditors": 8, "n_depots": 3},
+         "medium": {"n_facilities": 3000, "audits_per_year": 2000, "n_auditors": 12, "n_depots": 5},
+         "production": {"n_facilities": 6500, "audits_per_year": 4000, "n_auditors": 15, "n_depots": 5},
+         "10x": {"n_facilities": 65000, "audits_per_year": 40000, "n_auditors": 150, "n_depots": 50}}
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+DATE_ORIGIN = datetime.date(2000, 1, 1) # The date with ID 1
+
+
+#############
+# Functions #
+#############
+def get_easter(year: int) -> datetime.date:
+    """
+    Returns the date of easter sunday (the anonymous Gregorian algorithm).
+    """
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return datetime.date(year, month, day + 1)
+
+
+def get_danish_holidays(year: int) -> set[datetime.date]:
+    """
+    Returns the Danish public holidays of a year and the days, where the DGA is closed (June 5th, December 24th and 31st).
+    """
+    easter = get_easter(year)
+    offsets = [-3, -2, 1, 39, 50] + ([26] if year < 2024 else []) # Store bededag was abolished in 2024
+    return ({easter + datetime.timedelta(days = offset) for offset in offsets}
+            | {datetime.date(year, month, day) for month, day in [(1, 1), (6, 5), (12, 24), (12, 25), (12, 26), (12, 31)]})
+
+
+def get_dates(first_year: int, last_year: int) -> list[tuple[int, str, str, str]]:
+    """
+    Returns the rows (ID, date, weekday, day_type) of the dates table from the first to the last year.
+    """
+    holidays = set().union(*[get_danish_holidays(year) for year in range(first_year, last_year + 1)])
+    rows = []
+    date = datetime.date(first_year, 1, 1)
+    while date.year <= last_year:
+        if date.weekday() >= 5:
+            day_type = "weekend"
+        elif date in holidays:
+            day_type = "holiday"
+        else:
+            day_type = "workday"
+        rows.append(((date - DATE_ORIGIN).days + 1, date.isoformat(), WEEKDAYS[date.weekday()], day_type))
+        date += datetime.timedelta(days = 1)
+    return rows
+
+
+def get_durations(rng: np.random.Generator,
+                  n: int,
+                  duration_median: float,
+                  duration_sigma: float,
+                  max_duration: float) -> np.ndarray:
+    """
+    Returns n audit durations in hours from a log-normal distribution rounded to quarters of an hour.
+    Most audits are short, and a few desk audits take several days (they are split into chunks by the simulation).
+    """
+    durations = rng.lognormal(np.log(duration_median), duration_sigma, n)
+    return np.clip(np.round(durations * 4) / 4, 0.25, max_duration)
+
+
+def generate_instance(path: str,
+                      n_facilities: int = 6500,
+                      audits_per_year: int = 4000,
+                      n_auditors: int = 15,
+                      n_depots: int = 5,
+                      vehicles_per_depot: int = 3,
+                      first_year: int = 2021,
+                      last_year: int = 2023,
+                      duration_median: float = 1.0,
+                      duration_sigma: float = 0.9,
+                      max_duration: float = 35,
+                      yearly_share: float = 0.3,
+                      on_site_share: float = 0.6,
+                      auditor_hours: int = 7,
+                      km_pr_hour: int = 80,
+                      absence_rate: float = 0.02,
+                      performed_until: str = "2022-12-31",
+                      seed: int = 0) -> dict[str, int]:
+    """
+    Writes a synthetic database with the schema of final_database_master_thesis.db to path and returns the number of rows in each table.
+    The same arguments and seed always give the same database.
+    - yearly_share of the audits are released on January 1st with a year-long window (desk audits and on-site projects),
+      the rest are released during the year with a window of 60-200 days (on-site) or 30-90 days (desk).
+    - on_site_share of the audits are on-site audits.
+    - Auditors are available auditor_hours from 8:00 on workdays, except on absence_rate of the days.
+    - Every audit fits in an auditor's day: audits up to 8 hours are not split into multi-day chunks, so they are cut to
+      auditor_hours (auditor_hours - 1 for on-site audits), and an on-site audit is placed at a facility, where the round
+      trip from the nearest depot at km_pr_hour and the audit's hours of a day fit in auditor_hours (if there is one).
+    - Audits released until performed_until have an audit date and an auditor, like the historical audits in the real database.
+    """
+    rng = np.random.default_rng(seed)
+    if os.path.exists(path):
+        os.remove(path)
+
+    # ----- Dates and time slots -----
+    dates = get_dates(first_year, last_year)
+    date_ids = np.array([date[0] for date in dates], dtype = np.int64)
+    workday = np.array([date[3] == "workday" for date in dates])
+    date_to_id = {date[1]: date[0] for date in dates}
+    performed_until_id = (datetime.date.fromisoformat(performed_until) - DATE_ORIGIN).days + 1
+    hours = np.arange(1, 25)
+    slot_ids = np.arange(1, len(dates) * 24 + 1).reshape(len(dates), 24)
+
+    # ----- Depots and facilities -----
+    weights = np.array([city[5] for city in CITIES], dtype = float)
+    depot_cities = [n % len(CITIES) for n in range(n_depots)]
+    facility_cities = rng.choice(len(CITIES), size = n_facilities, p = weights / weights.sum())
+    cities = np.concatenate([depot_cities, facility_cities]).astype(np.int64)
+    n_nodes = len(cities)
+    zip_codes = np.array([CITIES[city][1] for city in cities]) + rng.integers(0, [CITIES[city][2] for city in cities])
+    lat = np.array([CITIES[city][3] for city in cities]) + rng.normal(0, 0.06, n_nodes)
+    long = np.array([CITIES[city][4] for city in cities]) + rng.normal(0, 0.1, n_nodes)
+    lat[:n_depots] = [CITIES[city][3] for city in depot_cities] # Depots are in the city centre
+    long[:n_depots] = [CITIES[city][4] for city in depot_cities]
+    facility_types = np.concatenate([np.full(n_depots, DEPOT_TYPE), rng.choice([*range(1, 15), 16], size = n_facilities)])
+    facilities = [(n + 1,
+                   f"DEPOT {n + 1}" if n < n_depots else f"FACILITY {n + 1}",
+                   int(rng.integers(0, 30)),
+                   int(rng.integers(0, 6)),
+                   int(facility_types[n]),
+                   int(rng.random() > 0.02),
+                   f"Vej {int(rng.integers(1, 200))}",
+                   int(zip_codes[n]),
+                   CITIES[cities[n]][0],
+                   "DK",
+                   float(lat[n]),
+                   float(long[n])) for n in range(n_nodes)]
+
+    # ----- Auditors, skills, districts and vehicles -----
+    # Auditors are divided evenly between the depots. Every depot has an auditor with the highest skill level in every audit type.
+    employee_depots = [n % n_depots + 1 for n in range(n_auditors)]
+    employees = [(e + 1, f"Auditor {e + 1}", employee_depots[e]) for e in range(n_auditors)]
+    skill_levels = rng.choice([1, 2, 3], size = (n_auditors, len(AUDIT_TYPES)), p = [0.2, 0.4, 0.4])
+    for l in range(n_depots):
+        depot_auditors = [e for e in range(n_auditors) if employee_depots[e] == l + 1]
+        if len(depot_auditors) > 0:
+            skill_levels[rng.choice(depot_auditors), :] = 3
+    skills = [(e + 1, t + 1, int(skill_levels[e, t])) for e in range(n_auditors) for t in range(len(AUDIT_TYPES))]
+
+    # A district (zip code and facility type) belongs to an auditor of the nearest depot
+    # The longitude is scaled by cos(56°), so a degree has about the same length in both directions
+    depot_distance = (lat[:, None] - lat[None, :n_depots]) ** 2 + ((long[:, None] - long[None, :n_depots]) * 0.56) ** 2
+    nearest_depot = np.argmin(depot_distance, axis = 1) + 1
+    auditors_of_depot = {l: [e + 1 for e in range(n_auditors) if employee_depots[e] == l] for l in range(1, n_depots + 1)}
+    districts = {}
+    for n in range(n_depots, n_nodes):
+        district = (int(zip_codes[n]), int(facility_types[n]))
+        if district not in districts:
+            auditors = auditors_of_depot[int(nearest_depot[n])] or [e + 1 for e in range(n_auditors)]
+            districts[district] = int(rng.choice(auditors))
+    vehicles = [(l * vehicles_per_depot + v + 1, l + 1) for l in range(n_depots) for v in range(vehicles_per_depot)]
+
+    # ----- Availability -----
+    # Auditors work auditor_hours from 8:00 on workdays. Vehicles are always available, except on the days they are serviced.
+    working_hours = (hours > 8) & (hours <= 8 + auditor_hours)
+    absent = rng.random((n_auditors, len(dates))) < absence_rate
+    employee_available = ((workday[None, :] & ~absent)[:, :, None] & working_hours[None, None, :]).astype(np.int64)
+    serviced = rng.random((len(vehicles), len(dates))) < 0.02
+    vehicle_available = np.repeat((~serviced)[:, :, None], 24, axis = 2).astype(np.int64)
+
+    # ----- Audits -----
+    # Facilities ordered by the round trip from their nearest depot. The coordinates are [long, lat] like the travel times of the simulation.
+    # An on-site audit is placed among the facilities, which it can be done from, so no audit is left unreachable
+    locations = np.radians(np.column_stack([long, lat]))
+    round_trip = 2 * haversine_distances(locations[n_depots:], locations[:n_depots]).min(axis = 1) * 6371 / km_pr_hour
+    by_round_trip = np.argsort(round_trip, kind = "stable") + n_depots
+    sorted_round_trip = np.sort(round_trip)
+
+    # The audit IDs start after the facility IDs, so an audit never has the ID of a depot (they are nodes in the same model)
+    tasks = []
+    task_id = n_nodes + 1
+    first_id, last_id = int(date_ids[0]), int(date_ids[-1])
+    for year in range(first_year, last_year + 1):
+        year_start, year_end = date_to_id[f"{year}-01-01"], date_to_id[f"{year}-12-31"]
+        n_yearly = int(round(audits_per_year * yearly_share))
+        n_yearly_on_site = int(round(n_yearly * on_site_share))
+        n_spread_on_site = int(round((audits_per_year - n_yearly) * on_site_share))
+        n_spread_desk = audits_per_year - n_yearly - n_spread_on_site
+        kinds = ["project"] * n_yearly_on_site + ["batch"] * (n_yearly - n_yearly_on_site) + ["on_site"] * n_spread_on_site + ["desk"] * n_spread_desk
+        durations = get_durations(rng, len(kinds), duration_median, duration_sigma, max_duration)
+        # Only audits over 8 hours are split, so shorter audits must fit in a day (on-site audits with an hour for travelling)
+        longest = np.where(np.isin(kinds, ["project", "on_site"]), auditor_hours - 1, auditor_hours)
+        durations = np.where((durations > longest) & (durations <= 8), longest, durations)
+        daily_hours = np.where(durations > 8, np.minimum(durations, 5), durations) # Multi-day audits take 5 hours a day
+        n_reachable = np.searchsorted(sorted_round_trip, auditor_hours - daily_hours + 1e-9, side = "right")
+        for kind, duration, reachable in zip(kinds, durations, n_reachable):
+            if kind == "project":
+                audit_type, release, due = int(rng.choice(PROJECT_TYPES)), year_start, year_end
+            elif kind == "batch":
+                audit_type, release, due = int(rng.choice(DESK_TYPES)), year_start, year_end
+            elif kind == "on_site":
+                audit_type = int(rng.choice(ON_SITE_TYPES, p = ON_SITE_WEIGHTS))
+                release = int(rng.integers(year_start, year_end + 1))
+                due = release + int(rng.integers(60, 201))
+            else:
+                audit_type = int(rng.choice(DESK_TYPES))
+                release = int(rng.integers(year_start, year_end + 1))
+                due = release + int(rng.integers(30, 91))
+            due = min(due, last_id)
+            if kind in ["project", "on_site"]:
+                facility = int(by_round_trip[rng.integers(0, max(reachable, 1))])
+            else:
+                facility = int(rng.integers(n_depots, n_nodes))
+            priority = int(rng.integers(1, 4))
+            required_skill = int(rng.choice([1, 2, 3], p = [0.5, 0.4, 0.1]))
+
+            # Historical audits were performed by the auditor of the district on a workday in the audit window
+            audit_date, priority_after, employee = None, None, None
+            if release <= performed_until_id:
+                window = np.arange(max(release, first_id), due) - first_id
+                window_workdays = window[workday[window]] if len(window) > 0 else window
+                if len(window_workdays) > 0:
+                    audit_date = int(date_ids[rng.choice(window_workdays)])
+                    priority_after = int(rng.integers(1, 4))
+                    employee = districts[(int(zip_codes[facility]), int(facility_types[facility]))]
+            tasks.append((task_id, facility + 1, priority, release, audit_date, due, priority_after,
+                          float(duration), audit_type, employee, required_skill))
+            task_id += 1
+
+    # ----- Write the database -----
+    with closing(sqlite3.connect(path)) as con:
+        with closing(con.cursor()) as cur:
+            cur.executescript(TABLES)
+            cur.executemany("INSERT INTO facility_types VALUES (?, ?)", list(enumerate(FACILITY_TYPES, start = 1)))
+            cur.executemany("INSERT INTO zip_codes VALUES (?)", [(int(zip_code),) for zip_code in np.unique(zip_codes)])
+            cur.executemany("INSERT INTO facilities VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", facilities)
+            cur.executemany("INSERT INTO employees VALUES (?, ?, ?)", employees)
+            cur.executemany("INSERT INTO districts VALUES (?, ?, ?)", [(*district, e) for district, e in districts.items()])
+            cur.executemany("INSERT INTO audit_types VALUES (?, ?, ?)", [(t + 1, *audit_type) for t, audit_type in enumerate(AUDIT_TYPES)])
+            cur.executemany("INSERT INTO skills VALUES (?, ?, ?)", skills)
+            cur.executemany("INSERT INTO dates VALUES (?, ?, ?, ?)", dates)
+            cur.executemany("INSERT INTO time_slots VALUES (?, ?, ?)",
+                            zip(slot_ids.ravel().tolist(), np.repeat(date_ids, 24).tolist(), np.tile(hours, len(dates)).tolist()))
+            cur.executemany("INSERT INTO vehicles VALUES (?, ?)", vehicles)
+            cur.executemany("INSERT INTO vehicle_availability VALUES (?, ?, ?)",
+                            zip(np.repeat([vehicle[0] for vehicle in vehicles], slot_ids.size).tolist(),
+                                np.tile(slot_ids.ravel(), len(vehicles)).tolist(),
+                                vehicle_available.ravel().tolist()))
+            cur.executemany("INSERT INTO employee_availability VALUES (?, ?, ?)",
+                            zip(np.repeat(np.arange(1, n_auditors + 1), slot_ids.size).tolist(),
+                                np.tile(slot_ids.ravel(), n_auditors).tolist(),
+                                employee_available.ravel().tolist()))
+            cur.executemany("INSERT INTO all_tasks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", tasks)
+        con.commit()
+        create_indexes(con)
+        with closing(con.cursor()) as cur:
+            tables = [table[0] for table in cur.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()]
+            return {table: cur.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in tables}
@@ -0,0 +1,75 @@
+###########
+# Imports #
+###########
+# Data
+import numpy as np
+import os
+
+# Travel time matrix
+from sklearn.metrics.pairwise import haversine_distances
+
+
+###########
+# Classes #
+###########
+class TravelTimeStore:
+    """
+    Stores the distances in km between all facilities as a dense float32 array.
+    Rows are computed the first time a facility is needed and reused afterwards.
+    If a cache path is given, the full array is computed once and saved as a .npy file,
+    which is memory-mapped on the next start instead of being recomputed.
+    The coordinates follow get_lat_long, i.e. [long, lat], so the distances match the original travel-time matrix.
+    """
+    def __init__(self,
+                 facility_locations: dict[int, list[float]],
+                 cache_path: str = None):
+        self.facility_ids = np.array(list(facility_locations.keys()), dtype=np.int64)
+        self.index = {facility_id: pos for pos, facility_id in enumerate(self.facility_ids.tolist())}
+        self.locations = np.radians(np.array(list(facility_locations.values()), dtype=np.float64).reshape(-1, 2))
+
+        n = len(self.facility_ids)
+        self.distances = np.zeros((n, n), dtype=np.float32)
+        self.computed = np.zeros(n, dtype=bool)
+        if cache_path is not None:
+            self._load_or_create_cache(cache_path)
+
+
+    def _load_or_create_cache(self, cache_path: str):
+        """
+        Memory-maps the cached distances if they belong to the same facilities, otherwise computes and saves them.
+        """
+        ids_path = cache_path.replace(".npy", "") + "_facility_ids.npy"
+        if os.path.exists(cache_path) and os.path.exists(ids_path):
+            if np.array_equal(np.load(ids_path), self.facility_ids):
+                self.distances = np.load(cache_path, mmap_mode="r")
+                self.computed[:] = True
+                return
+
+        self.compute(np.arange(len(self.facility_ids)))
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok = True)
+        for path, array in [(cache_path, self.distances), (ids_path, self.facility_ids)]:
+            tmp_path = path + ".tmp.npy"
+            np.save(tmp_path, array)
+            os.replace(tmp_path, path)
+
+
+    def compute(self, positions: np.ndarray):
+        """
+        Computes the distances from the facilities at the given positions to all facilities.
+        """
+        positions = positions[~self.computed[positions]]
+        if len(positions) == 0:
+            return
+        rows = (haversine_distances(self.locations[positions], self.locations) * 6371).astype(np.float32)
+        self.distances[positions, :] = rows
+        self.distances[:, positions] = rows.T
+        self.computed[positions] = True
+
+
+    def get_travel_times(self, facility_ids: list[int], km_pr_hour: int = 80) -> np.ndarray:
+        """
+        Returns the travel times in hours between the given facilities as an array.
+        """
+        positions = np.array([self.index[facility_id] for facility_id in facility_ids], dtype=np.int64)
+        self.compute(positions)
+        return self.distances[np.ix_(positions, positions)] / np.float32(km_pr_hour)
@@ -0,0 +1,56 @@
+###########
+# Imports #
+###########
+# Data
+import numpy as np
+
+
+#############
+# Functions #
+#############
+def get_feasible_arcs(O: list[int],
+                      L: list[int],
+                      E: list[int],
+                      p: dict[int, float],
+                      c: dict[int, dict[int, float]],
+                      g: dict[int, dict[int, int]],
+                      q: dict[int, int],
+                      b: dict[int, dict[int, int]]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns the arcs (i, j, e), which can be part of a feasible route, as positions in [*O, *L] and E.
+    The arcs are ordered by i, j and e like the dense variables from addVars([*O, *L], [*O, *L], E).
+    An arc is left out if
+        - it is a self-loop or goes between two depots,
+        - it starts or ends at a depot, which is not the auditor's (b[l][e] == 0),
+        - it visits an audit, the auditor is not skilled for (g[e][i] == 0),
+        - the auditor is unavailable (q[e] == 0), or
+        - the shortest tour through it is longer than the auditor's capacity:
+          c[l][i] + p[i] + c[i][j] + p[j] + c[j][l] > q[e], where l is the auditor's depot.
+    The last rule holds because the travel times are proportional to great-circle distances, which obey the triangle inequality.
+    """
+    N = [*O, *L]
+    nO, nN, nE = len(O), len(N), len(E)
+
+    B = np.array([[b[l][e] for e in E] for l in L], dtype=float).reshape(len(L), nE)
+    G = np.array([[g[e][i] for i in O] for e in E], dtype=float).reshape(nE, nO)
+    C = np.array([[c[i][j] for j in N] for i in N], dtype=float).reshape(nN, nN)
+    P = np.array([p[i] for i in O] + [0] * len(L), dtype=float)
+    Q = np.array([q[e] for e in E], dtype=float)
+
+    # Nodes each auditor can visit: skilled audits and the auditor's own depot
+    visits = np.concatenate([G.T > 0, B > 0], axis=0) & (Q > 0)[None, :]
+
+    # Shortest travel time from the auditor's depot to each node (inf without a depot)
+    depot_time = np.where((B > 0)[:, None, :], C[nO:, :, None], np.inf).min(axis=0, initial=np.inf)
+
+    # Shortest tour through each arc
+    reach = depot_time + P[:, None]
+    tour = reach[:, None, :] + C[:, :, None] + reach[None, :, :]
+
+    is_depot = np.arange(nN) >= nO
+    feasible = (visits[:, None, :] & visits[None, :, :]
+                & ~np.eye(nN, dtype=bool)[:, :, None]
+                & ~(is_depot[:, None] & is_depot[None, :])[:, :, None]
+                & (tour <= Q[None, None, :] + 1e-6))
+    arc_from, arc_to, arc_auditor = np.nonzero(feasible)
+    return arc_from, arc_to, arc_auditor
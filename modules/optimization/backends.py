@@ -0,0 +1,577 @@
+###########
+# Imports #
+###########
+# Data
+import numpy as np
+
+# Optimization
+from modules.optimization.daily_model import build_daily_model
+from modules.optimization.daily_model import IncrementalDailyModel
+from modules.optimization.daily_model import solve_daily_model
+from modules.optimization.formulation import build_daily_matrices
+from modules.optimization.heuristic import DailyHeuristic
+from modules.optimization.decomposition import assign_audits
+from modules.optimization.decomposition import get_depot_auditors
+from modules.optimization.decomposition import get_subproblem
+from modules.optimization.decomposition import solve_subproblem
+from modules.optimization.subtour_elimination import find_subtours
+from modules.optimization.solve_policy import STATUS_NAMES
+from modules.optimization.solve_policy import get_solve_policy
+from modules.optimization.solve_policy import get_time_limit
+
+# HiGHS is only needed for the HiGHS backend
+try:
+    import highspy
+except ImportError:
+    highspy = None
+
+# Parallel execution
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Timing
+import time
+
+
+############
+# Backends #
+############
+# A backend builds, solves and reads the daily model. Every backend has the methods
+#   build(day, t, V, O, L, E, p, c, g, q, K, d, u, b)   Builds the model of a day
+#   solve() -> str                                       Solves it and returns the termination rule
+#   get_solution() -> (route_dict, audit_dict)           The arcs and audits of every auditor
+#   get_solve_stats() -> dict                            Model size and solver statistics for the profile
+#   close()                                              Releases the resources kept between the days (e.g. worker processes)
+# and the attribute obj_val.
+class GurobiBackend:
+    """
+    Solves the daily model with Gurobi and lazy subtour elimination constraints.
+    With incremental_model, one model is kept and updated across the days.
+    With heuristic_start, the schedule of DailyHeuristic is used as the MIP start. The incremental model always uses it,
+    since the audits of the previous day's plan are done and removed, so the plan is no start for the next day.
+    """
+    def __init__(self,
+                 incremental_model: bool = False,
+                 solve_policy: dict = None,
+                 gurobi_params: dict = None,
+                 heuristic_start: bool = False):
+        self.daily_model = IncrementalDailyModel() if incremental_model else None
+        self.solve_policy = solve_policy
+        self.gurobi_params = gurobi_params
+        self.heuristic_start = heuristic_start
+
+
+    def build(self, day, t, V, O, L, E, p, c, g, q, K, d, u, b):
+        """
+        Builds the model of a day.
+        """
+        self.V, self.O, self.L, self.E = V, O, L, E
+        if self.daily_model is not None:
+            self.m, self.a, self.y, self.x = self.daily_model.update(day, t, V, O, L, E, p, c, g, q, K, d, u, b)
+        else:
+            self.m, self.a, self.y, self.x = build_daily_model(day, t, V, O, L, E, p, c, g, q, K, d, u, b)
+        if self.heuristic_start or self.daily_model is not None:
+            self._set_heuristic_start(DailyHeuristic(t, V, O, L, E, p, c, g, q, K, d, u, b))
+
+
+    def _set_heuristic_start(self, heuristic: DailyHeuristic):
+        """
+        Solves the day with the heuristic and uses the schedule as the MIP start.
+        """
+        objective = heuristic.solve()
+        route_dict, audit_dict = heuristic.get_solution()
+        self.m.update()
+        starts = {var: 0 for var in [*self.a.values(), *self.y.values(), *self.x.values()]}
+        for e in self.E:
+            starts[self.a[e]] = 1 if len(route_dict[e]) > 0 else 0
+            for i in audit_dict[e]:
+                starts[self.y[i, e]] = 1
+            for i, j in route_dict[e]:
+                starts[self.x[i, j, e]] = 1
+        self.m.setAttr("Start", list(starts.keys()), list(starts.values()))
+        print(f"Heuristic start: objective {objective} in {heuristic.runtime:.2f} seconds")
+
+
+    def solve(self) -> str:
+        """
+        Solves the model and returns the termination rule.
+        """
+        termination = solve_daily_model(self.m, self.V, self.O, self.E, self.solve_policy, self.gurobi_params)
+        # Without a solution (infeasible, or the time limit before the first incumbent), no audits are scheduled
+        self.has_solution = self.m.SolCount > 0
+        self.obj_val = self.m.objVal if self.has_solution else None
+        return termination
+
+
+    def get_solution(self) -> tuple[dict[int, list[tuple[int, int]]], dict[int, list[int]]]:
+        """
+        Returns the routes and the audits of every auditor.
+        """
+        if not self.has_solution:
+            return {auditor: [] for auditor in self.E}, {auditor: [] for auditor in self.E}
+
+        # x only has the feasible arcs. The routes are listed in the order of [*O, *L]
+        position = {node: n for n, node in enumerate([*self.O, *self.L])}
+        values = self.m.getAttr("X", self.x)
+        selected = sorted([arc for arc, val in values.items() if val >= 0.6], key=lambda arc: (position[arc[0]], position[arc[1]]))
+        route_dict = {}
+        for auditor in self.E:
+            route_dict[auditor] = [(i, j) for i, j, e in selected if e == auditor]
+        # y only has the assignable pairs
+        audit_dict = {}
+        for auditor in self.E:
+            audit_dict[auditor] = [(i) for i in self.V if (i, auditor) in self.y and self.y[i, auditor].X >= 0.6]
+        return route_dict, audit_dict
+
+
+    def get_solve_stats(self) -> dict:
+        """
+        Returns the size of the solved model and the statistics of the solve.
+        """
+        m = self.m
+        has_solution = m.SolCount > 0
+        return {
+            "num_vars": m.NumVars,
+            "num_bin_vars": m.NumBinVars,
+            "num_constrs": m.NumConstrs,
+            "num_nzs": m.NumNZs,
+            "status": STATUS_NAMES.get(m.Status, f"status_{m.Status}"),
+            "solver_runtime": m.Runtime,
+            "callback_time": m._callback_time,
+            "lazy_cuts": m._lazy_cuts,
+            "obj_val": m.ObjVal if has_solution else None,
+            "obj_bound": m.ObjBound if has_solution else None,
+            "mip_gap": m.MIPGap if has_solution else None,
+            "node_count": m.NodeCount,
+            "incumbent_time": m._incumbent_time
+        }
+
+
+    def close(self):
+        """
+        Nothing is kept between the days, which needs to be released.
+        """
+        pass
+
+
+class HighsBackend:
+    """
+    Solves the daily model with the open-source HiGHS solver. The model is passed to HiGHS as sparse matrices.
+    HiGHS has no lazy constraints, so subtours are removed by adding cuts and solving again until there are none.
+    Each round starts from the best solution found so far without the auditors, whose tours have subtours.
+    If the time limit is reached while a solution still has subtours, that incumbent is used.
+    The solve policy's time limit (also when scaled) and MIP gap are used. The stall rule is not supported.
+    highs_params are extra HiGHS options, e.g. {"threads": 1} or {"log_file": "highs.log"}.
+    """
+    def __init__(self,
+                 solve_policy: dict = None,
+                 highs_params: dict = None):
+        if highspy is None:
+            raise ImportError("The HiGHS backend needs highspy (pip install highspy)")
+        self.solve_policy = solve_policy
+        self.highs_params = highs_params
+
+
+    def build(self, day, t, V, O, L, E, p, c, g, q, K, d, u, b):
+        """
+        Builds the matrices of the model of a day and passes them to HiGHS.
+        """
+        self.day = day
+        self.matrices = build_daily_matrices(t, V, O, L, E, p, c, g, q, K, d, u, b)
+        A = self.matrices["A"]
+
+        lp = highspy.HighsLp()
+        lp.num_col_ = A.shape[1]
+        lp.num_row_ = A.shape[0]
+        lp.sense_ = highspy.ObjSense.kMaximize
+        lp.col_cost_ = self.matrices["obj"]
+        lp.col_lower_ = self.matrices["lb"]
+        lp.col_upper_ = self.matrices["ub"]
+        lp.row_lower_ = self.matrices["row_lower"]
+        lp.row_upper_ = self.matrices["row_upper"]
+        lp.a_matrix_.format_ = highspy.MatrixFormat.kRowwise
+        lp.a_matrix_.start_ = A.indptr
+        lp.a_matrix_.index_ = A.indices
+        lp.a_matrix_.value_ = A.data
+        lp.integrality_ = [highspy.HighsVarType.kInteger] * A.shape[1]
+
+        self.h = highspy.Highs()
+        self.h.setOptionValue("output_flag", False)
+        for option, value in (self.highs_params or {}).items():
+            self.h.setOptionValue(option, value)
+        self.h.passModel(lp)
+
+
+    def _add_subtour_cuts(self, subtours: list[tuple[int, list[int]]]):
+        """
+        Adds subtour elimination constraints for each subtour.
+        Since every round restarts the solve, the subtour is cut off for all auditors, not only the one whose tour had it.
+        Returns the number of added constraints.
+        """
+        M = self.matrices
+        n_cuts = 0
+        for component in {tuple(sorted(component)) for _, component in subtours}:
+            in_S = np.zeros(len(M["nodes"]), dtype=bool)
+            in_S[list(component)] = True
+            inside = in_S[M["arc_from"]] & in_S[M["arc_to"]]
+            for auditor in range(len(M["E"])):
+                arcs = np.flatnonzero(inside & (M["arc_auditor"] == auditor))
+                if len(arcs) == 0: # The auditor has no arcs inside the subtour, so the cut would be an empty row
+                    continue
+                self.h.addRow(-np.inf, len(component) - 1, len(arcs), (M["x_offset"] + arcs).astype(np.int32), np.ones(len(arcs)))
+                n_cuts += 1
+        return n_cuts
+
+
+    def _remove_subtours(self, solution: np.ndarray, subtours: list[tuple[int, list[int]]]) -> np.ndarray:
+        """
+        Unassigns the auditors, whose tours contain subtours. The solution is still feasible without the subtour cuts.
+        """
+        M = self.matrices
+        solution = solution.copy()
+        for auditor in {auditor for auditor, _ in subtours}:
+            solution[auditor] = 0
+            solution[M["y_offset"] + np.flatnonzero(M["pair_auditor"] == auditor)] = 0
+            solution[M["x_offset"] + np.flatnonzero(M["arc_auditor"] == auditor)] = 0
+        return solution
+
+
+    def solve(self) -> str:
+        """
+        Solves the model, adds subtour cuts until the solution has no subtours, and returns the termination rule.
+        """
+        M = self.matrices
+        policy = get_solve_policy(self.solve_policy)
+        time_limit = get_time_limit(policy, M["V"], M["O"], M["E"])
+        if policy["mip_gap"] is not None:
+            self.h.setOptionValue("mip_rel_gap", policy["mip_gap"])
+
+        start_time = time.perf_counter()
+        self.callback_time = 0.0
+        self.lazy_cuts = 0
+        self.rounds = 0
+        best = None
+        while True:
+            self.h.setOptionValue("time_limit", max(time_limit - (time.perf_counter() - start_time), 0.0))
+            self.h.run()
+            self.rounds += 1
+            status = self.h.getModelStatus()
+            if self.h.getInfo().primal_solution_status != highspy.SolutionStatus.kSolutionStatusFeasible:
+                break
+
+            separation_start = time.perf_counter()
+            solution = np.array(self.h.getSolution().col_value)
+            selected = np.flatnonzero(solution[M["x_offset"]:] > 0.6)
+            subtours = find_subtours(M["arc_from"][selected], M["arc_to"][selected], M["arc_auditor"][selected], M["is_depot"])
+
+            # Without the auditors with subtours, the solution is feasible and is kept as the incumbent
+            candidate = self._remove_subtours(solution, subtours) if len(subtours) > 0 else solution
+            if best is None or M["obj"] @ candidate > M["obj"] @ best + 1e-9:
+                best = candidate
+            self.callback_time += time.perf_counter() - separation_start
+
+            if len(subtours) == 0 or status == highspy.HighsModelStatus.kTimeLimit:
+                break
+            self.lazy_cuts += self._add_subtour_cuts(subtours)
+
+            # Start the next round from the incumbent
+            start_solution = highspy.HighsSolution()
+            start_solution.col_value = best.tolist()
+            start_solution.value_valid = True
+            self.h.setSolution(start_solution)
+
+        # Without a solution (infeasible, or the time limit before the first incumbent), no audits are scheduled
+        self.has_solution = best is not None
+        self.solution = best if self.has_solution else np.zeros(len(M["obj"]))
+        self.runtime = time.perf_counter() - start_time
+        self.status = status
+        self.obj_val = float(M["obj"] @ self.solution) if self.has_solution else None
+        termination = self._get_termination_rule(time_limit < policy["time_limit"])
+        print(f"Solver time: {self.runtime:.2f} seconds, of which {self.callback_time:.2f} seconds separating subtours ({self.lazy_cuts} subtour cuts in {self.rounds} rounds)")
+        print(f"Termination: {termination}")
+        return termination
+
+
+    def _get_termination_rule(self, time_limit_scaled: bool) -> str:
+        """
+        Returns the rule, which ended the solve, with the same names as for Gurobi.
+        Any other status without a solution is reported as infeasible.
+        """
+        if self.status == highspy.HighsModelStatus.kOptimal:
+            return "optimal" if self.h.getInfo().mip_gap <= 1e-4 else "mip_gap"
+        if self.status == highspy.HighsModelStatus.kTimeLimit:
+            return "scaled_time_limit" if time_limit_scaled else "time_limit"
+        if self.status == highspy.HighsModelStatus.kInfeasible or not self.has_solution:
+            return "infeasible"
+        return self.h.modelStatusToString(self.status).lower().replace(" ", "_")
+
+
+    def get_solution(self) -> tuple[dict[int, list[tuple[int, int]]], dict[int, list[int]]]:
+        """
+        Returns the routes and the audits of every auditor.
+        """
+        M = self.matrices
+        N, V, E = M["nodes"], M["V"], M["E"]
+        selected = np.flatnonzero(self.solution[M["x_offset"]:] >= 0.6)
+        arc_from, arc_to, arc_auditor = M["arc_from"][selected], M["arc_to"][selected], M["arc_auditor"][selected]
+        y = self.solution[M["y_offset"]:M["x_offset"]] >= 0.6
+        pair_audit, pair_auditor = M["pair_audit"][y], M["pair_auditor"][y]
+
+        route_dict = {}
+        audit_dict = {}
+        for e, auditor in enumerate(E):
+            route_dict[auditor] = [(N[i], N[j]) for i, j in zip(arc_from[arc_auditor == e], arc_to[arc_auditor == e])]
+            audit_dict[auditor] = [V[i] for i in pair_audit[pair_auditor == e]]
+        return route_dict, audit_dict
+
+
+    def get_solve_stats(self) -> dict:
+        """
+        Returns the size of the solved model and the statistics of the solve.
+        """
+        info = self.h.getInfo()
+        has_solution = self.has_solution
+        return {
+            "num_vars": self.h.getNumCol(),
+            "num_bin_vars": self.h.getNumCol(),
+            "num_constrs": self.h.getNumRow(),
+            "num_nzs": self.h.getNumNz(),
+            "status": self.h.modelStatusToString(self.status).lower().replace(" ", "_"),
+            "solver_runtime": self.runtime,
+            "callback_time": self.callback_time,
+            "lazy_cuts": self.lazy_cuts,
+            "obj_val": self.obj_val,
+            "obj_bound": info.mip_dual_bound if has_solution else None,
+            "mip_gap": info.mip_gap if has_solution else None,
+            "node_count": info.mip_node_count,
+            "incumbent_time": None
+        }
+
+
+    def close(self):
+        """
+        Nothing is kept between the days, which needs to be released.
+        """
+        pass
+
+
+class HeuristicBackend:
+    """
+    Schedules the day with DailyHeuristic instead of a MIP solver.
+    The local search stops at the time limit of the solve policy.
+    """
+    def __init__(self, solve_policy: dict = None):
+        self.solve_policy = solve_policy
+
+
+    def build(self, day, t, V, O, L, E, p, c, g, q, K, d, u, b):
+        """
+        Prepares the heuristic for the day.
+        """
+        time_limit = get_time_limit(get_solve_policy(self.solve_policy), V, O, E)
+        self.heuristic = DailyHeuristic(t, V, O, L, E, p, c, g, q, K, d, u, b, time_limit)
+
+
+    def solve(self) -> str:
+        """
+        Runs the heuristic and returns "heuristic" as the termination rule.
+        """
+        self.obj_val = self.heuristic.solve()
+        print(f"Heuristic time: {self.heuristic.runtime:.2f} seconds")
+        print("Termination: heuristic")
+        return "heuristic"
+
+
+    def get_solution(self) -> tuple[dict[int, list[tuple[int, int]]], dict[int, list[int]]]:
+        """
+        Returns the routes and the audits of every auditor.
+        """
+        return self.heuristic.get_solution()
+
+
+    def get_solve_stats(self) -> dict:
+        """
+        Returns the statistics of the heuristic. There is no model, so the model size is empty.
+        """
+        return {
+            "num_vars": None,
+            "num_bin_vars": None,
+            "num_constrs": None,
+            "num_nzs": None,
+            "status": "heuristic",
+            "solver_runtime": self.heuristic.runtime,
+            "callback_time": 0.0,
+            "lazy_cuts": 0,
+            "obj_val": self.obj_val,
+            "obj_bound": None,
+            "mip_gap": None,
+            "node_count": 0,
+            "incumbent_time": self.heuristic.runtime
+        }
+
+
+    def close(self):
+        """
+        Nothing is kept between the days, which needs to be released.
+        """
+        pass
+
+
+class DecompositionBackend:
+    """
+    Splits the day into one subproblem per depot (see modules.optimization.decomposition) and solves the subproblems
+    in parallel worker processes with the subproblem backend. The merged schedule is repaired with DailyHeuristic.
+    assignment is "nearest" (the audits go to the depots_per_audit nearest depots) or "heuristic" (a master schedule from
+    DailyHeuristic assigns the scheduled audits; the result is then never worse than the heuristic's).
+    The worker processes are kept until close is called. Each subproblem gets an equal share of the threads
+    (Threads in gurobi_params and threads in highs_params, or all cores), so the workers do not oversubscribe the machine.
+    """
+    def __init__(self,
+                 subproblem_backend: str = "gurobi",
+                 assignment: str = "nearest",
+                 depots_per_audit: int = 2,
+                 max_workers: int = None,
+                 backend_args: dict = None):
+        if assignment not in ("nearest", "heuristic"):
+            raise ValueError(f"Unknown assignment: {assignment}")
+        self.subproblem_backend = subproblem_backend
+        self.assignment = assignment
+        self.depots_per_audit = depots_per_audit
+        self.max_workers = max_workers if max_workers is not None else os.cpu_count()
+        self.backend_args = dict(backend_args) if backend_args is not None else {}
+        gurobi_params = self.backend_args.get("gurobi_params") or {}
+        highs_params = self.backend_args.get("highs_params") or {}
+        self.backend_args["gurobi_params"] = {**gurobi_params, "Threads": self._get_threads(gurobi_params.get("Threads"))}
+        self.backend_args["highs_params"] = {**highs_params, "threads": self._get_threads(highs_params.get("threads"))}
+        self.executor = None
+
+
+    def _get_threads(self, threads: int = None) -> int:
+        """
+        Returns the threads of a subproblem: the threads (or all cores) divided between the workers.
+        """
+        return max(1, (threads or os.cpu_count()) // self.max_workers)
+
+
+    def build(self, day, t, V, O, L, E, p, c, g, q, K, d, u, b):
+        """
+        Assigns the audits to the depots and builds the subproblems.
+        """
+        self.day, self.t = day, t
+        self.heuristic = DailyHeuristic(t, V, O, L, E, p, c, g, q, K, d, u, b)
+        self.master = None
+        if self.assignment == "heuristic":
+            self.master = DailyHeuristic(t, V, O, L, E, p, c, g, q, K, d, u, b)
+            self.master.solve()
+        candidates = assign_audits(t, V, O, L, E, p, c, g, q, d, b, self.master, self.depots_per_audit)
+        depot_auditors = get_depot_auditors(L, E, b)
+        self.subproblems = {l: get_subproblem(l, candidates[l], depot_auditors[l], V, O, p, c, g, q, K, d, u, b)
+                            for l in L if len(candidates[l]) > 0 and len(depot_auditors[l]) > 0}
+
+
+    def solve(self) -> str:
+        """
+        Solves the subproblems in parallel, repairs the merged schedule and returns "decomposition" as the termination rule.
+        """
+        start_time = time.time()
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers = self.max_workers)
+        futures = {l: self.executor.submit(solve_subproblem, self.day, self.t, subproblem,
+                                           self.subproblem_backend, self.backend_args)
+                   for l, subproblem in self.subproblems.items()}
+        self.results = {l: future.result() for l, future in futures.items()}
+
+        route_dict, audit_dict = {}, {}
+        for l, result in self.results.items():
+            print(f"##### DEPOT {l}: {len(self.subproblems[l][3])} auditors, {len(self.subproblems[l][0])} audits, "
+                  f"objective {result['obj_val']} ({result['termination']}) #####")
+            print(result["output"])
+            route_dict.update(result["route_dict"])
+            audit_dict.update(result["audit_dict"])
+        self.heuristic.set_solution(route_dict, audit_dict)
+        merged_obj = self.heuristic.objective
+        self.obj_val = self.heuristic.repair()
+        if self.master is not None and self.master.objective > self.obj_val:
+            self.heuristic = self.master
+            self.obj_val = self.master.objective
+        self.runtime = time.time() - start_time
+        print(f"Repair: objective {merged_obj} of the merged schedules and {self.obj_val} after the repair")
+        print(f"Decomposition time: {self.runtime:.2f} seconds")
+        print("Termination: decomposition")
+        return "decomposition"
+
+
+    def get_solution(self) -> tuple[dict[int, list[tuple[int, int]]], dict[int, list[int]]]:
+        """
+        Returns the routes and the audits of every auditor.
+        """
+        return self.heuristic.get_solution()
+
+
+    def get_solve_stats(self) -> dict:
+        """
+        Returns the model size and the statistics summed over the subproblems. The solver runtime is the wall time of the
+        parallel solve and the repair. The sum of the subproblem bounds is not a bound on the day, so there is no bound or gap.
+        """
+        stats = [result["solve_stats"] for result in self.results.values()]
+
+        def total(key):
+            values = [s[key] for s in stats if s[key] is not None]
+            return sum(values) if len(values) > 0 else None
+
+        return {
+            "num_vars": total("num_vars"),
+            "num_bin_vars": total("num_bin_vars"),
+            "num_constrs": total("num_constrs"),
+            "num_nzs": total("num_nzs"),
+            "status": "decomposition",
+            "solver_runtime": self.runtime,
+            "callback_time": total("callback_time"),
+            "lazy_cuts": total("lazy_cuts"),
+            "obj_val": self.obj_val,
+            "obj_bound": None,
+            "mip_gap": None,
+            "node_count": total("node_count"),
+            "incumbent_time": self.runtime
+        }
+
+
+    def close(self):
+        """
+        Shuts down the worker processes.
+        """
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures = True)
+            self.executor = None
+
+
+#############
+# Functions #
+#############
+def get_backend(solver_backend: str,
+                incremental_model: bool = False,
+                solve_policy: dict = None,
+                gurobi_params: dict = None,
+                highs_params: dict = None,
+                heuristic_start: bool = False,
+                decomposition_params: dict = None):
+    """
+    Returns the backend with the given name: "gurobi", "highs", "heuristic" or "decomposition".
+    heuristic_start (Gurobi only) uses the heuristic's schedule as the MIP start.
+    decomposition_params are the subproblem_backend, assignment, depots_per_audit and max_workers of the decomposition.
+    """
+    if solver_backend == "gurobi":
+        return GurobiBackend(incremental_model, solve_policy, gurobi_params, heuristic_start)
+    if incremental_model:
+        raise ValueError("The incremental model is only available with the Gurobi backend")
+    if solver_backend == "highs":
+        return HighsBackend(solve_policy, highs_params)
+    if solver_backend == "heuristic":
+        return HeuristicBackend(solve_policy)
+    if solver_backend == "decomposition":
+        backend_args = {"solve_policy": solve_policy,
+                        "gurobi_params": gurobi_params,
+                        "highs_params": highs_params,
+                        "heuristic_start": heuristic_start}
+        return DecompositionBackend(backend_args = backend_args, **(decomposition_params or {}))
+    raise ValueError(f"Unknown solver backend: {solver_backend}")
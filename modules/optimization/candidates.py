@@ -0,0 +1,116 @@
+###########
+# Imports #
+###########
+# Data
+import numpy as np
+from modules.optimization.formulation import get_model_size
+
+
+##############
+# Candidates #
+##############
+# An auditor e is a candidate for an audit i, if the daily model allows y[i, e] = 1. An auditor is left out if
+#   - the auditor is not skilled for the audit (g[e][i] == 0),
+#   - the audit cannot be scheduled today (d[i] - t < 1, constraint 10),
+#   - the audit does not fit in the auditor's capacity q[e]: p[i] for an off-site audit, and the round trip
+#     c[l][i] + p[i] + c[i][l] from the auditor's depot l for an on-site audit (constraint 8). Every route through i
+#     is at least this long, since the travel times are proportional to great-circle distances (triangle inequality).
+# These rules never remove a feasible assignment. With k_nearest_depots an on-site audit only keeps the auditors of
+# its k nearest depots, which is a heuristic restriction.
+# Every backend and the heuristic read the candidates through the accomplice matrix g (see get_candidate_matrix).
+# The model builders only create y[i, e] and the rows of constraint 6, 7, 9 and 11 for the pairs in g (see
+# modules.optimization.formulation), and get_feasible_arcs only creates arcs through them, so a pruned pair is not in the model.
+# get_model_reduction counts the variables and rows, which the candidates remove.
+
+
+#############
+# Functions #
+#############
+def get_candidates(t: int,
+                   V: list[int],
+                   O: list[int],
+                   L: list[int],
+                   E: list[int],
+                   p: dict[int, float],
+                   c: dict[int, dict[int, float]],
+                   g: dict[int, dict[int, int]],
+                   q: dict[int, int],
+                   d: dict[int, int],
+                   b: dict[int, dict[int, int]],
+                   k_nearest_depots: int = None) -> tuple[dict[int, list[int]], dict[str, int]]:
+    """
+    Returns the candidate auditors of each audit (in the order of E) and the counts of the auditor-audit pairs:
+    n_pairs, n_candidates and the pairs removed by each rule (pruned_skill, pruned_due, pruned_capacity and pruned_depot).
+    A pair is counted by the first rule, which removes it.
+    """
+    nV, nO, nL, nE = len(V), len(O), len(L), len(E)
+    v_index = {i: n for n, i in enumerate(V)}
+    o_in_v = np.array([v_index[i] for i in O], dtype=np.int64)
+
+    B = np.array([[b[l][e] for e in E] for l in L], dtype=float).reshape(nL, nE) > 0
+    G = np.array([[g[e][i] for e in E] for i in V], dtype=float).reshape(nV, nE) >= 1
+    P = np.array([p[i] for i in V], dtype=float)
+    Q = np.array([q[e] for e in E], dtype=float)
+    D = np.array([d[i] - t for i in V], dtype=float)
+    from_depot = np.array([[c[l][i] for i in O] for l in L], dtype=float).reshape(nL, nO)
+    to_depot = np.array([[c[i][l] for l in L] for i in O], dtype=float).reshape(nO, nL).T
+
+    # Time needed by each auditor for each audit: p[i], and for on-site audits the shortest round trip from the auditor's depots
+    needed = np.repeat(P[:, None], nE, axis=1)
+    round_trip = np.where(B[:, None, :], (from_depot + to_depot)[:, :, None], np.inf).min(axis=0, initial=np.inf)
+    needed[o_in_v] += round_trip
+
+    skill = G
+    due = skill & (D >= 1)[:, None]
+    capacity = due & (needed <= Q[None, :] + 1e-6)
+    depot = capacity.copy()
+    if k_nearest_depots is not None and nO > 0:
+        nearest = np.argsort(from_depot, axis=0, kind="stable")[:k_nearest_depots]
+        near = np.zeros((nL, nO), dtype=bool)
+        near[nearest, np.arange(nO)[None, :]] = True
+        depot[o_in_v] &= (near.T.astype(float) @ B.astype(float)) > 0
+
+    candidates = {i: [E[e] for e in np.flatnonzero(depot[n])] for n, i in enumerate(V)}
+    pruned = {"n_pairs": nV * nE,
+              "n_candidates": int(depot.sum()),
+              "pruned_skill": int((~skill).sum()),
+              "pruned_due": int((skill & ~due).sum()),
+              "pruned_capacity": int((due & ~capacity).sum()),
+              "pruned_depot": int((capacity & ~depot).sum())}
+    return candidates, pruned
+
+
+def get_candidate_matrix(candidates: dict[int, list[int]], E: list[int]) -> dict[int, dict[int, int]]:
+    """
+    Returns the candidates as an accomplice matrix g[e][i], which is 1 if auditor e is a candidate for audit i.
+    """
+    g = {e: {} for e in E}
+    for i, auditors in candidates.items():
+        auditor_set = set(auditors)
+        for e in E:
+            g[e][i] = 1 if e in auditor_set else 0
+    return g
+
+
+def get_model_reduction(t: int,
+                        V: list[int],
+                        O: list[int],
+                        L: list[int],
+                        E: list[int],
+                        p: dict[int, float],
+                        c: dict[int, dict[int, float]],
+                        g: dict[int, dict[int, int]],
+                        g_candidates: dict[int, dict[int, int]],
+                        q: dict[int, int],
+                        d: dict[int, int],
+                        b: dict[int, dict[int, int]]) -> dict[str, int]:
+    """
+    Returns the size of the daily model with the candidate matrix (model_vars and model_rows), and the variables and
+    rows it has less than the model with the accomplice matrix g (removed_vars and removed_rows).
+    """
+    n_vars, n_rows = get_model_size(t, V, O, L, E, p, c, g, q, d, b)
+    model_vars, model_rows = get_model_size(t, V, O, L, E, p, c, g_candidates, q, d, b)
+    return {"model_vars": model_vars,
+            "model_rows": model_rows,
+            "removed_vars": n_vars - model_vars,
+            "removed_rows": n_rows - model_rows}
@@ -0,0 +1,445 @@
+###########
+# Imports #
+###########
+# Optimization
+import numpy as np
+import gurobipy as gp
+from gurobipy import GRB
+from modules.optimization.subtour_elimination import set_subtour_data
+from modules.optimization.arcs import get_feasible_arcs
+from modules.optimization.formulation import build_daily_matrices
+from modules.optimization.formulation import get_assignable
+from modules.optimization.formulation import get_assignment_pairs
+from modules.optimization.solve_policy import get_solve_policy
+from modules.optimization.solve_policy import apply_solve_policy
+from modules.optimization.solve_policy import solve_callback
+from modules.optimization.solve_policy import get_termination_rule
+
+import copy
+
+
+###############
+# Daily model #
+###############
+def build_daily_model(day: int,
+                      t: int,
+                      V: list[int],
+                      O: list[int],
+                      L: list[int],
+                      E: list[int],
+                      p: dict[int, float],
+                      c: dict[int, dict[int, float]],
+                      g: dict[int, dict[int, int]],
+                      q: dict[int, int],
+                      K: dict[int, int],
+                      d: dict[int, int],
+                      u: dict[int, int],
+                      b: dict[int, dict[int, int]]) -> tuple[gp.Model, gp.tupledict, gp.tupledict, gp.tupledict]:
+    """
+    Builds a fresh model for a single day and returns the model and the variables a, y and x.
+    y only has the pairs from get_assignment_pairs, and x only has the arcs from get_feasible_arcs.
+    The constraints 1-11 are the sparse matrix from build_daily_matrices, which is added with one call to the matrix API,
+    so the build time grows with the number of non-zeros. The variables and rows are in the same order as in
+    build_daily_model_iterative.
+    """
+    matrices = build_daily_matrices(t, V, O, L, E, p, c, g, q, K, d, u, b)
+    N = matrices["nodes"]
+    arcs = [(N[i], N[j], E[e]) for i, j, e in zip(matrices["arc_from"].tolist(), matrices["arc_to"].tolist(), matrices["arc_auditor"].tolist())]
+    print(f"Arcs: {len(arcs)} of {len(N) ** 2 * len(E)}")
+
+    m = gp.Model(f"Danzig-fuller-day-{day}")
+    pairs = [(V[i], E[e]) for i, e in zip(matrices["pair_audit"].tolist(), matrices["pair_auditor"].tolist())]
+    names = [f"a[{e}]" for e in E] + [f"y[{i},{e}]" for i, e in pairs] + [f"x[{i},{j},{e}]" for i, j, e in arcs]
+    z = m.addMVar(len(names), lb=matrices["lb"], ub=matrices["ub"], obj=matrices["obj"], vtype=GRB.BINARY, name=names)
+
+    # Constraint 1-11: equalities have equal bounds, the other rows only have an upper bound
+    lower, upper = matrices["row_lower"], matrices["row_upper"]
+    sense = np.where(lower == upper, GRB.EQUAL, np.where(np.isinf(lower), GRB.LESS_EQUAL, GRB.GREATER_EQUAL))
+    m.addMConstr(matrices["A"], z, sense, np.where(np.isinf(lower), upper, lower))
+    m.ModelSense = GRB.MAXIMIZE
+
+    # The variables by index, as addVars(E), addVars(pairs) and addVars(arcs) return them
+    variables = z.tolist()
+    y_offset, x_offset = matrices["y_offset"], matrices["x_offset"]
+    a = gp.tupledict(zip(E, variables[:y_offset]))
+    y = gp.tupledict(zip(pairs, variables[y_offset:x_offset]))
+    x = gp.tupledict(zip(arcs, variables[x_offset:]))
+
+    set_subtour_data(m, x, L, E)
+    return m, a, y, x
+
+
+def build_daily_model_iterative(day: int,
+                      t: int,
+                      V: list[int],
+                      O: list[int],
+                      L: list[int],
+                      E: list[int],
+                      p: dict[int, float],
+                      c: dict[int, dict[int, float]],
+                      g: dict[int, dict[int, int]],
+                      q: dict[int, int],
+                      K: dict[int, int],
+                      d: dict[int, int],
+                      u: dict[int, int],
+                      b: dict[int, dict[int, int]]) -> tuple[gp.Model, gp.tupledict, gp.tupledict, gp.tupledict]:
+    """
+    Builds a fresh model for a single day and returns the model and the variables a, y and x.
+    y only has the pairs from get_assignment_pairs, and x only has the arcs from get_feasible_arcs.
+    This is the original implementation, which adds the constraints one at a time.
+    It is kept as the reference for build_daily_model.
+    """
+    m = gp.Model(f"Danzig-fuller-day-{day}")
+    a = m.addVars(E, vtype=GRB.BINARY, name="a")
+
+    # Only pairs, where the auditor may take the audit, and arcs, which can be part of a feasible route, are created
+    g = get_assignable(t, V, E, g, d)
+    pairs = [(V[i], E[e]) for i, e in zip(*get_assignment_pairs(V, E, g))]
+    y = m.addVars(pairs, vtype=GRB.BINARY, name="y")
+    N = [*O, *L]
+    arcs = [(N[i], N[j], E[e]) for i, j, e in zip(*get_feasible_arcs(O, L, E, p, c, g, q, b))]
+    print(f"Arcs: {len(arcs)} of {len(N) ** 2 * len(E)}")
+    x = m.addVars(arcs, vtype=GRB.BINARY, name="x")
+    travel_times = {(i, j, e): c[i][j] for i, j, e in arcs}
+
+    # Add constraints
+    print("Constraint 1: Only leave once from designated depot")
+    for e in E:
+        for l in L:
+            m.addConstr(x.sum(l, "*", e) == b[l][e] * a[e])
+
+    print("Constraint 2: Only return once from designated depot")
+    for e in E:
+        for l in L:
+            m.addConstr(x.sum("*", l, e) == b[l][e] * a[e])
+
+    print("Constraint 3: Respect vehicle capacity when leaving")
+    for l in L:
+        m.addConstr(x.sum("*", l, "*") <= K[l])
+
+    print("Constraint 4: Respect vehicle capacity when returning")
+    for l in L:
+        m.addConstr(x.sum(l, "*", "*") <= K[l])
+
+    print("Constraint 5: Respect skill levels (y only exists for the pairs)")
+
+    print("Constraint 6: No more than 1 audit")
+    for i in V:
+        if len(y.select(i, "*")) > 0:
+            m.addConstr(y.sum(i, "*") <= 1)
+
+    print("Constraint 6: Create Tour From --> To")
+    for i in O:
+        for e in E:
+            if (i, e) in y:
+                m.addConstr(x.sum(i, "*", e) == y[i, e])
+
+    print("Constraint 7: Create Tour To --> From")
+    for i in O:
+        for e in E:
+            if (i, e) in y:
+                m.addConstr(x.sum("*", i, e) == y[i, e])
+
+    print("Constraint 8: Do not go above employee capacity")
+    for e in E:
+        m.addConstr(x.prod(travel_times, "*", "*", e) + gp.quicksum(p[i] * y[i, e] for i in V if (i, e) in y) <= q[e])
+
+    print("Constraint 9: Create assignment variable")
+    for e in E:
+        for i in O:
+            if (i, e) in y:
+                m.addConstr(y[i, e] <= a[e])
+
+    print("Constraint 10: Force y to 1")
+    for i in V:
+        if len(y.select(i, "*")) > 0:
+            m.addConstr(d[i] - t >= y.sum(i, "*"))
+
+    print("Constraint 11: Conserve flow")
+    for j in N:
+        for e in E:
+            if j in L or (j, e) in y:
+                m.addConstr(x.sum("*", j, e) - x.sum(j, "*", e) == 0)
+
+    # Objective function
+    m.setObjective(gp.quicksum(y[i, e] * (1/u[i]) for i, e in pairs), GRB.MAXIMIZE)
+
+    set_subtour_data(m, x, L, E)
+    return m, a, y, x
+
+
+class IncrementalDailyModel:
+    """
+    Keeps one model alive across the simulated days.
+    Every day the variables and constraints of completed audits are removed, newly released audits are added,
+    and the right-hand sides (q, K, d - t) and the coefficients (1/u, p) are updated.
+    y and the rows of constraint 6, 7, 9, 10 and 11 only exist for today's pairs (see get_assignment_pairs), so the pairs,
+    which are no longer assignable, are removed with their rows and arcs, and the new pairs are added.
+    The previous day's plan is not used as a MIP start, since its audits were done and are removed
+    (GurobiBackend uses the heuristic's schedule as the start instead).
+    """
+    def __init__(self):
+        self.m = None
+        self.L = []
+        self.E = []
+        self.b = {}
+
+
+    def _build_empty(self,
+                     L: list[int],
+                     E: list[int],
+                     b: dict[int, dict[int, int]]):
+        """
+        Builds the model with the variables and constraints, which only depend on the depots and the auditors.
+        """
+        self.m = gp.Model("Danzig-fuller-incremental")
+        self.L = list(L)
+        self.E = list(E)
+        self.b = copy.deepcopy(b)
+        self.V = []
+        self.O = []
+        self.p = {}
+
+        self.a = self.m.addVars(E, vtype=GRB.BINARY, name="a")
+        self.y = gp.tupledict()
+        self.x = gp.tupledict()
+
+        # Constraints 1-4, 8 and 11 (for the depots) start out without any audits
+        self.c1 = {(l, e): self.m.addConstr(-b[l][e] * self.a[e] == 0, name=f"c1[{l},{e}]") for e in E for l in L}
+        self.c2 = {(l, e): self.m.addConstr(-b[l][e] * self.a[e] == 0, name=f"c2[{l},{e}]") for e in E for l in L}
+        self.c3 = {l: self.m.addConstr(gp.LinExpr() <= 0, name=f"c3[{l}]") for l in L}
+        self.c4 = {l: self.m.addConstr(gp.LinExpr() <= 0, name=f"c4[{l}]") for l in L}
+        self.c8 = {e: self.m.addConstr(gp.LinExpr() <= 0, name=f"c8[{e}]") for e in E}
+        self.c11 = {(j, e): self.m.addConstr(gp.LinExpr() == 0, name=f"c11[{j},{e}]") for j in L for e in E}
+
+        # Per-audit and per-pair constraints, and the number of pairs of each audit
+        self.n_pairs = {}
+        self.c6 = {}
+        self.c6_tour = {}
+        self.c7 = {}
+        self.c9 = {}
+        self.c10 = {}
+        self.m.update()
+        self.m.ModelSense = GRB.MAXIMIZE
+
+
+    def _add_arc(self, i: int, j: int, e: int, c: dict[int, dict[int, float]]):
+        """
+        Adds the variable x[i, j, e] to every constraint it takes part in.
+        Self-loops, arcs between depots and arcs at other auditors' depots are never feasible and are not added.
+        """
+        if i == j or (i in self.L and j in self.L):
+            return
+        for l in self.L:
+            if (i == l or j == l) and self.b[l][e] == 0:
+                return
+
+        coeffs = {}
+        coeffs[self.c8[e]] = c[i][j]
+        if i != j:
+            coeffs[self.c11[j, e]] = 1
+            coeffs[self.c11[i, e]] = -1
+        if (i, e) in self.c6_tour:
+            coeffs[self.c6_tour[i, e]] = 1
+        if (j, e) in self.c7:
+            coeffs[self.c7[j, e]] = 1
+        if i in self.L and (j, e) in self.c7:
+            coeffs[self.c1[i, e]] = 1
+            coeffs[self.c4[i]] = 1
+        if j in self.L and (i, e) in self.c6_tour:
+            coeffs[self.c2[j, e]] = 1
+            coeffs[self.c3[j]] = 1
+
+        self.x[i, j, e] = self.m.addVar(vtype=GRB.BINARY,
+                                        column=gp.Column(list(coeffs.values()), list(coeffs.keys())),
+                                        name=f"x[{i},{j},{e}]")
+
+
+    def _remove_pairs(self, removed: list[tuple[int, int]]):
+        """
+        Removes the assignment variables of the pairs, and for on-site audits their constraints and arcs.
+        The constraints 6 and 10 of an audit are removed with its last pair.
+        """
+        nodes = [*self.O, *self.L]
+        variables = []
+        constraints = []
+        for i, e in removed:
+            variables.append(self.y.pop((i, e)))
+            self.n_pairs[i] -= 1
+            if self.n_pairs[i] == 0:
+                constraints.extend([self.c6.pop(i), self.c10.pop(i)])
+                del self.n_pairs[i]
+            if (i, e) in self.c6_tour:
+                constraints.extend([self.c6_tour.pop((i, e)), self.c7.pop((i, e)), self.c9.pop((i, e)), self.c11.pop((i, e))])
+                for j in nodes:
+                    if (i, j, e) in self.x:
+                        variables.append(self.x.pop((i, j, e)))
+                    if (j, i, e) in self.x:
+                        variables.append(self.x.pop((j, i, e)))
+        self.m.remove(variables)
+        self.m.remove(constraints)
+
+
+    def _add_pairs(self,
+                   added: list[tuple[int, int]],
+                   c: dict[int, dict[int, float]]):
+        """
+        Adds the assignment variables of the pairs, and for on-site audits their constraints and arcs.
+        The constraints 6 and 10 of an audit are added with its first pair.
+        """
+        on_site = set(self.O)
+        for i in dict.fromkeys(i for i, _ in added):
+            if i not in self.c6:
+                self.c6[i] = self.m.addConstr(gp.LinExpr() <= 1)
+                self.c10[i] = self.m.addConstr(gp.LinExpr() <= 0)
+                self.n_pairs[i] = 0
+        self.m.update()
+        for i, e in added:
+            self.n_pairs[i] += 1
+            self.y[i, e] = self.m.addVar(vtype=GRB.BINARY,
+                                         column=gp.Column([1, 1, self.p[i]], [self.c6[i], self.c10[i], self.c8[e]]),
+                                         name=f"y[{i},{e}]")
+        self.m.update()
+        added_on_site = [(i, e) for i, e in added if i in on_site]
+        for i, e in added_on_site:
+            self.c6_tour[i, e] = self.m.addConstr(-self.y[i, e] == 0)
+            self.c7[i, e] = self.m.addConstr(-self.y[i, e] == 0)
+            self.c9[i, e] = self.m.addConstr(self.y[i, e] - self.a[e] <= 0)
+            self.c11[i, e] = self.m.addConstr(gp.LinExpr() == 0)
+        self.m.update()
+
+        # Arcs between the new pairs and the other pairs and depots of the auditor
+        new_nodes = {e: [] for e in self.E}
+        for i, e in added_on_site:
+            new_nodes[e].append(i)
+        for e in self.E:
+            new_set = set(new_nodes[e])
+            old_nodes = [j for j in self.O if (j, e) in self.c6_tour and j not in new_set] + self.L
+            for i in new_nodes[e]:
+                for j in old_nodes:
+                    self._add_arc(i, j, e, c)
+                    self._add_arc(j, i, e, c)
+                for j in new_nodes[e]:
+                    self._add_arc(i, j, e, c)
+
+
+    def _remove_audits(self, removed: list[int]):
+        """
+        Removes the variables and constraints of audits, which are no longer open.
+        """
+        removed_set = set(removed)
+        self._remove_pairs([(i, e) for i, e in self.y.keys() if i in removed_set])
+        for i in removed:
+            del self.p[i]
+        self.V = [i for i in self.V if i not in removed_set]
+        self.O = [i for i in self.O if i not in removed_set]
+
+
+    def _add_audits(self,
+                    added: list[int],
+                    O: list[int],
+                    p: dict[int, float]):
+        """
+        Adds newly released audits. Their variables and constraints are added with their pairs by _add_pairs.
+        """
+        on_site = set(O)
+        for i in added:
+            self.p[i] = p[i]
+        self.V.extend(added)
+        self.O.extend([i for i in added if i in on_site])
+
+
+    def update(self,
+               day: int,
+               t: int,
+               V: list[int],
+               O: list[int],
+               L: list[int],
+               E: list[int],
+               p: dict[int, float],
+               c: dict[int, dict[int, float]],
+               g: dict[int, dict[int, int]],
+               q: dict[int, int],
+               K: dict[int, int],
+               d: dict[int, int],
+               u: dict[int, int],
+               b: dict[int, dict[int, int]]) -> tuple[gp.Model, gp.tupledict, gp.tupledict, gp.tupledict]:
+        """
+        Updates the model to the given day and returns the model and the variables a, y and x.
+        The model is rebuilt from scratch if the depots or the auditors have changed.
+        """
+        if self.m is None or list(L) != self.L or list(E) != self.E or b != self.b:
+            self._build_empty(L, E, b)
+
+        open_audits = set(V)
+        removed = [i for i in self.V if i not in open_audits]
+        current = set(self.V)
+        added = [i for i in V if i not in current]
+        self._remove_audits(removed)
+        self._add_audits(added, O, p)
+
+        # Pairs, which are no longer assignable, are removed, and the new pairs are added
+        g = get_assignable(t, self.V, self.E, g, d)
+        pairs = [(self.V[i], self.E[e]) for i, e in zip(*get_assignment_pairs(self.V, self.E, g))]
+        pair_set = set(pairs)
+        removed_pairs = [pair for pair in self.y.keys() if pair not in pair_set]
+        added_pairs = [pair for pair in pairs if pair not in self.y]
+        print(f"Incremental model: removing {len(removed)} audits and {len(removed_pairs)} pairs, "
+              f"adding {len(added)} audits and {len(added_pairs)} pairs")
+        self._remove_pairs(removed_pairs)
+        self._add_pairs(added_pairs, c)
+
+        # Right-hand sides and coefficients, which change from day to day
+        for i in self.c10:
+            self.c10[i].RHS = max(d[i] - t, 0)
+        for i in self.V:
+            if p[i] != self.p[i]:
+                for e in self.E:
+                    if (i, e) in self.y:
+                        self.m.chgCoeff(self.c8[e], self.y[i, e], p[i])
+                self.p[i] = p[i]
+        for (i, e), variable in self.y.items():
+            variable.Obj = 1/u[i]
+        for e in self.E:
+            self.c8[e].RHS = q[e]
+        for l in self.L:
+            self.c3[l].RHS = K[l]
+            self.c4[l].RHS = K[l]
+
+        # Arcs, which are infeasible today (holidays and capacity), are fixed to 0
+        N = [*self.O, *self.L]
+        feasible = {(N[i], N[j], self.E[e]) for i, j, e in zip(*get_feasible_arcs(self.O, self.L, self.E, p, c, g, q, b))}
+        arcs = list(self.x.keys())
+        self.m.setAttr("UB", [self.x[arc] for arc in arcs], [1 if arc in feasible else 0 for arc in arcs])
+        print(f"Arcs: {len(feasible)} of {len(arcs)} open")
+
+        self.m.ModelName = f"Danzig-fuller-day-{day}"
+        set_subtour_data(self.m, self.x, self.L, self.E)
+        return self.m, self.a, self.y, self.x
+
+
+#########
+# Solve #
+#########
+def solve_daily_model(m: gp.Model,
+                      V: list[int],
+                      O: list[int],
+                      E: list[int],
+                      solve_policy: dict = None,
+                      gurobi_params: dict = None) -> str:
+    """
+    Solves a daily model with lazy subtour elimination constraints.
+    solve_policy sets the time limit, MIP gap and stall rules (see modules.optimization.solve_policy).
+    gurobi_params are extra Gurobi parameters, e.g. Threads or LogFile.
+    Returns the termination rule, which ended the solve.
+    """
+    m.Params.lazyConstraints = 1
+    apply_solve_policy(m, get_solve_policy(solve_policy), V, O, E)
+    if gurobi_params is not None:
+        for param, value in gurobi_params.items():
+            m.setParam(param, value)
+    m.optimize(solve_callback)
+    termination = get_termination_rule(m)
+    print(f"Solver time: {m.Runtime:.2f} seconds, of which {m._callback_time:.2f} seconds in the subtour callback ({m._lazy_cuts} lazy cuts)")
+    print(f"Termination: {termination}")
+    return termination
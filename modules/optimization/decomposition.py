@@ -0,0 +1,132 @@
+###########
+# Imports #
+###########
+# Output
+import io
+from contextlib import redirect_stdout
+
+# Optimization
+from modules.optimization.heuristic import DailyHeuristic
+
+
+#################
+# Decomposition #
+#################
+# Auditors belong to one depot (b) and the vehicles K[l] are local to the depot, so only constraint 6
+# (no more than one auditor per audit) couples the depots. The day is split into one subproblem per depot,
+# which has the depot's auditors and the audits assigned to it. The subproblems are solved independently, and
+# audits scheduled by more than one depot are repaired afterwards with DailyHeuristic.
+
+
+#############
+# Functions #
+#############
+def get_depot_auditors(L: list[int], E: list[int], b: dict[int, dict[int, int]]) -> dict[int, list[int]]:
+    """
+    Returns the auditors of each depot.
+    """
+    return {l: [e for e in E if b[l][e] == 1] for l in L}
+
+
+def assign_audits(t: int,
+                  V: list[int],
+                  O: list[int],
+                  L: list[int],
+                  E: list[int],
+                  p: dict[int, float],
+                  c: dict[int, dict[int, float]],
+                  g: dict[int, dict[int, int]],
+                  q: dict[int, int],
+                  d: dict[int, int],
+                  b: dict[int, dict[int, int]],
+                  master: DailyHeuristic = None,
+                  depots_per_audit: int = 2) -> dict[int, list[int]]:
+    """
+    Returns the candidate audits of each depot (in the order of V). Audits, which cannot be scheduled today (d[i] - t < 1), are left out.
+    An on-site audit goes to the depots_per_audit nearest depots with a skilled auditor, who can reach it within the capacity q.
+    An off-site audit goes to every depot with a skilled auditor. Audits scheduled by more than one depot are resolved in the repair.
+    With a master schedule (a solved DailyHeuristic for the whole day), the scheduled audits go to the depot of their auditor instead.
+    """
+    depot_auditors = get_depot_auditors(L, E, b)
+    on_site = set(O)
+
+    master_depot = {}
+    if master is not None:
+        for e in E:
+            for i in master.routes[e] + master.off_site[e]:
+                master_depot[i] = master.depot[e]
+
+    candidates = {l: [] for l in L}
+    for i in V:
+        if d[i] - t < 1:
+            continue
+        if i in master_depot:
+            candidates[master_depot[i]].append(i)
+            continue
+        if i in on_site:
+            reachable = [l for l in L
+                         if any(g[e][i] == 1 and c[l][i] + p[i] + c[i][l] <= q[e] + 1e-6 for e in depot_auditors[l])]
+            if len(reachable) > 0:
+                for l in sorted(reachable, key = lambda l: c[l][i])[:depots_per_audit]:
+                    candidates[l].append(i)
+        else:
+            for l in L:
+                if any(g[e][i] == 1 and p[i] <= q[e] for e in depot_auditors[l]):
+                    candidates[l].append(i)
+    return candidates
+
+
+def get_subproblem(l: int,
+                   audits: list[int],
+                   auditors: list[int],
+                   V: list[int],
+                   O: list[int],
+                   p: dict[int, float],
+                   c: dict[int, dict[int, float]],
+                   g: dict[int, dict[int, int]],
+                   q: dict[int, int],
+                   K: dict[int, int],
+                   d: dict[int, int],
+                   u: dict[int, int],
+                   b: dict[int, dict[int, int]]) -> tuple:
+    """
+    Returns the sets and parameters (V, O, L, E, p, c, g, q, K, d, u, b) of the subproblem of a depot.
+    """
+    audit_set = set(audits)
+    V_s = [i for i in V if i in audit_set]
+    O_s = [i for i in O if i in audit_set]
+    N_s = [*O_s, l]
+    return (V_s,
+            O_s,
+            [l],
+            list(auditors),
+            {i: p[i] for i in V_s},
+            {i: {j: c[i][j] for j in N_s} for i in N_s},
+            {e: {i: g[e][i] for i in V_s} for e in auditors},
+            {e: q[e] for e in auditors},
+            {l: K[l]},
+            {i: d[i] for i in V_s},
+            {i: u[i] for i in V_s},
+            {l: {e: b[l][e] for e in auditors}})
+
+
+def solve_subproblem(day: int, t: int, subproblem: tuple, solver_backend: str, backend_args: dict) -> dict:
+    """
+    Solves the subproblem of a depot with a backend. This runs in a worker process, so the backend is created here
+    and the printed output is returned with the solution.
+    """
+    # Imported here, because the backends import this module
+    from modules.optimization.backends import get_backend
+
+    output = io.StringIO()
+    with redirect_stdout(output):
+        backend = get_backend(solver_backend, **backend_args)
+        backend.build(day, t, *subproblem)
+        termination = backend.solve()
+        route_dict, audit_dict = backend.get_solution()
+    return {"termination": termination,
+            "obj_val": backend.obj_val,
+            "route_dict": route_dict,
+            "audit_dict": audit_dict,
+            "solve_stats": backend.get_solve_stats(),
+            "output": output.getvalue()}
@@ -0,0 +1,236 @@
+###########
+# Imports #
+###########
+# Data
+import numpy as np
+import scipy.sparse as sp
+from modules.optimization.arcs import get_feasible_arcs
+
+
+###############
+# Formulation #
+###############
+# The daily model as sparse matrices, which do not depend on a solver.
+# y[i, e] only exists for the pairs from get_assignment_pairs: auditor e may take audit i (g[e][i] == 1), and i is not due
+# today or overdue (d[i] - t >= 1, constraint 10). With candidate auditors (see modules.optimization.candidates) g only
+# has the candidate pairs, so the pruned pairs have no variables. Constraint 5 holds by construction.
+# The variables are ordered as gurobipy's addVars orders them:
+#   a[e]         at                 e
+#   y[i, e]      at y_offset + k,  where (i, e) is pair k
+#   x[i, j, e]   at x_offset + k,  where (i, j, e) is arc k from get_feasible_arcs and N = [*O, *L]
+# The rows follow constraint 1-11 in build_daily_model_iterative and have the bounds row_lower <= A @ z <= row_upper.
+# Constraint 6 and 10 only have rows for audits with a pair, and constraint 6, 7, 9 and 11 only for the pairs of on-site audits.
+
+
+#############
+# Functions #
+#############
+def _entries(rows: np.ndarray, cols: np.ndarray, vals) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Broadcasts row indices, column indices and values to the same shape and flattens them.
+    """
+    rows, cols, vals = np.broadcast_arrays(rows, cols, vals)
+    return rows.ravel(), cols.ravel(), vals.ravel().astype(float)
+
+
+def get_assignable(t: int,
+                   V: list[int],
+                   E: list[int],
+                   g: dict[int, dict[int, int]],
+                   d: dict[int, int]) -> dict[int, dict[int, int]]:
+    """
+    Returns g without the audits, which are due today or overdue (they cannot be scheduled by constraint 10).
+    """
+    return {e: {i: g[e][i] if d[i] - t >= 1 else 0 for i in V} for e in E}
+
+
+def get_assignment_pairs(V: list[int],
+                         E: list[int],
+                         g: dict[int, dict[int, int]]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the positions in V and E of the pairs (i, e) with g[e][i] == 1 (the y variables), ordered by i and e.
+    """
+    G = np.array([[g[e][i] for e in E] for i in V], dtype=float).reshape(len(V), len(E))
+    pair_audit, pair_auditor = np.nonzero(G >= 1)
+    return pair_audit, pair_auditor
+
+
+def get_model_size(t: int,
+                   V: list[int],
+                   O: list[int],
+                   L: list[int],
+                   E: list[int],
+                   p: dict[int, float],
+                   c: dict[int, dict[int, float]],
+                   g: dict[int, dict[int, int]],
+                   q: dict[int, int],
+                   d: dict[int, int],
+                   b: dict[int, dict[int, int]]) -> tuple[int, int]:
+    """
+    Returns the number of variables and rows of the daily model without building it.
+    """
+    g = get_assignable(t, V, E, g, d)
+    pair_audit, _ = get_assignment_pairs(V, E, g)
+    on_site = np.isin(np.array(V), np.array(O))
+    n_pairs, n_on_site_pairs = len(pair_audit), int(on_site[pair_audit].sum())
+    n_audits = len(np.unique(pair_audit))
+    n_arcs = len(get_feasible_arcs(O, L, E, p, c, g, q, b)[0])
+    nL, nE = len(L), len(E)
+    n_vars = nE + n_pairs + n_arcs
+    n_rows = 2 * nE * nL + 2 * nL + 2 * n_audits + 3 * n_on_site_pairs + nE + n_on_site_pairs + nL * nE
+    return n_vars, n_rows
+
+
+def build_daily_matrices(t: int,
+                         V: list[int],
+                         O: list[int],
+                         L: list[int],
+                         E: list[int],
+                         p: dict[int, float],
+                         c: dict[int, dict[int, float]],
+                         g: dict[int, dict[int, int]],
+                         q: dict[int, int],
+                         K: dict[int, int],
+                         d: dict[int, int],
+                         u: dict[int, int],
+                         b: dict[int, dict[int, int]]) -> dict:
+    """
+    Builds the objective, bounds and constraint matrix of the daily model in bulk with NumPy and scipy.sparse.
+    Returns a dictionary with the arrays and the index layout of the variables.
+    """
+    g = get_assignable(t, V, E, g, d)
+    N = [*O, *L]
+    nV, nO, nL, nE, nN = len(V), len(O), len(L), len(E), len(N)
+    arc_from, arc_to, arc_auditor = get_feasible_arcs(O, L, E, p, c, g, q, b)
+    pair_audit, pair_auditor = get_assignment_pairs(V, E, g)
+    nA, nP = len(arc_from), len(pair_audit)
+    y_offset = nE
+    x_offset = nE + nP
+    n_vars = x_offset + nA
+
+    e_pos = np.arange(nE)
+    v_index = {i: n for n, i in enumerate(V)}
+    o_in_v = np.array([v_index[i] for i in O], dtype=np.int64)
+
+    def a_var(e):
+        return e
+
+    y_vars = y_offset + np.arange(nP)
+    x_vars = x_offset + np.arange(nA)
+    from_depot = arc_from >= nO
+    to_depot = arc_to >= nO
+
+    # The pairs of on-site audits (ordered by audit and auditor) and the pair of each (audit, auditor) in N x E
+    v_to_o = np.full(nV, -1, dtype=np.int64)
+    v_to_o[o_in_v] = np.arange(nO)
+    on_site_pairs = np.flatnonzero(v_to_o[pair_audit] >= 0)
+    nOP = len(on_site_pairs)
+    pair_o = v_to_o[pair_audit[on_site_pairs]]
+    on_site_pair_row = np.full((nO, nE), -1, dtype=np.int64)
+    on_site_pair_row[pair_o, pair_auditor[on_site_pairs]] = np.arange(nOP)
+
+    # Audits with at least one pair (constraint 6 and 10)
+    audits, audit_row = np.unique(pair_audit, return_inverse=True)
+    nR = len(audits)
+
+    # Parameters as arrays
+    B = np.array([[b[l][e] for e in E] for l in L], dtype=float).reshape(nL, nE)
+    C = np.array([[c[i][j] for j in N] for i in N], dtype=float).reshape(nN, nN)
+    P = np.array([p[i] for i in V], dtype=float)
+    D = np.array([d[i] - t for i in V], dtype=float)
+
+    # Objective and bounds (the audits of the pairs are not due today or overdue)
+    obj = np.zeros(n_vars)
+    obj[y_vars] = np.array([1 / u[i] for i in V], dtype=float)[pair_audit]
+    ub = np.ones(n_vars)
+
+    rows, cols, vals, lower, upper = [], [], [], [], []
+    n_rows = 0
+
+    def add_block(block_rows, block_cols, block_vals):
+        r, cl, v = _entries(block_rows + n_rows, block_cols, block_vals)
+        rows.append(r)
+        cols.append(cl)
+        vals.append(v)
+
+    def add_bounds(block_lower, block_upper, size):
+        nonlocal n_rows
+        lower.append(np.broadcast_to(np.asarray(block_lower, dtype=float).ravel(), (size,)))
+        upper.append(np.broadcast_to(np.asarray(block_upper, dtype=float).ravel(), (size,)))
+        n_rows += size
+
+    # Constraint 1 and 2: Leave and return once from the designated depot (rows e, l)
+    # Arcs between depots are never feasible, so the other end of a depot arc is an audit
+    r = (e_pos[:, None] * nL + np.arange(nL)[None, :])
+    for depot_arcs, depot in ((from_depot, arc_from), (to_depot, arc_to)):
+        add_block(arc_auditor[depot_arcs] * nL + depot[depot_arcs] - nO, x_vars[depot_arcs], 1)
+        add_block(r, a_var(e_pos)[:, None], -B.T)
+        add_bounds(0, 0, nE * nL)
+
+    # Constraint 3 and 4: Respect vehicle capacity when leaving and returning (rows l)
+    K_arr = np.array([K[l] for l in L], dtype=float)
+    add_block(arc_to[to_depot] - nO, x_vars[to_depot], 1)
+    add_bounds(-np.inf, K_arr, nL)
+    add_block(arc_from[from_depot] - nO, x_vars[from_depot], 1)
+    add_bounds(-np.inf, K_arr, nL)
+
+    # Constraint 5: Respect skill levels holds, since y only exists for the pairs
+
+    # Constraint 6: No more than 1 audit (rows i with a pair)
+    add_block(audit_row, y_vars, 1)
+    add_bounds(-np.inf, 1, nR)
+
+    # Constraint 6 and 7: Create tour from --> to and to --> from (rows of the on-site pairs)
+    for audit_arcs, audit in ((~from_depot, arc_from), (~to_depot, arc_to)):
+        add_block(on_site_pair_row[audit[audit_arcs], arc_auditor[audit_arcs]], x_vars[audit_arcs], 1)
+        add_block(np.arange(nOP), y_vars[on_site_pairs], -1)
+        add_bounds(0, 0, nOP)
+
+    # Constraint 8: Do not go above employee capacity (rows e)
+    add_block(arc_auditor, x_vars, C[arc_from, arc_to])
+    add_block(pair_auditor, y_vars, P[pair_audit])
+    add_bounds(-np.inf, np.array([q[e] for e in E], dtype=float), nE)
+
+    # Constraint 9: Create assignment variable (rows of the on-site pairs ordered by auditor and audit)
+    by_auditor = np.lexsort((pair_o, pair_auditor[on_site_pairs]))
+    r = np.empty(nOP, dtype=np.int64)
+    r[by_auditor] = np.arange(nOP)
+    add_block(r, y_vars[on_site_pairs], 1)
+    add_block(r, a_var(pair_auditor[on_site_pairs]), -1)
+    add_bounds(-np.inf, 0, nOP)
+
+    # Constraint 10: Force y to 1 (rows i with a pair)
+    add_block(audit_row, y_vars, 1)
+    add_bounds(-np.inf, D[audits], nR)
+
+    # Constraint 11: Conserve flow (rows of the on-site pairs, then rows l, e)
+    node_row = np.concatenate([on_site_pair_row, nOP + np.arange(nL * nE).reshape(nL, nE)])
+    add_block(node_row[arc_to, arc_auditor], x_vars, 1)
+    add_block(node_row[arc_from, arc_auditor], x_vars, -1)
+    add_bounds(0, 0, nOP + nL * nE)
+
+    A = sp.csr_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))), shape=(n_rows, n_vars))
+    A.sum_duplicates()
+    A.eliminate_zeros()
+
+    return {
+        "obj": obj,
+        "lb": np.zeros(n_vars),
+        "ub": ub,
+        "A": A,
+        "row_lower": np.concatenate(lower),
+        "row_upper": np.concatenate(upper),
+        "V": list(V),
+        "O": list(O),
+        "L": list(L),
+        "E": list(E),
+        "nodes": N,
+        "y_offset": y_offset,
+        "x_offset": x_offset,
+        "pair_audit": pair_audit,
+        "pair_auditor": pair_auditor,
+        "arc_from": arc_from,
+        "arc_to": arc_to,
+        "arc_auditor": arc_auditor,
+        "is_depot": np.arange(nN) >= nO
+    }
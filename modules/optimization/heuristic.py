@@ -0,0 +1,490 @@
+###########
+# Imports #
+###########
+# Timing
+import time
+
+
+#############
+# Heuristic #
+#############
+class DailyHeuristic:
+    """
+    Schedules the audits of a day without a MIP solver. It takes the same inputs as build_daily_model.
+    The routes are built with regret insertion: the audit with the highest objective value 1/u is inserted first,
+    and among equal values the one, which loses the most if it is not given its best auditor.
+    They are then improved with 2-opt, relocate and swap moves, which shorten the routes, and with moves that insert more audits:
+    relocating an audit to make room, replacing an audit with a more urgent one, and exchanging the work of two auditors.
+    Finally, the audits of single auditors and depots are removed and reinserted (ruin and recreate).
+    Every move respects skills, the auditors' capacity q, the vehicles K at each depot and d[i] - t >= 1 (constraint 10).
+    The objective is the same as in the daily model: the sum of 1/u[i] over the scheduled audits.
+    """
+    def __init__(self, t, V, O, L, E, p, c, g, q, K, d, u, b, time_limit: float = 10):
+        self.V, self.O, self.L, self.E = list(V), list(O), list(L), list(E)
+        self.p, self.c, self.g, self.q, self.K = p, c, g, q, K
+        self.time_limit = time_limit
+        self.on_site = set(O)
+        self.depot = {e: next((l for l in L if b[l][e] == 1), None) for e in E}
+        self.profit = {i: 1 / u[i] for i in V if d[i] - t >= 1}
+        self._reset()
+
+
+    def _reset(self):
+        """
+        Starts from an empty schedule.
+        """
+        self.routes = {e: [] for e in self.E}
+        self.off_site = {e: [] for e in self.E}
+        self.used = {e: 0.0 for e in self.E}
+        self.vehicles = {l: 0 for l in self.L}
+        self.unassigned = [i for i in self.V if i in self.profit]
+
+
+    def _get_state(self) -> tuple:
+        """
+        Returns a copy of the schedule.
+        """
+        return ({e: list(route) for e, route in self.routes.items()},
+                {e: list(audits) for e, audits in self.off_site.items()},
+                dict(self.used), dict(self.vehicles), list(self.unassigned))
+
+
+    def _set_state(self, state: tuple):
+        """
+        Restores a schedule from _get_state.
+        """
+        routes, off_site, used, vehicles, unassigned = state
+        self.routes = {e: list(route) for e, route in routes.items()}
+        self.off_site = {e: list(audits) for e, audits in off_site.items()}
+        self.used, self.vehicles, self.unassigned = dict(used), dict(vehicles), list(unassigned)
+
+
+    ###########
+    # Helpers #
+    ###########
+    def _can_do(self, i: int, e: int) -> bool:
+        """
+        Returns True if the auditor is skilled for the audit and, for on-site audits, has a depot.
+        """
+        if self.g[e][i] < 1 or self.q[e] <= 0:
+            return False
+        return i not in self.on_site or self.depot[e] is not None
+
+
+    def _travel(self, route: list[int], l: int) -> float:
+        """
+        Returns the travel time of a route, which starts and ends at the depot l.
+        """
+        if len(route) == 0:
+            return 0.0
+        nodes = [l, *route, l]
+        return sum(self.c[i][j] for i, j in zip(nodes[:-1], nodes[1:]))
+
+
+    def _route_time(self, e: int, route: list[int], off_site: list[int]) -> float:
+        """
+        Returns the travel and audit time of an auditor.
+        """
+        return self._travel(route, self.depot[e]) + sum(self.p[i] for i in route) + sum(self.p[i] for i in off_site)
+
+
+    def _vehicle_free(self, e: int) -> bool:
+        """
+        Returns True if the auditor already has a tour or a vehicle is available at the auditor's depot.
+        """
+        return len(self.routes[e]) > 0 or self.vehicles[self.depot[e]] < self.K[self.depot[e]]
+
+
+    def _best_insertion(self, i: int, e: int, route: list[int] = None, used: float = None) -> tuple[float, int]:
+        """
+        Returns the added time and the position of the cheapest feasible insertion of an audit, or None.
+        """
+        route = self.routes[e] if route is None else route
+        used = self.used[e] if used is None else used
+        if not self._can_do(i, e):
+            return None
+        if i not in self.on_site:
+            delta, pos = self.p[i], -1
+        elif len(route) == 0:
+            if route is self.routes[e] and not self._vehicle_free(e):
+                return None
+            l = self.depot[e]
+            delta, pos = self.c[l][i] + self.p[i] + self.c[i][l], 0
+        else:
+            nodes = [self.depot[e], *route, self.depot[e]]
+            delta, pos = min((self.c[a][i] + self.c[i][b] - self.c[a][b], n) for n, (a, b) in enumerate(zip(nodes[:-1], nodes[1:])))
+            delta += self.p[i]
+        if used + delta > self.q[e] + 1e-9:
+            return None
+        return delta, pos
+
+
+    def _insert(self, i: int, e: int, pos: int):
+        """
+        Inserts an audit at a position in an auditor's route (or in the off-site audits).
+        """
+        if i in self.on_site:
+            if len(self.routes[e]) == 0:
+                self.vehicles[self.depot[e]] += 1
+            self.routes[e].insert(pos, i)
+        else:
+            self.off_site[e].append(i)
+        self.used[e] = self._route_time(e, self.routes[e], self.off_site[e])
+        if i in self.unassigned:
+            self.unassigned.remove(i)
+
+
+    def _remove(self, i: int, e: int):
+        """
+        Removes an audit from an auditor.
+        """
+        if i in self.on_site:
+            self.routes[e].remove(i)
+            if len(self.routes[e]) == 0:
+                self.vehicles[self.depot[e]] -= 1
+        else:
+            self.off_site[e].remove(i)
+        self.used[e] = self._route_time(e, self.routes[e], self.off_site[e])
+
+
+    def _audits(self, e: int) -> list[int]:
+        """
+        Returns all audits of an auditor.
+        """
+        return [*self.routes[e], *self.off_site[e]]
+
+
+    ################
+    # Construction #
+    ################
+    def construct(self, strategy: str = "profit"):
+        """
+        Inserts the unassigned audits until no audit fits. The next audit is chosen by
+            profit: the objective value 1/u, then the regret, then the cheapest insertion.
+            ratio:  the objective value per hour of added time, then the objective value, then the regret.
+        The cheapest insertions are cached per auditor and only recomputed for auditors, whose routes changed.
+        """
+        cache = {e: {i: self._best_insertion(i, e) for i in self.unassigned} for e in self.E}
+        while True:
+            best = None
+            for i in self.unassigned:
+                # Equal insertions go to the auditor with the most time left
+                options = sorted((cache[e][i][0], self.used[e] - self.q[e], e) for e in self.E if cache[e][i] is not None)
+                if len(options) == 0:
+                    continue
+                regret = options[1][0] - options[0][0] if len(options) > 1 else float("inf")
+                if strategy == "profit":
+                    key = (self.profit[i], regret, -options[0][0])
+                else:
+                    key = (self.profit[i] / max(options[0][0], 1e-9), self.profit[i], regret)
+                if best is None or key > best[0]:
+                    best = (key, i, options[0][2])
+            if best is None:
+                return
+
+            _, i, e = best
+            self._insert(i, e, cache[e][i][1])
+            # A new tour can use the last vehicle at the depot, which changes the other auditors' insertions
+            changed = [e2 for e2 in self.E if e2 == e or (self.depot[e2] == self.depot[e] and len(self.routes[e2]) == 0)]
+            for e2 in changed:
+                cache[e2] = {j: self._best_insertion(j, e2) for j in self.unassigned}
+
+
+    ################
+    # Local search #
+    ################
+    def _two_opt(self, e: int) -> bool:
+        """
+        Reverses segments of a route while it gets shorter. Returns True if the route was improved.
+        """
+        route = self.routes[e]
+        l = self.depot[e]
+        improved = False
+        found = True
+        while found:
+            found = False
+            nodes = [l, *route, l]
+            for a in range(len(nodes) - 2):
+                for b in range(a + 2, len(nodes) - 1):
+                    change = (self.c[nodes[a]][nodes[b]] + self.c[nodes[a + 1]][nodes[b + 1]]
+                              - self.c[nodes[a]][nodes[a + 1]] - self.c[nodes[b]][nodes[b + 1]])
+                    if change < -1e-9:
+                        nodes[a + 1:b + 1] = reversed(nodes[a + 1:b + 1])
+                        found = improved = True
+            route[:] = nodes[1:-1]
+        self.used[e] = self._route_time(e, route, self.off_site[e])
+        return improved
+
+
+    def _relocate(self) -> bool:
+        """
+        Moves on-site audits to other auditors, if it shortens the total travel time. Returns True if a move was made.
+        """
+        improved = False
+        for e1 in self.E:
+            for i in list(self.routes[e1]):
+                without = [j for j in self.routes[e1] if j != i]
+                saving = self.used[e1] - self._route_time(e1, without, self.off_site[e1])
+                for e2 in self.E:
+                    if e2 == e1:
+                        continue
+                    insertion = self._best_insertion(i, e2)
+                    if insertion is not None and insertion[0] < saving - 1e-9:
+                        self._remove(i, e1)
+                        self._insert(i, e2, insertion[1])
+                        improved = True
+                        break
+        return improved
+
+
+    def _swap(self) -> bool:
+        """
+        Exchanges on-site audits between two auditors, if it shortens the total travel time. Returns True if a swap was made.
+        """
+        improved = False
+        for n, e1 in enumerate(self.E):
+            for e2 in self.E[n + 1:]:
+                for i in list(self.routes[e1]):
+                    for j in list(self.routes[e2]):
+                        if (i not in self.routes[e1] or j not in self.routes[e2]
+                                or not self._can_do(i, e2) or not self._can_do(j, e1)):
+                            continue
+                        route1 = [j if k == i else k for k in self.routes[e1]]
+                        route2 = [i if k == j else k for k in self.routes[e2]]
+                        used1 = self._route_time(e1, route1, self.off_site[e1])
+                        used2 = self._route_time(e2, route2, self.off_site[e2])
+                        if (used1 <= self.q[e1] + 1e-9 and used2 <= self.q[e2] + 1e-9
+                                and used1 + used2 < self.used[e1] + self.used[e2] - 1e-9):
+                            self.routes[e1][:] = route1
+                            self.routes[e2][:] = route2
+                            self.used[e1], self.used[e2] = used1, used2
+                            improved = True
+        return improved
+
+
+    def _make_room(self) -> bool:
+        """
+        Inserts unassigned audits by first moving one of the auditor's audits to another auditor.
+        Returns True if an audit was inserted.
+        """
+        improved = False
+        for i in sorted(self.unassigned, key=lambda i: -self.profit[i]):
+            done = False
+            for e in self.E:
+                if done or not self._can_do(i, e):
+                    continue
+                for j in self._audits(e):
+                    route = [k for k in self.routes[e] if k != j]
+                    off_site = [k for k in self.off_site[e] if k != j]
+                    # The auditor keeps the tour (and the vehicle), if i is on-site
+                    if i in self.on_site and len(route) == 0 and not self._vehicle_free(e):
+                        continue
+                    insertion_i = self._best_insertion(i, e, route, self._route_time(e, route, off_site))
+                    if insertion_i is None:
+                        continue
+                    target = next((e2 for e2 in self.E if e2 != e and self._best_insertion(j, e2) is not None), None)
+                    if target is None:
+                        continue
+                    self._remove(j, e)
+                    insertion_i = self._best_insertion(i, e)
+                    if insertion_i is None:
+                        self._insert(j, e, self._best_insertion(j, e)[1])
+                        continue
+                    self._insert(i, e, insertion_i[1])
+                    insertion_j = self._best_insertion(j, target)
+                    if insertion_j is None:
+                        # Undo, if the move used the vehicle, which j needed
+                        self._remove(i, e)
+                        self.unassigned.append(i)
+                        self._insert(j, e, self._best_insertion(j, e)[1])
+                        continue
+                    self._insert(j, target, insertion_j[1])
+                    done = improved = True
+                    break
+        return improved
+
+
+    def _swap_in(self) -> bool:
+        """
+        Replaces scheduled audits with unassigned audits, which have a higher objective value. Returns True if a swap was made.
+        """
+        improved = False
+        for i in sorted(self.unassigned, key=lambda i: -self.profit[i]):
+            for e in self.E:
+                if i not in self.unassigned or not self._can_do(i, e):
+                    continue
+                for j in sorted(self._audits(e), key=lambda j: self.profit[j]):
+                    if self.profit[j] >= self.profit[i] - 1e-12:
+                        break
+                    self._remove(j, e)
+                    insertion = self._best_insertion(i, e)
+                    if insertion is None:
+                        self._insert(j, e, self._best_insertion(j, e)[1])
+                        continue
+                    self._insert(i, e, insertion[1])
+                    self.unassigned.append(j)
+                    improved = True
+                    break
+        return improved
+
+
+    def _exchange(self, strategy: str) -> bool:
+        """
+        Exchanges all audits between two auditors, e.g. to give a tour to the auditor with the most capacity,
+        and keeps the exchange if more audits can then be inserted. Returns True if an exchange was kept.
+        """
+        improved = False
+        for n, e1 in enumerate(self.E):
+            for e2 in self.E[n + 1:]:
+                if self.depot[e1] != self.depot[e2] or len(self._audits(e1)) + len(self._audits(e2)) == 0:
+                    continue
+                audits1, audits2 = self._audits(e1), self._audits(e2)
+                if not all(self._can_do(i, e2) for i in audits1) or not all(self._can_do(i, e1) for i in audits2):
+                    continue
+                if self.used[e1] > self.q[e2] + 1e-9 or self.used[e2] > self.q[e1] + 1e-9:
+                    continue
+                state, objective = self._get_state(), self.objective
+                self.routes[e1], self.routes[e2] = self.routes[e2], self.routes[e1]
+                self.off_site[e1], self.off_site[e2] = self.off_site[e2], self.off_site[e1]
+                self.used[e1], self.used[e2] = self.used[e2], self.used[e1]
+                self.construct(strategy)
+                if self.objective > objective + 1e-12:
+                    improved = True
+                else:
+                    self._set_state(state)
+        return improved
+
+
+    def improve(self, start_time: float, strategy: str = "profit"):
+        """
+        Applies the local search moves until none of them improves the solution or the time limit is reached.
+        """
+        while time.perf_counter() - start_time < self.time_limit:
+            improved = False
+            for e in self.E:
+                improved |= self._two_opt(e)
+            improved |= self._relocate()
+            improved |= self._swap()
+            n_unassigned = len(self.unassigned)
+            self.construct(strategy)
+            improved |= len(self.unassigned) < n_unassigned
+            improved |= self._make_room()
+            improved |= self._swap_in()
+            improved |= self._exchange(strategy)
+            if not improved:
+                return
+
+
+    def _ruin_and_recreate(self, start_time: float, strategy: str):
+        """
+        Unassigns all audits of one auditor (or of all auditors at one depot), rebuilds and improves the schedule,
+        and keeps it if the objective is better.
+        When a depot is rebuilt, each of its auditors in turn gets the first tour, since the vehicles decide who can go on-site.
+        """
+        trials = [([e], None) for e in self.E]
+        for l in self.L:
+            group = [e for e in self.E if self.depot[e] == l]
+            trials += [(group, None)] + [(group, e) for e in group]
+        for group, first in trials:
+            if time.perf_counter() - start_time >= self.time_limit:
+                return
+            if not any(len(self._audits(e)) > 0 for e in group):
+                continue
+            state, objective = self._get_state(), self.objective
+            for e in group:
+                for i in self._audits(e):
+                    self._remove(i, e)
+                    self.unassigned.append(i)
+            if first is not None:
+                candidates = [i for i in self.unassigned if i in self.on_site and self._best_insertion(i, first) is not None]
+                if len(candidates) > 0:
+                    i = max(candidates, key=lambda i: self.profit[i])
+                    self._insert(i, first, 0)
+            self.construct(strategy)
+            self.improve(start_time, strategy)
+            if self.objective <= objective + 1e-12:
+                self._set_state(state)
+
+
+    def solve(self) -> float:
+        """
+        Builds and improves a schedule for each construction strategy and keeps the best one.
+        Returns the objective value.
+        """
+        start_time = time.perf_counter()
+        best = None
+        for strategy in ["profit", "ratio"]:
+            self._reset()
+            self.construct(strategy)
+            self.improve(start_time, strategy)
+            self._ruin_and_recreate(start_time, strategy)
+            if best is None or self.objective > best[0] + 1e-12:
+                best = (self.objective, self._get_state())
+        self._set_state(best[1])
+        self.runtime = time.perf_counter() - start_time
+        return self.objective
+
+
+    def set_solution(self, route_dict: dict[int, list[tuple[int, int]]], audit_dict: dict[int, list[int]]):
+        """
+        Starts from a given schedule, e.g. the merged schedules of the depots in the decomposition.
+        The routes are lists of arcs in any order. An audit, which is scheduled more than once, is kept with the first auditor in E.
+        Removing an audit from a route never makes it longer, because the travel times obey the triangle inequality.
+        """
+        self._reset()
+        unassigned = set(self.unassigned)
+        for e in self.E:
+            if e not in route_dict:
+                continue
+            successor = dict(route_dict[e])
+            route = []
+            node = successor.get(self.depot[e])
+            while node is not None and node != self.depot[e] and node not in route:
+                route.append(node)
+                node = successor.get(node)
+            self.routes[e] = [i for i in route if i in unassigned]
+            unassigned -= set(self.routes[e])
+            self.off_site[e] = [i for i in audit_dict[e] if i not in self.on_site and i in unassigned]
+            unassigned -= set(self.off_site[e])
+            self.used[e] = self._route_time(e, self.routes[e], self.off_site[e])
+            if len(self.routes[e]) > 0:
+                self.vehicles[self.depot[e]] += 1
+        self.unassigned = [i for i in self.unassigned if i in unassigned]
+
+
+    def repair(self) -> float:
+        """
+        Improves a schedule from set_solution with the local search, which also inserts the audits, it has left out.
+        Returns the objective value.
+        """
+        start_time = time.perf_counter()
+        self.improve(start_time)
+        self.runtime = time.perf_counter() - start_time
+        return self.objective
+
+
+    ############
+    # Solution #
+    ############
+    @property
+    def objective(self) -> float:
+        """
+        The sum of 1/u over the scheduled audits.
+        """
+        return sum(self.profit[i] for e in self.E for i in self._audits(e))
+
+
+    def get_solution(self) -> tuple[dict[int, list[tuple[int, int]]], dict[int, list[int]]]:
+        """
+        Returns the routes as lists of arcs and the audits of every auditor.
+        The audits are listed in the order of V like in the daily model.
+        """
+        order = {i: n for n, i in enumerate(self.V)}
+        route_dict = {}
+        audit_dict = {}
+        for e in self.E:
+            route = self.routes[e]
+            nodes = [self.depot[e], *route, self.depot[e]] if len(route) > 0 else []
+            route_dict[e] = list(zip(nodes[:-1], nodes[1:]))
+            audit_dict[e] = sorted(self._audits(e), key=lambda i: order[i])
+        return route_dict, audit_dict
@@ -0,0 +1,257 @@
+###########
+# Imports #
+###########
+# Data
+import sqlite3
+import numpy as np
+import scipy.sparse as sp
+from modules.data_retrieval.simulation_context import SimulationContext
+
+# Dates
+from modules.utils.date_utils import get_day_type
+
+# HiGHS solves the window
+try:
+    import highspy
+except ImportError:
+    highspy = None
+
+# Timing
+import time
+
+
+###################
+# Rolling horizon #
+###################
+# Every workday the open audits are planned over a window of the next horizon workdays, and only the first day is committed.
+# The window has no routes: an audit uses its processing time p[i] and the time from its nearest neighbour (another on-site
+# audit or the auditor's depot) of the auditor's capacity q on the day. An auditor with on-site audits uses one of the depot's K vehicles.
+# An audit planned on day k is worth discount^k / u[i], so the plan prefers today, but postpones an audit,
+# which can wait, if that frees today's capacity for an audit, which cannot be done later in the window.
+# The audits planned for a later day are left out of today's model (their y is fixed to 0).
+
+
+class RollingHorizonPlanner:
+    """
+    Plans the open audits over a rolling window of workdays with HiGHS.
+    The capacities of a day are computed once and reused by every window, which contains the day,
+    and the plan of the previous window is the start solution of the next one.
+    """
+    def __init__(self,
+                 horizon: int = 5,
+                 discount: float = 0.9,
+                 time_limit: float = 10,
+                 mip_gap: float = 0.05,
+                 highs_params: dict = None):
+        if highspy is None:
+            raise ImportError("The lookahead needs highspy (pip install highspy)")
+        self.horizon = horizon
+        self.discount = discount
+        self.time_limit = time_limit
+        self.mip_gap = mip_gap
+        self.highs_params = highs_params
+        self.capacity = {}
+        self.previous_plan = {}
+
+
+    def get_window(self,
+                   day: int,
+                   last_day: int,
+                   con: sqlite3.Connection | SimulationContext,
+                   get_capacity) -> list[int]:
+        """
+        Returns the next horizon workdays from day (at most until last_day).
+        get_capacity(day) returns the capacities q and vehicles K of a day, and is only called for days, which are new to the window.
+        """
+        window = []
+        for window_day in range(day, last_day + 1):
+            if len(window) == self.horizon:
+                break
+            if get_day_type(window_day, con) == "workday":
+                window.append(window_day)
+                if window_day not in self.capacity:
+                    self.capacity[window_day] = get_capacity(window_day)
+        for old_day in [old_day for old_day in self.capacity if old_day < day]:
+            del self.capacity[old_day]
+        return window
+
+
+    def plan(self,
+             window: list[int],
+             V: list[int],
+             O: list[int],
+             L: list[int],
+             E: list[int],
+             p: dict[int, float],
+             c: dict[int, dict[int, float]],
+             g: dict[int, dict[int, int]],
+             d: dict[int, int],
+             u: dict[int, int],
+             b: dict[int, dict[int, int]]) -> dict[int, tuple[int, int]]:
+        """
+        Plans the audits over the window and returns the planned day and auditor of each planned audit.
+        """
+        start_time = time.perf_counter()
+        on_site = set(O)
+        depot = {e: next((l for l in L if b[l][e] == 1), None) for e in E}
+        nearest = {i: min([c[i][j] for j in O if j != i], default = np.inf) for i in O}
+
+        # Assignments (audit, auditor, day), which fit the auditor's capacity that day
+        assignments = []
+        for k, window_day in enumerate(window):
+            q_k, _ = self.capacity[window_day]
+            for e in E:
+                if q_k[e] <= 0:
+                    continue
+                for i in V:
+                    if g[e][i] != 1 or d[i] - window_day < 1:
+                        continue
+                    if i in on_site:
+                        if depot[e] is None:
+                            continue
+                        time_used = p[i] + min(nearest[i], c[depot[e]][i])
+                    else:
+                        time_used = p[i]
+                    if time_used <= q_k[e]:
+                        assignments.append((i, e, k, time_used))
+        self.n_assignments = len(assignments)
+        if len(assignments) == 0:
+            self.previous_plan = {}
+            self.runtime = time.perf_counter() - start_time
+            return {}
+
+        # Vehicle use of the auditors with on-site assignments
+        vehicle_use = sorted({(e, k) for i, e, k, _ in assignments if i in on_site})
+        vehicle_index = {key: len(assignments) + n for n, key in enumerate(vehicle_use)}
+        n_vars = len(assignments) + len(vehicle_use)
+        audit_index = {i: n for n, i in enumerate(V)}
+        auditor_index = {e: n for n, e in enumerate(E)}
+        depot_index = {l: n for n, l in enumerate(L)}
+
+        rows, cols, vals, row_upper = [], [], [], []
+        n_rows = 0
+
+        # At most one day and auditor per audit (rows i)
+        for n, (i, e, k, time_used) in enumerate(assignments):
+            rows.append(audit_index[i])
+            cols.append(n)
+            vals.append(1)
+        row_upper += [1] * len(V)
+        n_rows += len(V)
+
+        # Capacity of the auditors (rows k, e)
+        for n, (i, e, k, time_used) in enumerate(assignments):
+            rows.append(n_rows + k * len(E) + auditor_index[e])
+            cols.append(n)
+            vals.append(time_used)
+        row_upper += [self.capacity[window_day][0][e] for window_day in window for e in E]
+        n_rows += len(window) * len(E)
+
+        # On-site audits need the auditor's vehicle (rows n)
+        for n, (i, e, k, time_used) in enumerate(assignments):
+            if i in on_site:
+                rows += [n_rows, n_rows]
+                cols += [n, vehicle_index[e, k]]
+                vals += [1, -1]
+                row_upper.append(0)
+                n_rows += 1
+
+        # Vehicles at each depot (rows k, l)
+        for e, k in vehicle_use:
+            rows.append(n_rows + k * len(L) + depot_index[depot[e]])
+            cols.append(vehicle_index[e, k])
+            vals.append(1)
+        row_upper += [self.capacity[window_day][1][l] for window_day in window for l in L]
+        n_rows += len(window) * len(L)
+
+        A = sp.csr_matrix((vals, (rows, cols)), shape = (n_rows, n_vars))
+        obj = np.zeros(n_vars)
+        obj[:len(assignments)] = [self.discount ** k / u[i] for i, e, k, _ in assignments]
+
+        lp = highspy.HighsLp()
+        lp.num_col_ = n_vars
+        lp.num_row_ = n_rows
+        lp.sense_ = highspy.ObjSense.kMaximize
+        lp.col_cost_ = obj
+        lp.col_lower_ = np.zeros(n_vars)
+        lp.col_upper_ = np.ones(n_vars)
+        lp.row_lower_ = np.full(n_rows, -np.inf)
+        lp.row_upper_ = np.array(row_upper, dtype = float)
+        lp.a_matrix_.format_ = highspy.MatrixFormat.kRowwise
+        lp.a_matrix_.start_ = A.indptr
+        lp.a_matrix_.index_ = A.indices
+        lp.a_matrix_.value_ = A.data
+        lp.integrality_ = [highspy.HighsVarType.kInteger] * n_vars
+
+        h = highspy.Highs()
+        h.setOptionValue("output_flag", False)
+        h.setOptionValue("time_limit", float(self.time_limit))
+        h.setOptionValue("mip_rel_gap", self.mip_gap)
+        for option, value in (self.highs_params or {}).items():
+            h.setOptionValue(option, value)
+        h.passModel(lp)
+
+        # The previous plan, where it is still valid, completed greedily is the start solution
+        start_solution = highspy.HighsSolution()
+        start_solution.col_value = self._get_start(window, assignments, obj, on_site, depot, vehicle_index).tolist()
+        h.setSolution(start_solution)
+
+        h.run()
+        solution = np.array(h.getSolution().col_value)
+        plan = {}
+        if len(solution) == n_vars:
+            for n, (i, e, k, _) in enumerate(assignments):
+                if solution[n] > 0.5:
+                    plan[i] = (window[k], e)
+        self.previous_plan = plan
+        self.runtime = time.perf_counter() - start_time
+        return plan
+
+
+    def _get_start(self,
+                   window: list[int],
+                   assignments: list[tuple[int, int, int, float]],
+                   obj: np.ndarray,
+                   on_site: set[int],
+                   depot: dict[int, int],
+                   vehicle_index: dict[tuple[int, int], int]) -> np.ndarray:
+        """
+        Returns a feasible start solution. The audits are planned greedily by decreasing value, each in its slot
+        (day and auditor) from the previous plan if it still fits, and otherwise in the most valuable slot, which fits.
+        Without a good start solution, HiGHS spends most of the time on cuts at the root.
+        """
+        start = np.zeros(len(obj))
+        remaining = {(e, k): self.capacity[window_day][0][e] for k, window_day in enumerate(window) for e in depot}
+        vehicles = {(l, k): self.capacity[window_day][1][l] for k, window_day in enumerate(window) for l in self.capacity[window_day][1]}
+        slots = {}
+        for n in sorted(range(len(assignments)), key = lambda n: -obj[n]):
+            slots.setdefault(assignments[n][0], []).append(n)
+        for i in sorted(slots, key = lambda i: -obj[slots[i][0]]):
+            previous = [n for n in slots[i] if self.previous_plan.get(i) == (window[assignments[n][2]], assignments[n][1])]
+            for n in previous + slots[i]:
+                _, e, k, time_used = assignments[n]
+                if time_used > remaining[e, k] + 1e-9:
+                    continue
+                if i in on_site and start[vehicle_index[e, k]] == 0:
+                    if vehicles.get((depot[e], k), 0) < 1:
+                        continue
+                    vehicles[depot[e], k] -= 1
+                    start[vehicle_index[e, k]] = 1
+                start[n] = 1
+                remaining[e, k] -= time_used
+                break
+        return start
+
+
+    def get_checkpoint(self) -> dict:
+        """
+        Returns the plan of the last window, which is the start solution of the next window.
+        """
+        return {"previous_plan": self.previous_plan}
+
+
+    def load_checkpoint(self, checkpoint: dict):
+        """
+        Restores the plan of the last window from get_checkpoint.
+        """
+        self.previous_plan = checkpoint["previous_plan"]
@@ -0,0 +1,144 @@
+###########
+# Imports #
+###########
+# Optimization
+import gurobipy as gp
+from gurobipy import GRB
+from modules.optimization.subtour_elimination import subtour_elimination_callback
+
+######################
+# Default parameters #
+######################
+# The default policy is the fixed setting used in the thesis.
+# time_limit:          Upper limit on the solve time in seconds.
+# no_rel_heur_time:    Seconds spent in the NoRel heuristic (capped at the time limit).
+# mip_gap:             Stop when the relative MIP gap is below this value (None uses Gurobi's default).
+# stall_time:          Stop when the incumbent has not improved for this many seconds (None disables it).
+# base_time:           If set, the time limit is scaled with the size of the day:
+#                      base_time + time_per_assignment * |V| * |E| + time_per_arc * |O|^2 * |E|
+#                      The result is still capped at time_limit.
+DEFAULT_SOLVE_POLICY = {
+    "time_limit": 2700,
+    "no_rel_heur_time": 100,
+    "mip_gap": None,
+    "stall_time": None,
+    "base_time": None,
+    "time_per_assignment": 0,
+    "time_per_arc": 0
+}
+
+STATUS_NAMES = {
+    GRB.OPTIMAL: "optimal",
+    GRB.INFEASIBLE: "infeasible",
+    GRB.INF_OR_UNBD: "infeasible",
+    GRB.TIME_LIMIT: "time_limit",
+    GRB.INTERRUPTED: "interrupted",
+    GRB.NODE_LIMIT: "node_limit",
+    GRB.SOLUTION_LIMIT: "solution_limit"
+}
+
+
+#############
+# Functions #
+#############
+def get_solve_policy(solve_policy: dict = None) -> dict:
+    """
+    Returns the default solve policy updated with the given values.
+    """
+    policy = DEFAULT_SOLVE_POLICY.copy()
+    if solve_policy is not None:
+        unknown = set(solve_policy) - set(DEFAULT_SOLVE_POLICY)
+        if len(unknown) > 0:
+            raise ValueError(f"Unknown solve policy keys: {sorted(unknown)}")
+        policy.update(solve_policy)
+    return policy
+
+
+def get_time_limit(policy: dict,
+                   V: list[int],
+                   O: list[int],
+                   E: list[int]) -> float:
+    """
+    Returns the time limit for a day. If the policy has a base time, the limit is scaled with the size of the day.
+    """
+    if policy["base_time"] is None:
+        return policy["time_limit"]
+    scaled = (policy["base_time"]
+              + policy["time_per_assignment"] * len(V) * len(E)
+              + policy["time_per_arc"] * len(O) ** 2 * len(E))
+    return min(policy["time_limit"], scaled)
+
+
+def apply_solve_policy(m: gp.Model,
+                       policy: dict,
+                       V: list[int],
+                       O: list[int],
+                       E: list[int]):
+    """
+    Sets the Gurobi parameters of a policy on a model and prepares the stall check used by solve_callback.
+    """
+    time_limit = get_time_limit(policy, V, O, E)
+    m.Params.TimeLimit = time_limit
+    m.Params.NoRelHeurTime = min(policy["no_rel_heur_time"], time_limit)
+    if policy["mip_gap"] is not None:
+        m.Params.MIPGap = policy["mip_gap"]
+
+    m._time_limit_scaled = time_limit < policy["time_limit"]
+    m._stall_time = policy["stall_time"]
+    m._best_obj = None
+    m._last_improvement = 0.0
+    m._termination = None
+    m._incumbent_obj = None
+    m._incumbent_time = None
+
+
+def solve_callback(model: gp.Model, where: int):
+    """
+    Adds lazy subtour elimination constraints and stops the solve if the incumbent has stalled.
+    Also records when the best feasible solution was found.
+    """
+    lazy_cuts = model._lazy_cuts
+    subtour_elimination_callback(model, where)
+
+    # A solution without subtours is a new incumbent if it improves the objective
+    if where == GRB.Callback.MIPSOL and model._lazy_cuts == lazy_cuts:
+        obj = model.cbGet(GRB.Callback.MIPSOL_OBJ)
+        if model._incumbent_obj is None or obj > model._incumbent_obj + 1e-9:
+            model._incumbent_obj = obj
+            model._incumbent_time = model.cbGet(GRB.Callback.RUNTIME)
+
+    if model._stall_time is None:
+        return
+
+    if where == GRB.Callback.MIP:
+        best = model.cbGet(GRB.Callback.MIP_OBJBST)
+        n_solutions = model.cbGet(GRB.Callback.MIP_SOLCNT)
+    elif where == GRB.Callback.MIPSOL:
+        best = model.cbGet(GRB.Callback.MIPSOL_OBJBST)
+        n_solutions = model.cbGet(GRB.Callback.MIPSOL_SOLCNT)
+    else:
+        return
+
+    # The clock starts at the first incumbent. The daily model is maximized.
+    if n_solutions == 0:
+        return
+    runtime = model.cbGet(GRB.Callback.RUNTIME)
+    if model._best_obj is None or best > model._best_obj + 1e-9:
+        model._best_obj = best
+        model._last_improvement = runtime
+    elif runtime - model._last_improvement >= model._stall_time:
+        model._termination = "stall"
+        model.terminate()
+
+
+def get_termination_rule(m: gp.Model) -> str:
+    """
+    Returns the rule, which ended the solve: optimal, mip_gap, stall, time_limit, scaled_time_limit, infeasible, ...
+    """
+    if m._termination is not None and m.Status == GRB.INTERRUPTED:
+        return m._termination
+    if m.Status == GRB.OPTIMAL:
+        return "optimal" if m.MIPGap <= 1e-4 else "mip_gap"
+    if m.Status == GRB.TIME_LIMIT and m._time_limit_scaled:
+        return "scaled_time_limit"
+    return STATUS_NAMES.get(m.Status, f"status_{m.Status}")
@@ -0,0 +1,110 @@
+###########
+# Imports #
+###########
+# Optimization
+import gurobipy as gp
+from gurobipy import GRB
+import numpy as np
+
+# Timing
+import time
+
+
+#############
+# Functions #
+#############
+def set_subtour_data(m: gp.Model,
+                     x: gp.tupledict,
+                     L: list[int],
+                     E: list[int]):
+    """
+    Stores the arcs of the model as index arrays on the model, so the callback can read the solution as a NumPy array.
+    Also resets the callback timer and the lazy-cut counter.
+    """
+    keys = list(x.keys())
+    nodes = list(dict.fromkeys([key[0] for key in keys] + [key[1] for key in keys] + list(L)))
+    node_index = {node: n for n, node in enumerate(nodes)}
+    auditor_index = {e: n for n, e in enumerate(E)}
+
+    m._vars = x
+    m._x_vars = [x[key] for key in keys]
+    m._nodes = nodes
+    m._E = list(E)
+    m._arc_from = np.array([node_index[key[0]] for key in keys], dtype=np.int64)
+    m._arc_to = np.array([node_index[key[1]] for key in keys], dtype=np.int64)
+    m._arc_auditor = np.array([auditor_index[key[2]] for key in keys], dtype=np.int64)
+    depots = set(L)
+    m._is_depot = np.array([node in depots for node in nodes], dtype=bool)
+    m._callback_time = 0.0
+    m._lazy_cuts = 0
+
+
+def _find(parent: dict[int, int], node: int) -> int:
+    """
+    Returns the root of a node in a union-find structure and compresses the path.
+    """
+    root = node
+    while parent[root] != root:
+        root = parent[root]
+    while parent[node] != root:
+        parent[node], node = root, parent[node]
+    return root
+
+
+def find_subtours(arc_from: np.ndarray,
+                  arc_to: np.ndarray,
+                  arc_auditor: np.ndarray,
+                  is_depot: np.ndarray) -> list[tuple[int, list[int]]]:
+    """
+    Takes the selected arcs as index arrays and returns the subtours as a list of (auditor index, node indices).
+    The connected components are found for each auditor with union-find.
+    A component is a subtour if it does not contain a depot.
+    """
+    subtours = []
+    order = np.argsort(arc_auditor, kind="stable")
+    arc_from, arc_to, arc_auditor = arc_from[order], arc_to[order], arc_auditor[order]
+    auditors, starts = np.unique(arc_auditor, return_index=True)
+    ends = [*starts[1:], len(arc_auditor)]
+
+    for auditor, start, end in zip(auditors.tolist(), starts.tolist(), ends):
+        parent = {}
+        for i, j in zip(arc_from[start:end].tolist(), arc_to[start:end].tolist()):
+            parent.setdefault(i, i)
+            parent.setdefault(j, j)
+            root_i, root_j = _find(parent, i), _find(parent, j)
+            if root_i != root_j:
+                parent[root_i] = root_j
+
+        components = {}
+        for node in parent:
+            components.setdefault(_find(parent, node), []).append(node)
+        for component in components.values():
+            if not is_depot[component].any():
+                subtours.append((auditor, component))
+    return subtours
+
+
+def subtour_elimination_callback(model: gp.Model, where: int):
+    """
+    Lazy-constraint callback, which adds subtour elimination constraints.
+    A cut is only added for the auditor whose tour contains the subtour.
+    The model needs the attributes set by set_subtour_data.
+    """
+    if where == GRB.Callback.MIPSOL:
+        start_time = time.perf_counter()
+
+        # Get the solution values
+        vals = np.array(model.cbGetSolution(model._x_vars))
+        selected = np.flatnonzero(vals > 0.6)
+
+        # Find subtours and add subtour elimination constraints
+        for auditor, component in find_subtours(model._arc_from[selected],
+                                                model._arc_to[selected],
+                                                model._arc_auditor[selected],
+                                                model._is_depot):
+            e = model._E[auditor]
+            S = [model._nodes[node] for node in component]
+            model.cbLazy(gp.quicksum(model._vars[i, j, e] for i in S for j in S if (i, j, e) in model._vars) <= len(S) - 1)
+            model._lazy_cuts += 1
+
+        model._callback_time += time.perf_counter() - start_time
@@ -1,9 +1,52 @@
 import pandas as pd
+import numpy as np
 import sqlite3
+from collections.abc import Iterator
 import modules.utils.utils as utils
 import modules.utils.date_utils as date_utils
 import modules.data_retrieval.retrieve_sets_params as get_sets_params
 
+SORT_COLUMNS = ["due_date_id", "duration", "priority_before_audit"]
+SORT_ASCENDING = [True, False, False]
+
+
+def get_non_workday_shifts(first_day: int,
+                           last_day: int,
+                           con: sqlite3.Connection) -> np.ndarray:
+    """
+    Returns an array indexed by day - first_day, which stores how many days the audits released on a day are pushed.
+    Workdays are stored as 0. For other days the value is one more than the distance to the next workday,
+    which is how far the original loop pushes them.
+    """
+    day_types = date_utils.get_day_types_in_range(first_day, last_day + 1, con)
+    while day_types[-1] != "workday":
+        day_types.append(date_utils.get_day_type(first_day + len(day_types), con))
+
+    shifts = np.zeros(len(day_types), dtype=np.int64)
+    next_workday = len(day_types) - 1
+    for pos in range(len(day_types) - 1, -1, -1):
+        if day_types[pos] == "workday":
+            next_workday = pos
+        else:
+            shifts[pos] = next_workday - pos + 1
+    return shifts[:last_day - first_day + 1]
+
+
+def get_tie_classes(all_audits: pd.DataFrame) -> np.ndarray:
+    """
+    Returns an integer for each row, which orders the rows the same way as sorting by SORT_COLUMNS.
+    Rows with the same sort key get the same integer.
+    """
+    keys = all_audits[SORT_COLUMNS].reset_index(drop=True)
+    sorted_keys = keys.sort_values(by=SORT_COLUMNS, ascending=SORT_ASCENDING)
+    previous = sorted_keys.shift()
+    changed = ((sorted_keys != previous) & ~(sorted_keys.isna() & previous.isna())).any(axis=1).to_numpy().copy()
+    changed[:1] = True
+
+    tie_classes = np.empty(len(keys), dtype=np.int64)
+    tie_classes[sorted_keys.index.to_numpy()] = np.cumsum(changed) - 1
+    return tie_classes
+
 
 def relax_release_dates(phi: int,
                         epsilon: int,
@@ -13,8 +56,165 @@ def relax_release_dates(phi: int,
                         con: sqlite3.Connection) -> pd.DataFrame:
     """
     Takes a dataframe which contains all audits an returns a dataframe.
-    The returned data have had its release dates redistributed according to 
+    The returned data have had its release dates redistributed according to
     episolon and phi.
+
+    The output is identical to relax_release_dates_iterative, including row order and index,
+    but the audits are only sorted once. Each day only the audits released on that day are visited,
+    and audits pushed past phi (or past a weekend) are carried over to the bucket of the day they are pushed to.
+    """
+    if first_day > last_day or all_audits.shape[0] == 0:
+        return relax_release_dates_iterative(phi, epsilon, all_audits, first_day, last_day, con)
+
+    all_audits = all_audits.reset_index(drop = True)
+    shifts = get_non_workday_shifts(first_day, last_day, con)
+    tie_classes = get_tie_classes(all_audits)
+    release = all_audits["release_date_id"].to_numpy().copy()
+    due = all_audits["due_date_id"].to_numpy()
+
+    # The relative order of audits with the same sort key depends on when they were last moved.
+    # sequence stores that order, so sorting by (tie class, sequence) reproduces the stable sort of the original loop.
+    sequence = np.arange(len(release), dtype=np.int64)
+    next_sequence = len(release)
+    dropped = np.zeros(len(release), dtype=bool)
+
+    # Buckets of audits waiting to be handled on each day
+    in_horizon = np.flatnonzero((release >= first_day) & (release <= last_day))
+    buckets = {}
+    for day, rows in pd.Series(in_horizon).groupby(release[in_horizon]):
+        buckets[int(day)] = [rows.to_numpy()]
+
+    for day in range(first_day, last_day + 1):
+        if day not in buckets:
+            pieces = []
+            continue
+        rows = np.concatenate(buckets.pop(day))
+        rows = rows[np.lexsort((sequence[rows], tie_classes[rows]))]
+        shift = shifts[day - first_day]
+
+        # If it is not a work day push release dates until nearest work day
+        if shift > 0:
+            non_edit = (due[rows] + shift <= (day - epsilon)) | (release[rows] + shift > last_day)
+            pieces = [rows[~non_edit], rows[non_edit]]
+            release[pieces[0]] = release[pieces[0]] + shift
+            if len(pieces[0]) > 0:
+                buckets.setdefault(day + shift, []).append(pieces[0])
+
+        # If it is a work day push audits release date to next date
+        else:
+            pieces = [rows[due[rows] <= (day - epsilon)], rows[due[rows] > (day - epsilon)]]
+            dropped[rows] = True
+            dropped[pieces[0]] = False
+            dropped[pieces[1]] = False
+            overflow = pieces[1][phi:]
+            release[overflow] = release[overflow] + 1
+            if len(overflow) > 0 and day + 1 <= last_day:
+                buckets.setdefault(day + 1, []).append(overflow)
+
+        moved = np.concatenate(pieces)
+        sequence[moved] = np.arange(next_sequence, next_sequence + len(moved))
+        next_sequence += len(moved)
+
+    # The rows that were not moved on the last day are sorted, and the last day's pieces are appended
+    last_moved = np.concatenate(pieces) if len(pieces) > 0 else np.array([], dtype=np.int64)
+    rest = np.ones(len(release), dtype=bool)
+    rest[last_moved] = False
+    rest &= ~dropped
+    rest = np.flatnonzero(rest)
+    rest = rest[np.lexsort((sequence[rest], tie_classes[rest]))]
+
+    order = np.concatenate([rest, *pieces]).astype(np.int64)
+    index = np.concatenate([np.arange(len(piece)) for piece in [rest, *pieces]]).astype(np.int64)
+
+    all_audits = all_audits.copy()
+    all_audits["release_date_id"] = release
+    all_audits = all_audits.iloc[order]
+    all_audits.index = pd.Index(index)
+    return all_audits
+
+
+def stream_relaxed_release_dates(phi: int,
+                                 epsilon: int,
+                                 con: sqlite3.Connection,
+                                 first_day: int,
+                                 last_day: int,
+                                 chunk_days: int = 30) -> Iterator[tuple[int, pd.DataFrame]]:
+    """
+    Is the streaming version of relax_release_dates for long horizons.
+    The audits are read in chunks of chunk_days release dates (see get_simulation_audits), and between days only the
+    audits pushed to a later day are kept. So memory is bounded by a chunk and the carry-over, not by the whole table.
+    Yields every day from first_day to last_day with the audits, whose release date is settled on that day,
+    in the order they are handled. The audits pushed past the last day are yielded with the last day.
+    The release dates are the same as in relax_release_dates. SimulationState orders the open audits like its dataframe.
+    """
+    shifts = get_non_workday_shifts(first_day, last_day, con)
+    carry_over = {}
+    chunk, chunk_end = None, first_day - 1
+
+    # The audits of a chunk get negative sequence numbers in the order they are read, so they come before
+    # the audits moved on an earlier day (which are numbered from 0) in the same way as in relax_release_dates
+    next_sequence = 0
+    for day in range(first_day, last_day + 1):
+        if day > chunk_end:
+            chunk_end = min(day + chunk_days - 1, last_day)
+            chunk = get_sets_params.get_simulation_audits(con, day, chunk_end).reset_index(drop = True)
+            chunk["sequence"] = np.arange(len(chunk), dtype=np.int64) - len(chunk)
+            release_rows = chunk.groupby("release_date_id").indices
+
+        rows = [chunk.iloc[release_rows[day]]] if day in release_rows else []
+        rows = [*rows, *carry_over.pop(day, [])]
+        if len(rows) == 0:
+            yield day, chunk.iloc[:0].drop(columns = "sequence")
+            continue
+        day_audits = pd.concat(rows, ignore_index = True)
+        day_audits = day_audits.iloc[np.lexsort((day_audits["sequence"].to_numpy(),
+                                                 -day_audits["priority_before_audit"].to_numpy(),
+                                                 -day_audits["duration"].to_numpy(),
+                                                 day_audits["due_date_id"].to_numpy()))]
+        due = day_audits["due_date_id"].to_numpy()
+        shift = shifts[day - first_day]
+
+        # If it is not a work day push release dates until nearest work day
+        if shift > 0:
+            non_edit = (due + shift <= (day - epsilon)) | (day_audits["release_date_id"].to_numpy() + shift > last_day)
+            pieces = [day_audits[~non_edit].copy(), day_audits[non_edit].copy()]
+            pieces[0]["release_date_id"] += shift
+            n_carried = len(pieces[0])
+
+        # If it is a work day push audits release date to next date
+        else:
+            pieces = [day_audits[due <= (day - epsilon)].copy(), day_audits[due > (day - epsilon)].copy()]
+            release = pieces[1]["release_date_id"].to_numpy().copy()
+            release[phi:] += 1
+            pieces[1]["release_date_id"] = release
+            n_carried = max(len(pieces[1]) - phi, 0) if day + 1 <= last_day else 0
+
+        moved = pd.concat(pieces)
+        moved["sequence"] = np.arange(next_sequence, next_sequence + len(moved))
+        next_sequence += len(moved)
+
+        # The carried audits are the first ones on a weekend and the last ones on a work day
+        if shift > 0:
+            carried, settled = moved.iloc[:n_carried], moved.iloc[n_carried:]
+        else:
+            carried, settled = moved.iloc[len(moved) - n_carried:], moved.iloc[:len(moved) - n_carried]
+        if n_carried > 0:
+            carry_over.setdefault(int(carried["release_date_id"].iloc[0]), []).append(carried)
+        yield day, settled.drop(columns = "sequence").reset_index(drop = True)
+
+
+def relax_release_dates_iterative(phi: int,
+                                  epsilon: int,
+                                  all_audits: pd.DataFrame,
+                                  first_day: int,
+                                  last_day: int,
+                                  con: sqlite3.Connection) -> pd.DataFrame:
+    """
+    Takes a dataframe which contains all audits an returns a dataframe.
+    The returned data have had its release dates redistributed according to
+    episolon and phi.
+    This is the original day-by-day implementation, which re-sorts all audits every day.
+    It is kept as the reference for relax_release_dates.
     """
     for day in range(first_day, last_day + 1):
 
@@ -23,7 +223,7 @@ def relax_release_dates(phi: int,
         all_audits = all_audits.reset_index(drop = True)
         day_audits = all_audits[(all_audits["release_date_id"] == day)].reset_index(drop = True).copy()
         all_audits = all_audits[(all_audits["release_date_id"] != day)].reset_index(drop = True)
-        
+
         # If it is not a work day push release dates until nearest work day
         day_type = date_utils.get_day_type(day, con)
         if day_type != "workday":
@@ -31,7 +231,7 @@ def relax_release_dates(phi: int,
             day_type = date_utils.get_day_type(day, con)
             while day_type != "workday":
                 day_type = date_utils.get_day_type(day + i, con)
-                i += 1            
+                i += 1
 
 
             non_edit = day_audits[(day_audits["due_date_id"] + i <= (day - epsilon)) | (day_audits["release_date_id"] + i > last_day)].copy()
@@ -41,7 +241,7 @@ def relax_release_dates(phi: int,
 
             edit_day["release_date_id"] = edit_day["release_date_id"] + i
             all_audits = pd.concat([all_audits, edit_day, non_edit])
-        
+
         # If it is a work day push audits release date to next date
         else:
             non_edit = day_audits[day_audits["due_date_id"] <= (day - epsilon)].copy()
@@ -53,6 +253,6 @@ def relax_release_dates(phi: int,
                 all_audits = pd.concat([all_audits, non_edit, edit_day])
 
             else:
-                edit_day.loc[phi : , "release_date_id"] = edit_day.loc[phi : , "release_date_id"].apply(lambda x : x+1)
+                edit_day.loc[phi : , "release_date_id"] += 1
                 all_audits = pd.concat([all_audits, non_edit, edit_day])
     return all_audits
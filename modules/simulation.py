@@ -0,0 +1,372 @@
+###########
+# Imports #
+###########
+# Data
+import pandas as pd
+import os
+from modules.data_retrieval.simulation_context import SimulationContext
+from modules.simulation_state import SimulationState
+
+# Output data
+from modules.utils.output_utils import generate_simulation_dataframe
+from modules.utils.output_utils import stream_simulation_dataframe
+from modules.utils.results_utils import ResultsSink
+from modules.utils.results_utils import get_results_path
+
+# Profiling
+from modules.utils.profile_utils import append_profile_record
+from modules.utils.profile_utils import save_profile_summary
+from modules.utils.profile_utils import truncate_profile
+
+# Checkpoints
+from modules.utils.checkpoint_utils import get_checkpoint_path
+from modules.utils.checkpoint_utils import save_checkpoint
+from modules.utils.checkpoint_utils import load_checkpoint
+
+# Sets and parameters
+from modules.data_retrieval.retrieve_sets_params import get_audits_as_list
+from modules.data_retrieval.retrieve_sets_params import get_on_site_audits
+from modules.data_retrieval.retrieve_sets_params import get_depots
+from modules.data_retrieval.retrieve_sets_params import get_employees
+from modules.data_retrieval.retrieve_sets_params import get_due_dates
+from modules.data_retrieval.retrieve_sets_params import get_objective_val 
+from modules.data_retrieval.retrieve_sets_params import get_processing_times 
+from modules.data_retrieval.retrieve_sets_params import get_n_vehicles 
+from modules.data_retrieval.retrieve_sets_params import get_daily_employee_capacity 
+
+# Matrices
+from modules.data_retrieval.retrieve_matrices import get_auditor_depot_matrix
+from modules.data_retrieval.retrieve_matrices import get_accomplice_matrix
+from modules.data_retrieval.retrieve_matrices import get_travel_time_matrix
+
+# Dates
+from modules.utils.date_utils import create_auditor_holidays
+from modules.utils.date_utils import get_day_type
+
+# Timing
+import time
+
+# Optimization
+from contextlib import closing
+from modules.optimization.backends import get_backend
+from modules.optimization.lookahead import RollingHorizonPlanner
+from modules.optimization.candidates import get_candidates
+from modules.optimization.candidates import get_model_reduction
+from modules.optimization.candidates import get_candidate_matrix
+
+
+####################
+# Simulation model #
+####################
+def run_simulation(context: SimulationContext,
+                   first_day: int,
+                   last_day: int,
+                   vehicle_start_hour: int = 6,
+                   vehicle_end_hour: int = 18,
+                   km_pr_hour: int = 80,
+                   phi: int = 15,
+                   epsilon: int = 5,
+                   holiday_length: int = 42,
+                   incremental_model: bool = False,
+                   solve_policy: dict = None,
+                   output_dir: str = "outputs/results",
+                   output_name: str = "holidays",
+                   gurobi_params: dict = None,
+                   solver_backend: str = "gurobi",
+                   highs_params: dict = None,
+                   heuristic_start: bool = False,
+                   decomposition_params: dict = None,
+                   lookahead_params: dict = None,
+                   checkpoint_every: int = None,
+                   resume: bool = False,
+                   stream_chunk_days: int = None,
+                   candidate_params: dict = None) -> tuple[pd.DataFrame, str]:
+    """
+    Runs the simulation model between first_day and last_day.
+    The schedule is saved as model_<output_name>.csv in output_dir. The audits and routes of every solved day are written
+    to results_<output_name>.db as soon as the day is solved (see modules.utils.results_utils).
+    The wall time of each phase and the solver statistics of every solved day are written to profile_<output_name>.jsonl,
+    and a summary of the phases to profile_summary_<output_name>.csv.
+    solve_policy overrides the default time limit, MIP gap and stall rules (see modules.optimization.solve_policy).
+    gurobi_params are extra Gurobi parameters (e.g. Threads or LogFile), which are set on every daily model.
+    solver_backend is "gurobi", "highs" or "heuristic" (see modules.optimization.backends). highs_params are extra HiGHS options.
+    heuristic_start uses the heuristic's schedule as the MIP start for Gurobi.
+    decomposition_params configure solver_backend "decomposition", which solves one subproblem per depot in parallel.
+    lookahead_params (e.g. {"horizon": 5}) turn on the rolling horizon: the open audits are planned over the next workdays
+    (see modules.optimization.lookahead), and the audits planned for a later day are left out of the day's model.
+    If checkpoint_every is set, the state of the simulation is saved as checkpoint_<output_name>.pkl every checkpoint_every days
+    and after the last day. With resume the simulation continues after the last day in the checkpoint.
+    The incremental model is rebuilt when a simulation is resumed.
+    If stream_chunk_days is set, the audits are read and their release dates relaxed stream_chunk_days days at a time
+    while the simulation runs (see stream_relaxed_release_dates), instead of for the whole horizon before the first day.
+    The schedule is the same, but the audits, which can no longer be scheduled (due today or earlier), are left out of the daily audits,
+    and the CSV only has the audits released in the horizon, in the order their release dates were settled.
+    candidate_params (e.g. {"k_nearest_depots": None}) turn on the candidate auditors: the daily model only gets the auditors,
+    who can take an audit within their capacity today (see modules.optimization.candidates). The pruned pairs are written to the profile.
+    Returns the schedule and the path of the results database.
+    """
+    # Bornholm, Greenland, and holidays
+    green_land_start, green_land_end = (first_day + 30, first_day + 37)
+    bornholm_start, bornholn_end = (first_day + 30, first_day + 31)
+    auditor_holidays = create_auditor_holidays(first_day, last_day, context, holiday_length)
+
+    # Dataframe for simulation (Bornholm and Greenland are removed when the audits are loaded)
+    if stream_chunk_days is None:
+        sim_audits = generate_simulation_dataframe(context, phi, epsilon, first_day, last_day)
+        state = SimulationState(sim_audits, first_day)
+    else:
+        state = SimulationState(stream_simulation_dataframe(context, phi, epsilon, first_day, last_day, stream_chunk_days), first_day, last_day)
+
+    # Multi-day audits (a stream adds them, when they are read)
+    long_audits = state.get_long_audits()
+    long_audits_last_audit = {}
+    long_audits_auditors = {}
+    for long_audit in long_audits:
+        long_audits_auditors[long_audit] = None
+        long_audits_last_audit[long_audit] = 0
+
+    # Solver backend (keeps the persistent model in the incremental mode)
+    backend = get_backend(solver_backend, incremental_model, solve_policy, gurobi_params, highs_params, heuristic_start, decomposition_params)
+
+    # Rolling horizon (keeps the capacities of the window and the previous plan)
+    planner = RollingHorizonPlanner(**lookahead_params) if lookahead_params is not None else None
+
+    def get_capacity(day: int) -> tuple[dict[int, float], dict[int, int]]:
+        """
+        Returns the auditors' capacity q and the vehicles K of a day, including Greenland, Bornholm and holidays.
+        """
+        q = get_daily_employee_capacity(day, context)
+
+        # Set Employee 10 and 11 as unavailable for Greenland expedition
+        if green_land_start <= day <= green_land_end:
+            q[10] = 0
+            q[11] = 0
+
+        if bornholm_start <= day <= bornholn_end:
+            q[2] = 0
+            q[3] = 0
+
+        # Create Holidays #
+        for e in get_employees(context):
+            start_holiday, end_holiday = auditor_holidays[e]
+            if start_holiday <= day <= end_holiday:
+                q[e] = 0
+        return q, get_n_vehicles(day, context, vehicle_start_hour, vehicle_end_hour)
+
+    # Profile of every solved day
+    os.makedirs(output_dir, exist_ok = True)
+    profile_path = os.path.join(output_dir, f"profile_{output_name}.jsonl")
+
+    # Resume from the last checkpoint
+    checkpoint_path = get_checkpoint_path(output_dir, output_name)
+    parameters = {"first_day": first_day,
+                  "last_day": last_day,
+                  "vehicle_start_hour": vehicle_start_hour,
+                  "vehicle_end_hour": vehicle_end_hour,
+                  "km_pr_hour": km_pr_hour,
+                  "phi": phi,
+                  "epsilon": epsilon,
+                  "holiday_length": holiday_length}
+    if stream_chunk_days is not None:
+        parameters["stream_audits"] = True # The streamed audits are stored in another order
+    checkpoint = load_checkpoint(checkpoint_path, parameters) if resume else None
+    if checkpoint is not None:
+        state.load_checkpoint(checkpoint["state"])
+        long_audits_auditors = checkpoint["long_audits_auditors"]
+        long_audits_last_audit = checkpoint["long_audits_last_audit"]
+        if planner is not None and checkpoint.get("lookahead") is not None:
+            planner.load_checkpoint(checkpoint["lookahead"])
+        start_day = checkpoint["last_completed_day"] + 1
+        truncate_profile(profile_path, checkpoint["last_completed_day"])
+        print(f"Resuming from day {start_day}")
+    else:
+        start_day = first_day
+        if os.path.exists(profile_path):
+            os.remove(profile_path)
+
+    # Results of every solved day
+    results_path = get_results_path(output_dir, output_name)
+
+    def save_simulation_checkpoint(last_completed_day: int):
+        save_checkpoint(checkpoint_path, {"parameters": parameters,
+                                          "last_completed_day": last_completed_day,
+                                          "state": state.get_checkpoint(),
+                                          "long_audits_auditors": long_audits_auditors,
+                                          "long_audits_last_audit": long_audits_last_audit,
+                                          "lookahead": planner.get_checkpoint() if planner is not None else None})
+
+    # ----- Timing routine -----
+    start_time = time.time()
+    # The days after the checkpoint are removed when resuming, and the database and the backend are also closed if a day raises
+    with ResultsSink(results_path, checkpoint["last_completed_day"] if checkpoint is not None else None) as sink, closing(backend):
+        for day in range(start_day, last_day + 1):
+            phase_start = time.perf_counter()
+
+            # Save the days before this day
+            if checkpoint_every is not None and day > start_day and (day - first_day) % checkpoint_every == 0:
+                save_simulation_checkpoint(day - 1)
+
+            # Get audits
+            daily_audits = state.get_open_audits(day)
+            if stream_chunk_days is not None:
+                for long_audit in state.get_long_audits():
+                    long_audits.add(long_audit)
+                    long_audits_auditors.setdefault(long_audit, None)
+                    long_audits_last_audit.setdefault(long_audit, 0)
+
+            # Is it a workday and is there any audits?
+            if daily_audits.shape[0] == 0:
+                print(f"\n ############################ Day {day} ################################### \n")
+                print(f"""\n No Audits Available \n""")
+                continue
+
+            elif get_day_type(day, context) != "workday":
+                print(f"\n ############################ Day {day} ################################### \n")
+                print(f"""\n Day is a {get_day_type(day, context)} \n""")
+                continue
+            else:
+                print(f"\n ############################ Day {day} ################################### \n")
+                print(f"""\n N AUDITS: {daily_audits.shape[0]} \n""")
+
+            # ----- Event Routine -----
+            # Get Data
+            t = day
+            O = get_on_site_audits(daily_audits)
+            V = get_audits_as_list(daily_audits)
+            L = get_depots(context)
+            E = get_employees(context)
+            d = get_due_dates(daily_audits)
+            u = get_objective_val(d, t)
+            p = get_processing_times(daily_audits)
+            q, K = get_capacity(t)
+            retrieval_end = time.perf_counter()
+
+            # Get Matrices (the adjustments below are timed with the matrices)
+            b = get_auditor_depot_matrix(context)
+            g = get_accomplice_matrix(daily_audits, context)
+            c = get_travel_time_matrix(daily_audits, L, context, km_pr_hour)
+
+            # Split multi-day Audits
+            for i in V:
+                if i in long_audits:
+                    if p[i] - 5 > 0:
+                        p[i] = 5
+                    else:
+                        long_audits_last_audit[i] = 1
+
+                    # Update Accomplice matrix so it is the auditor who performs the multi-day audit
+                    if long_audits_auditors[i] is not None:
+                        assigned_auditor = long_audits_auditors[i]
+                        for e in E:
+                            if e == assigned_auditor:
+                                g[e][i] = 1
+                            else:
+                                g[e][i] = 0
+
+            # Candidate auditors of the day's model (the lookahead plans later days, so it keeps g)
+            g_day = g
+            pruned = {}
+            if candidate_params is not None:
+                candidates, pruned = get_candidates(t, V, O, L, E, p, c, g, q, d, b, **candidate_params)
+                g_day = get_candidate_matrix(candidates, E)
+                print(f"Candidates: {pruned['n_candidates']} of {pruned['n_pairs']} auditor-audit pairs (pruned: {pruned['pruned_skill']} skill, "
+                      f"{pruned['pruned_due']} due, {pruned['pruned_capacity']} capacity, {pruned['pruned_depot']} depot)")
+                pruned.update(get_model_reduction(t, V, O, L, E, p, c, g, g_day, q, d, b))
+                print(f"Model: {pruned['model_vars']} variables and {pruned['model_rows']} rows "
+                      f"({pruned['removed_vars']} variables and {pruned['removed_rows']} rows removed by the candidates)")
+
+            # Plan the window and leave out the audits planned for a later day
+            matrix_end = time.perf_counter()
+            deferred = set()
+            if planner is not None:
+                window = planner.get_window(day, last_day, context, get_capacity)
+                plan = planner.plan(window, V, O, L, E, p, c, g, d, u, b)
+                deferred = {i for i, (planned_day, _) in plan.items() if planned_day != day}
+                if len(deferred) == len(V):
+                    deferred = set()
+                V = [i for i in V if i not in deferred]
+                O = [i for i in O if i not in deferred]
+                print(f"Lookahead: {len(deferred)} audits planned for a later day of {len(window)} workdays in {planner.runtime:.2f} seconds")
+
+            # Create Model
+            lookahead_end = time.perf_counter()
+            backend.build(day, t, V, O, L, E, p, c, g_day, q, K, d, u, b)
+
+            # Solve Model
+            build_end = time.perf_counter()
+            termination = backend.solve()
+            solve_end = time.perf_counter()
+
+            # ----- Report Generator -----
+            # Get Routes and Audits
+            route_dict, audit_dict = backend.get_solution()
+
+            # Print and Write Results
+            print(f"""\n - Objective value: {backend.obj_val} \n\n""")
+            for auditor, audits in audit_dict.items():
+                audit_time = sum([p[audit] for audit in audits])
+                travel_time = sum([c[i][j] for i, j in route_dict[auditor]])
+                print(f"##### AUDITOR: {auditor} ######")
+                print(f"Availability: {q[auditor]}")
+                print(f"Total Audit Time: {audit_time}")
+                print(f"Total Travel Time: {travel_time}")
+                print(f"Total Time: {audit_time + travel_time}")
+                print()
+
+                print(" - AUDITS")
+                for audit in audits:
+                    print(f"\t - Audit: {audit}")
+                print()
+
+                route = route_dict[auditor]
+                print(f"\n - ROUTE\n")
+                if len(route) > 0:
+                    for i, j in route:
+                        print(f"\t - FROM {i} --> {j}")
+                    print()
+
+            # Update  Audits
+            for auditor, audits in audit_dict.items():        
+                for i in audits:
+                    if i in long_audits:
+                        state.reduce_duration(i, p[i])
+
+                        if long_audits_auditors[i] is None:
+                            long_audits_auditors[i] = auditor
+
+                        if long_audits_last_audit[i]  == 1:
+                            state.schedule(i, day, auditor)
+
+                    elif i not in long_audits:
+                        state.schedule(i, day, auditor)
+            sink.append_day(day, route_dict, audit_dict)
+
+            # Write Profile
+            append_profile_record(profile_path, {
+                "day": day,
+                "n_audits": len(V),
+                "n_on_site_audits": len(O),
+                "n_deferred_audits": len(deferred),
+                **pruned,
+                "retrieval_time": retrieval_end - phase_start,
+                "matrix_time": matrix_end - retrieval_end,
+                "lookahead_time": lookahead_end - matrix_end,
+                "build_time": build_end - lookahead_end,
+                "solve_time": solve_end - build_end,
+                "extraction_time": time.perf_counter() - solve_end,
+                "termination": termination,
+                **backend.get_solve_stats()
+            })
+
+    print()
+    print("--- %s seconds to run ---" % (time.time() - start_time))  
+    if checkpoint_every is not None:
+        save_simulation_checkpoint(last_day)
+    profile_summary = save_profile_summary(profile_path, os.path.join(output_dir, f"profile_summary_{output_name}.csv"))
+    if profile_summary is not None:
+        print(profile_summary.round(2).to_string())
+
+    # Save Final results
+    sim_audits = state.to_frame()
+    sim_audits.to_csv(os.path.join(output_dir, f"model_{output_name}.csv"), index = False)
+    return sim_audits, results_path
@@ -0,0 +1,258 @@
+###########
+# Imports #
+###########
+# Data
+import numpy as np
+import pandas as pd
+from collections.abc import Iterator
+
+
+###########
+# Classes #
+###########
+class SimulationState:
+    """
+    Holds the changing columns of the simulation (duration, audit_date_id and employee_id) as NumPy arrays.
+    The audits are stored in chunks of NumPy columns, and every chunk with open audits has a mask of them.
+    Audits are found by ID through a dictionary, and open audits are released in order of their release date,
+    so selecting the audits of a day and updating them only touches the audits that change.
+    The full schedule is only materialized as a DataFrame by to_frame.
+
+    sim_audits is either the simulation dataframe or a stream of (day, audits) from stream_relaxed_release_dates.
+    The dataframe is a single chunk. A stream is read up to the day of get_open_audits, and the audits of every day
+    are appended once as a new chunk. The open audits of a stream are returned in the same order as with the dataframe,
+    which needs the last day of the stream.
+    With a stream, audits are closed once they are scheduled or can no longer be scheduled (due on or before the day,
+    constraint 10), and a chunk without open audits is dropped from the index and the daily selection.
+    Its columns are only kept for to_frame and get_checkpoint, so a day only touches the chunks with open audits.
+    """
+    def __init__(self,
+                 sim_audits: pd.DataFrame | Iterator[tuple[int, pd.DataFrame]],
+                 first_day: int,
+                 last_day: int = None):
+        self.first_day = first_day
+        self.index = {}
+        self._chunks = []
+        self._offsets = []
+        self._days = []
+        self._n_rows = 0
+        self._empty = None
+        self._long_checked = 0
+
+        # The changing columns of every chunk, and the open audits of the chunks, which have any (in the order they were added)
+        self._duration = []
+        self._audit_date_id = []
+        self._employee_id = []
+        self._is_open = {}
+
+        # Audits released before the first day are never scheduled
+        self._release_order = np.empty(0, dtype = np.int64)
+        self._release_dates = np.empty(0, dtype = np.int64)
+        self._next_release = 0
+
+        self._stream = None
+        self._streamed_until = None
+        if isinstance(sim_audits, pd.DataFrame):
+            self._add_chunk(sim_audits, None)
+            release = self._chunks[0]["release_date_id"]
+            self._release_order = np.flatnonzero((release >= first_day) & (self._audit_date_id[0] < 0))
+            self._release_order = self._release_order[np.argsort(release[self._release_order], kind = "stable")]
+            self._release_dates = release[self._release_order]
+        else:
+            self._stream = iter(sim_audits)
+            self._last_day = last_day
+            self._streamed_until = first_day - 1
+
+
+    def _add_chunk(self, audits: pd.DataFrame, day: int):
+        """
+        Adds the audits as a new chunk after the current ones. Nothing is open until it is released.
+        """
+        if self._empty is None:
+            self._empty = audits.iloc[:0].reset_index(drop = True)
+        chunk = len(self._chunks)
+        self.index.update({audit_id: (chunk, row) for row, audit_id in enumerate(audits["ID"].to_list())})
+        self._chunks.append({column: audits[column].to_numpy(copy = True) for column in self._empty.columns})
+        self._offsets.append(self._n_rows)
+        self._days.append(day)
+        self._n_rows += len(audits)
+        self._duration.append(audits["duration"].to_numpy().copy())
+        self._audit_date_id.append(audits["audit_date_id"].to_numpy().copy())
+        self._employee_id.append(audits["employee_id"].to_numpy(dtype = float).copy())
+        self._is_open[chunk] = np.zeros(len(audits), dtype = bool)
+
+
+    def _close_chunk(self, chunk: int):
+        """
+        Removes a chunk without open audits from the index and the daily selection.
+        """
+        del self._is_open[chunk]
+        for audit_id in self._chunks[chunk]["ID"].tolist():
+            del self.index[audit_id]
+
+
+    def _read_stream(self, day: int):
+        """
+        Adds the audits of the stream up to and including the day. The audits of a day are released on that day,
+        except the audits pushed past the last day, which are never released.
+        """
+        while self._stream is not None and self._streamed_until < day:
+            try:
+                stream_day, audits = next(self._stream)
+            except StopIteration:
+                self._stream = None
+                break
+            self._streamed_until = stream_day
+            if self._empty is None:
+                self._empty = audits.iloc[:0].reset_index(drop = True)
+            if len(audits) == 0:
+                continue
+            self._add_chunk(audits, stream_day)
+            chunk = len(self._chunks) - 1
+            release = self._chunks[chunk]["release_date_id"]
+            self._is_open[chunk] = (release >= self.first_day) & (release <= stream_day) & (self._audit_date_id[chunk] < 0)
+
+
+    def _close_audits(self, day: int):
+        """
+        Closes the streamed audits, which can no longer be scheduled, and the chunks without open audits.
+        """
+        for chunk in list(self._is_open):
+            self._is_open[chunk] &= self._chunks[chunk]["due_date_id"] > day
+            if not self._is_open[chunk].any():
+                self._close_chunk(chunk)
+
+
+    def release(self, day: int):
+        """
+        Opens the audits, which are released on or before the day.
+        """
+        self._read_stream(day)
+        end = np.searchsorted(self._release_dates, day, side = "right")
+        if self._next_release < end:
+            self._is_open[0][self._release_order[self._next_release:end]] = True
+        self._next_release = max(self._next_release, end)
+
+
+    def _get_column(self, chunk: int, column: str) -> np.ndarray:
+        """
+        Returns a column of a chunk with the current durations, dates and auditors.
+        """
+        if column == "duration":
+            return self._duration[chunk]
+        if column == "audit_date_id":
+            return self._audit_date_id[chunk]
+        if column == "employee_id":
+            return self._employee_id[chunk]
+        return self._chunks[chunk][column]
+
+
+    def _get_frame(self, selection: list[tuple[int, np.ndarray | slice]]) -> pd.DataFrame:
+        """
+        Returns the selected rows of the chunks as a DataFrame with the current durations, dates and auditors.
+        """
+        if len(selection) == 0:
+            return self._empty.copy()
+        return pd.DataFrame({column: np.concatenate([self._get_column(chunk, column)[rows] for chunk, rows in selection])
+                             for column in self._empty.columns})
+
+
+    def get_open_audits(self, day: int) -> pd.DataFrame:
+        """
+        Returns the released audits, which are not scheduled yet, in the same order as the simulation dataframe.
+        """
+        self.release(day)
+        if self._streamed_until is not None:
+            self._close_audits(day)
+        selection = [(chunk, np.flatnonzero(is_open)) for chunk, is_open in self._is_open.items()]
+        selection = [(chunk, rows) for chunk, rows in selection if len(rows) > 0]
+        daily_audits = self._get_frame(selection)
+        if len(selection) > 0:
+            daily_audits.index = np.concatenate([self._offsets[chunk] + rows for chunk, rows in selection])
+        if self._streamed_until is not None and len(selection) > 0:
+            daily_audits = daily_audits.iloc[self._get_dataframe_order(selection)]
+        return daily_audits
+
+
+    def _get_dataframe_order(self, selection: list[tuple[int, np.ndarray]]) -> np.ndarray:
+        """
+        Orders streamed rows like relax_release_dates orders its dataframe: by due date, duration (descending) and
+        priority (descending), and then in the order they were settled. The audits of the last day come after the others.
+        The durations are the ones read from the stream, not the durations left of multi-day audits.
+        """
+        last = np.concatenate([np.full(len(rows), self._days[chunk] == self._last_day) for chunk, rows in selection])
+        keys = [np.where(last, 0, np.concatenate([self._chunks[chunk][column][rows] for chunk, rows in selection]))
+                for column in ["due_date_id", "duration", "priority_before_audit"]]
+        return np.lexsort((np.arange(len(last)), -keys[2], -keys[1], keys[0], last))
+
+
+    def reduce_duration(self, audit_id: int, hours: float):
+        """
+        Subtracts the hours performed on a day from the duration of a multi-day audit.
+        """
+        chunk, row = self.index[audit_id]
+        self._duration[chunk][row] -= hours
+
+
+    def schedule(self, audit_id: int, day: int, employee: int):
+        """
+        Sets the date and auditor of an audit and closes it.
+        """
+        chunk, row = self.index[audit_id]
+        self._audit_date_id[chunk][row] = day
+        self._employee_id[chunk][row] = employee
+        self._is_open[chunk][row] = False
+
+
+    def get_long_audits(self, hours: float = 8) -> set[int]:
+        """
+        Returns the IDs of the audits, which take more than hours (multi-day audits), in the chunks added since the last call.
+        With the dataframe the first call returns all of them, and with a stream only the new chunks are read.
+        """
+        long_audits = set()
+        for chunk in self._chunks[self._long_checked:]:
+            long_audits.update(chunk["ID"][chunk["duration"] > hours].tolist())
+        self._long_checked = len(self._chunks)
+        return long_audits
+
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Returns the simulation dataframe with the current durations, dates and auditors.
+        With a stream the audits are in the order they were settled.
+        """
+        return self._get_frame([(chunk, slice(None)) for chunk in range(len(self._chunks))])
+
+
+    def get_checkpoint(self) -> dict:
+        """
+        Returns the changing part of the state, which is needed to resume a simulation.
+        """
+        return {"duration": np.concatenate([np.empty(0, dtype = float), *self._duration]),
+                "audit_date_id": np.concatenate([np.empty(0, dtype = np.int64), *self._audit_date_id]),
+                "employee_id": np.concatenate([np.empty(0, dtype = float), *self._employee_id]),
+                "open": [self._offsets[chunk] + row for chunk, is_open in self._is_open.items() for row in np.flatnonzero(is_open).tolist()],
+                "next_release": self._next_release,
+                "streamed_until": self._streamed_until}
+
+
+    def load_checkpoint(self, checkpoint: dict):
+        """
+        Restores the state from get_checkpoint. The simulation dataframe must be the same as when it was saved.
+        A stream is read up to the same day first, and its chunks without open audits are closed again.
+        """
+        if checkpoint.get("streamed_until") is not None:
+            self._read_stream(checkpoint["streamed_until"])
+        open_rows = np.zeros(self._n_rows, dtype = bool)
+        open_rows[checkpoint["open"]] = True
+        for chunk in range(len(self._chunks)):
+            rows = slice(self._offsets[chunk], self._offsets[chunk] + len(self._duration[chunk]))
+            self._duration[chunk] = checkpoint["duration"][rows].astype(self._duration[chunk].dtype)
+            self._audit_date_id[chunk] = checkpoint["audit_date_id"][rows].astype(self._audit_date_id[chunk].dtype)
+            self._employee_id[chunk] = checkpoint["employee_id"][rows].astype(float)
+            self._is_open[chunk] = open_rows[rows]
+        self._next_release = checkpoint["next_release"]
+        if self._streamed_until is not None:
+            for chunk in list(self._is_open):
+                if not self._is_open[chunk].any():
+                    self._close_chunk(chunk)
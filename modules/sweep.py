@@ -0,0 +1,130 @@
+###########
+# Imports #
+###########
+# Data
+import pandas as pd
+import os
+import json
+import itertools
+from modules.data_retrieval.simulation_context import SimulationContext
+
+# Parallel execution
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import as_completed
+from contextlib import redirect_stdout
+
+# Timing
+import time
+
+# Simulation
+from modules.simulation import run_simulation
+
+# The preloaded data in each worker process. It is set once when the worker starts.
+_context = None
+
+
+#############
+# Functions #
+#############
+def get_parameter_grid(grid: dict[str, list]) -> list[dict]:
+    """
+    Takes a dictionary of parameter names and lists of values and returns every combination as a list of dictionaries.
+    """
+    names = list(grid.keys())
+    return [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+
+
+def get_run_name(parameters: dict) -> str:
+    """
+    Returns the name of a run, which is used as the name of its output folder.
+    """
+    return "_".join(f"{name}_{value}" for name, value in parameters.items())
+
+
+def _init_worker(context: SimulationContext):
+    """
+    Stores the preloaded data in the worker process.
+    """
+    global _context
+    _context = context
+
+
+def _run_scenario(parameters: dict,
+                  first_day: int,
+                  last_day: int,
+                  output_dir: str,
+                  threads: int,
+                  checkpoint_every: int,
+                  resume: bool) -> dict:
+    """
+    Runs a single simulation in a worker process and returns a summary of the run.
+    The printed output and the Gurobi log are written to the run's output folder.
+    When resuming, the logs are appended to and the run continues from its checkpoint.
+    """
+    run_name = get_run_name(parameters)
+    run_dir = os.path.join(output_dir, run_name)
+    os.makedirs(run_dir, exist_ok = True)
+    with open(os.path.join(run_dir, "parameters.json"), "w") as fp:
+        json.dump(parameters, fp, indent = 4)
+
+    gurobi_params = {"Threads": threads,
+                     "LogFile": os.path.join(run_dir, "gurobi.log"),
+                     "LogToConsole": 0}
+    highs_params = {"threads": threads,
+                    "output_flag": True,
+                    "log_to_console": False,
+                    "log_file": os.path.join(run_dir, "highs.log")}
+    start_time = time.time()
+    with open(os.path.join(run_dir, "simulation.log"), "a" if resume else "w") as log, redirect_stdout(log):
+        sim_audits, _ = run_simulation(_context,
+                                       first_day,
+                                       last_day,
+                                       output_dir = run_dir,
+                                       output_name = "sweep",
+                                       gurobi_params = gurobi_params,
+                                       highs_params = highs_params,
+                                       checkpoint_every = checkpoint_every,
+                                       resume = resume,
+                                       **parameters)
+    return {"run": run_name,
+            **parameters,
+            "seconds": time.time() - start_time,
+            "n_audits_scheduled": int((sim_audits["audit_date_id"] >= 0).sum())}
+
+
+def run_sweep(context: SimulationContext,
+              parameter_sets: list[dict],
+              first_day: int,
+              last_day: int,
+              output_dir: str = "outputs/sweeps",
+              n_workers: int = None,
+              threads_per_worker: int = 1,
+              checkpoint_every: int = None,
+              resume: bool = False) -> pd.DataFrame:
+    """
+    Runs a simulation for every parameter set, each in its own worker process.
+    The keys of a parameter set are keyword arguments to run_simulation (e.g. phi, epsilon or km_pr_hour).
+    Each worker gets a read-only copy of the preloaded data and uses threads_per_worker Gurobi threads.
+    Every run writes its results to its own folder under output_dir, and a summary is saved as summary.csv.
+    With checkpoint_every each run saves checkpoints, and with resume the runs continue from them,
+    so finished days (and finished runs) are not solved again.
+    """
+    if n_workers is None:
+        n_workers = max(1, (os.cpu_count() or 1) // threads_per_worker)
+    os.makedirs(output_dir, exist_ok = True)
+
+    summaries = []
+    with ProcessPoolExecutor(max_workers = n_workers,
+                             initializer = _init_worker,
+                             initargs = (context,)) as pool:
+        futures = {pool.submit(_run_scenario, parameters, first_day, last_day, output_dir,
+                               threads_per_worker, checkpoint_every, resume): parameters
+                   for parameters in parameter_sets}
+        for future in as_completed(futures):
+            summary = future.result()
+            print(f"Finished {summary['run']} in {summary['seconds']:.0f} seconds")
+            summaries.append(summary)
+
+    summary_df = pd.DataFrame(summaries).sort_values("run").reset_index(drop = True)
+    summary_df.to_csv(os.path.join(output_dir, "summary.csv"), index = False)
+    return summary_df
@@ -0,0 +1,43 @@
+###########
+# Imports #
+###########
+# Data
+import os
+import pickle
+
+
+#############
+# Functions #
+#############
+def get_checkpoint_path(output_dir: str, output_name: str) -> str:
+    """
+    Returns the path of the checkpoint of a run.
+    """
+    return os.path.join(output_dir, f"checkpoint_{output_name}.pkl")
+
+
+def save_checkpoint(path: str, checkpoint: dict):
+    """
+    Saves a checkpoint as a pickle file.
+    The file is written to a temporary file first and then renamed, so a crash never leaves a partial checkpoint.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as fp:
+        pickle.dump(checkpoint, fp, protocol = pickle.HIGHEST_PROTOCOL)
+        fp.flush()
+        os.fsync(fp.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path: str, parameters: dict) -> dict:
+    """
+    Loads a checkpoint. Returns None if there is no checkpoint.
+    Raises a ValueError if the checkpoint was made with other parameters than the given ones.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as fp:
+        checkpoint = pickle.load(fp)
+    if checkpoint["parameters"] != parameters:
+        raise ValueError(f"The checkpoint {path} was made with the parameters {checkpoint['parameters']}, not {parameters}")
+    return checkpoint
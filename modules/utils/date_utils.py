@@ -2,82 +2,148 @@
 # Imports #
 ###########
 import sqlite3
+import numpy as np
 from contextlib import closing
 import modules.data_retrieval.retrieve_sets_params as get_sets_params
+from modules.data_retrieval.simulation_context import SimulationContext
+from modules.data_retrieval.data_access import fetch_all
+from modules.data_retrieval.data_access import fetch_one
+
+
+###########
+# Classes #
+###########
+class DateCalendar:
+    """
+    The dates table as arrays and dictionaries.
+    The number of holidays before each date is kept as a prefix sum, so the holidays in any range of days are counted in constant time.
+    """
+    def __init__(self, date_ids: np.ndarray, dates: np.ndarray, day_types: np.ndarray):
+        order = np.argsort(date_ids)
+        self.date_ids = np.asarray(date_ids, dtype=np.int64)[order]
+        dates = np.asarray(dates, dtype=object)[order]
+        day_types = np.asarray(day_types, dtype=object)[order]
+        self.date_to_id = dict(zip(dates, self.date_ids.tolist()))
+        self.id_to_date = dict(zip(self.date_ids.tolist(), dates))
+        self.id_to_day_type = dict(zip(self.date_ids.tolist(), day_types))
+        self.holidays_before = np.concatenate([[0], np.cumsum(day_types == "holiday")])
+
+
+    def count_holidays(self, start_days: np.ndarray | int, end_days: np.ndarray | int) -> np.ndarray | int:
+        """
+        Returns the number of holidays from start_day to end_day (excluded). Takes single days or arrays of days.
+        """
+        return (self.holidays_before[np.searchsorted(self.date_ids, end_days)]
+                - self.holidays_before[np.searchsorted(self.date_ids, start_days)])
+
 
 #############
 # Functions #
 #############
-def convert_id_to_date(date_id: int, con: sqlite3.Connection) -> str:
+def load_calendar(con: sqlite3.Connection) -> DateCalendar:
     """
-    Takes an integer, which represents the ID of a date and returns a string representing that date. 
+    Reads the dates table of a connection into a calendar. The calendar is not updated if the table changes.
     """
     with closing(con.cursor()) as cur:
-        return cur.execute(f"SELECT date FROM dates WHERE ID == {date_id}").fetchone()[0]
+        dates = cur.execute("SELECT ID, date, day_type FROM dates").fetchall()
+    return DateCalendar(np.array([date[0] for date in dates], dtype=np.int64),
+                        np.array([date[1] for date in dates], dtype=object),
+                        np.array([date[2] for date in dates], dtype=object))
+
+
+def get_calendar(con: sqlite3.Connection | SimulationContext | DateCalendar) -> DateCalendar:
+    """
+    Returns the calendar of a context, or the calendar itself. A connection has no cached calendar, so its dates table is read again.
+    Code, which looks up many dates, should load the calendar once (load_calendar) or use a SimulationContext.
+    """
+    if isinstance(con, SimulationContext):
+        return con.calendar
+    if isinstance(con, DateCalendar):
+        return con
+    return load_calendar(con)
+
+
+def convert_id_to_date(date_id: int, con: sqlite3.Connection | SimulationContext | DateCalendar) -> str:
+    """
+    Takes an integer, which represents the ID of a date and returns a string representing that date. 
+    """
+    if isinstance(con, sqlite3.Connection):
+        return fetch_one(con, "SELECT date FROM dates WHERE ID == ?", (int(date_id),))[0]
+    return get_calendar(con).id_to_date[date_id]
 
 
-def convert_date_to_id(date: str, con: sqlite3.Connection) -> int:
+def convert_date_to_id(date: str, con: sqlite3.Connection | SimulationContext | DateCalendar) -> int:
     """
     Takes a string, which represents a date and returns an integer, which represents the ID of that date
     """
-    with closing(con.cursor()) as cur:
-        return cur.execute(f"SELECT ID FROM dates WHERE date == '{date}'").fetchone()[0]
+    if isinstance(con, sqlite3.Connection):
+        return fetch_one(con, "SELECT ID FROM dates WHERE date == ?", (date,))[0]
+    return get_calendar(con).date_to_id[date]
 
 
-def get_date_time_slots(date_id: int, con: sqlite3.Connection) -> list[int]:
+def get_date_time_slots(date_id: int, con: sqlite3.Connection | SimulationContext) -> list[int]:
     """
     Takes a date ID and returns a list of integers representing the IDs of the time-slots associated with that date.
     """
-    with closing(con.cursor()) as cur:
-        time_slots = cur.execute(f"SELECT ID from time_slots WHERE date_id == {date_id}").fetchall()
+    if isinstance(con, SimulationContext):
+        return con.get_date_time_slots(date_id)
+
+    time_slots = fetch_all(con, "SELECT ID from time_slots WHERE date_id == ?", (int(date_id),))
     return [time_slot[0] for time_slot in time_slots]
 
 
-def get_day_type(date_id: int, con: sqlite3.Connection) -> int:
+def get_day_type(date_id: int, con: sqlite3.Connection | SimulationContext | DateCalendar) -> int:
     """
     Takes a date ID and returns a string representing the day type.
     """
-    with closing(con.cursor()) as cur:
-        return cur.execute(f"SELECT day_type FROM dates WHERE ID == {date_id}").fetchone()[0] 
+    if isinstance(con, SimulationContext):
+        return con.get_day_type(date_id)
+    if isinstance(con, sqlite3.Connection):
+        return fetch_one(con, "SELECT day_type FROM dates WHERE ID == ?", (int(date_id),))[0]
+    return con.id_to_day_type[date_id]
 
 
-def get_day_types_in_range(start_day: int, end_day: int, con:sqlite3.Connection) -> list[int]:
+def get_day_types_in_range(start_day: int, end_day: int, con: sqlite3.Connection | SimulationContext | DateCalendar) -> list[int]:
     """
     Returns a list of day types between a start date and an end date.
     """
-    day_types = []
-    for day in range(start_day, end_day):
-        day_types.append(get_day_type(day, con))
-    return day_types
+    calendar = get_calendar(con)
+    return [calendar.id_to_day_type[day] for day in range(start_day, end_day)]
 
 
-def no_holidays(start_day: int, end_day: int, con: sqlite3.Connection) -> bool:
+def no_holidays(start_day: int, end_day: int, con: sqlite3.Connection | SimulationContext | DateCalendar) -> bool:
     """
     Returns a boolean indicating if there is any holidays between a start date and an end date.
     """
-    return "holiday" not in get_day_types_in_range(start_day, end_day, con)
+    return bool(get_calendar(con).count_holidays(start_day, end_day) == 0)
 
 
-def find_day_range(earliest_day: int, latest_day: int, n_days: int, con: sqlite3.Connection):
+def find_day_range(earliest_day: int, latest_day: int, n_days: int, con: sqlite3.Connection | SimulationContext | DateCalendar):
     """
     Searches for a range of n_days between a start date and an end day, where there is no holidays.
-    """
-    for day in range(earliest_day, latest_day, n_days):
-        if no_holidays(day, day + n_days, con):
-            return (day, day + n_days)
-    return None
+    The candidate ranges start every n_days from earliest_day, and the holidays of all of them are counted at once.
+    """
+    starts = np.arange(earliest_day, latest_day, n_days)
+    free = np.flatnonzero(get_calendar(con).count_holidays(starts, starts + n_days) == 0)
+    if len(free) == 0:
+        return None
+    day = int(starts[free[0]])
+    return (day, day + n_days)
 
 
-def create_auditor_holidays(first_day: int, last_day: int, con: sqlite3.Connection, n_days = 42) -> dict[int, list[int]]:
+def create_auditor_holidays(first_day: int, last_day: int, con: sqlite3.Connection | SimulationContext, n_days = 42) -> dict[int, list[int]]:
     """
     Returns a dictionary containing lists of auditor holidays
     """
+    calendar = get_calendar(con)
+    holidays = {earliest_day: find_day_range(earliest_day, last_day, n_days, calendar)
+                for earliest_day in (first_day + 90, first_day + 180, first_day + 250)}
     auditor_holidays = {}
     for auditor in get_sets_params.get_employees(con):
         if 1 <= auditor <= 5:
-            auditor_holidays[auditor] = find_day_range(first_day + 90, last_day, n_days, con)
+            auditor_holidays[auditor] = holidays[first_day + 90]
         elif 6 <= auditor <= 10:
-            auditor_holidays[auditor] = find_day_range(first_day + 180, last_day, n_days, con)
+            auditor_holidays[auditor] = holidays[first_day + 180]
         else:
-            auditor_holidays[auditor] = find_day_range(first_day + 250, last_day, n_days, con)
+            auditor_holidays[auditor] = holidays[first_day + 250]
     return auditor_holidays
\ No newline at end of file
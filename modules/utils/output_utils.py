@@ -5,63 +5,39 @@
 # Data retrieval and wrangling
 import sqlite3
 import pandas as pd
-import numpy as np
 import modules.data_retrieval.retrieve_sets_params as get_sets_params
+from modules.data_retrieval.simulation_context import SimulationContext
 
 # Relax release dates
 from modules.relax_release_dates import relax_release_dates
-
-
-##############################################
-# Helper Functions for The output dictionary #
-##############################################
-def create_results_dict(con: sqlite3.Connection,
-                        first_day: int,
-                        last_day:int) -> dict:
-    """
-    Returns a dictionary, which stores the results of the simulation model
-    """
-    results_dict = {}
-    for t in range(first_day, last_day + 1):
-        results_dict[t] = {}
-        for e in get_sets_params.get_employees(con):
-            results_dict[t][e] = {}
-            results_dict[t][e]["audits"] = []
-    return results_dict  
-
-
-def update_res_dict(results_dict: dict[int],
-                     route_dict: dict,
-                     audit_dict: dict,
-                     day: int):
-    """
-    Updates the dictionary, which stores the results of the simulation model
-    """
-    for auditor, route in route_dict.items():
-        results_dict[day][auditor]["route"] = route
-
-    for auditor, audits in audit_dict.items():
-        results_dict[day][auditor]["audits"] = audits                      
-    
-    return results_dict
+from modules.relax_release_dates import stream_relaxed_release_dates
+from collections.abc import Iterator
 
 
 ###################
 # Output CSV-file #
 ###################
-def generate_simulation_dataframe(con: sqlite3.Connection,
+def generate_simulation_dataframe(con: sqlite3.Connection | SimulationContext,
                                   phi: int,
                                   epsilon: int,
                                   first_day: int,
                                   last_day:int) -> pd.DataFrame:
     """
     Is a wrapper for the function relax_release_dates.
+    The simulation dataframe contains all audits, also the ones released outside first_day and last_day, which are never scheduled.
     """
-    all_audits = get_sets_params.get_all_audits(con)
-    all_audits = all_audits[~((all_audits["zip_code"] >= 3700) & (all_audits["zip_code"] <= 3799))]
-    all_audits = all_audits[all_audits["audit_type_id"] != 9]
-    sim_audits = all_audits.copy()
-    sim_audits["audit_date_id"] = -1
-    sim_audits["employee_id"] = np.nan
+    sim_audits = get_sets_params.get_simulation_audits(con)
     return relax_release_dates(phi, epsilon, sim_audits, first_day, last_day, con)
-    
\ No newline at end of file
+    
+
+def stream_simulation_dataframe(con: sqlite3.Connection | SimulationContext,
+                                phi: int,
+                                epsilon: int,
+                                first_day: int,
+                                last_day: int,
+                                chunk_days: int = 30) -> Iterator[tuple[int, pd.DataFrame]]:
+    """
+    Is a wrapper for the function stream_relaxed_release_dates, which yields the audits of the simulation day by day.
+    Unlike generate_simulation_dataframe, the stream only contains the audits released between first_day and last_day.
+    """
+    return stream_relaxed_release_dates(phi, epsilon, con, first_day, last_day, chunk_days)
@@ -0,0 +1,70 @@
+###########
+# Imports #
+###########
+# Data
+import pandas as pd
+import json
+import os
+
+##########
+# Phases #
+##########
+# The wall times recorded for every solved day, in the order they happen in the simulation loop
+PHASES = ["retrieval_time", "matrix_time", "lookahead_time", "build_time", "solve_time", "extraction_time"]
+
+
+#############
+# Functions #
+#############
+def append_profile_record(path: str, record: dict):
+    """
+    Appends the profile of a day as a line to a JSONL file.
+    """
+    with open(path, "a") as fp:
+        fp.write(json.dumps(record) + "\n")
+
+
+def truncate_profile(path: str, last_day: int):
+    """
+    Removes the days after last_day from a JSONL profile. Is used when a simulation is resumed from a checkpoint.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path) as fp:
+        lines = [line for line in fp if json.loads(line)["day"] <= last_day]
+    with open(path, "w") as fp:
+        fp.writelines(lines)
+
+
+def read_profile(path: str) -> pd.DataFrame:
+    """
+    Reads a JSONL profile into a dataframe with one row per solved day.
+    """
+    return pd.read_json(path, lines = True)
+
+
+def summarize_profile(profile: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the total, mean and maximum wall time of each phase and its share of the total time.
+    """
+    phases = [*PHASES, "solver_runtime", "callback_time"]
+    summary = pd.DataFrame({
+        "total": profile[phases].sum(),
+        "mean": profile[phases].mean(),
+        "max": profile[phases].max()
+    })
+    summary["share"] = summary["total"] / profile[PHASES].sum().sum()
+    summary.loc["lazy_cuts"] = [profile["lazy_cuts"].sum(), profile["lazy_cuts"].mean(), profile["lazy_cuts"].max(), None]
+    summary.index.name = "phase"
+    return summary
+
+
+def save_profile_summary(profile_path: str, summary_path: str) -> pd.DataFrame:
+    """
+    Summarizes a JSONL profile, saves the summary as a csv file and returns it.
+    """
+    if not os.path.exists(profile_path):
+        return None
+    summary = summarize_profile(read_profile(profile_path))
+    summary.to_csv(summary_path)
+    return summary
@@ -0,0 +1,163 @@
+###########
+# Imports #
+###########
+# Data
+import os
+import pickle
+import sqlite3
+import pandas as pd
+from contextlib import closing
+
+
+##########
+# Tables #
+##########
+# The results of a run are stored in a SQLite database with a row per audit and per arc of every solved day:
+#   assignments(day, auditor, audit_id)
+#   routes(day, auditor, position, from_node, to_node)     position is the order of the arc in the route
+# Each day is committed as soon as it is solved, so the results can be read while the run is still going.
+TABLES = """
+CREATE TABLE IF NOT EXISTS assignments(day INTEGER, auditor INTEGER, audit_id INTEGER);
+CREATE TABLE IF NOT EXISTS routes(day INTEGER, auditor INTEGER, position INTEGER, from_node INTEGER, to_node INTEGER);
+CREATE INDEX IF NOT EXISTS assignments_day_auditor ON assignments(day, auditor);
+CREATE INDEX IF NOT EXISTS routes_day_auditor ON routes(day, auditor);
+"""
+
+
+###########
+# Writing #
+###########
+class ResultsSink:
+    """
+    Appends the assignments and routes of every solved day to a SQLite database.
+    A new sink starts from an empty database. With last_completed_day (when a run is resumed),
+    the days after last_completed_day are removed and the earlier days are kept.
+    Used in a with statement, the database is also closed when a day raises, so a retry or --resume can open it again.
+    """
+    def __init__(self, path: str, last_completed_day: int = None):
+        if last_completed_day is None and os.path.exists(path):
+            os.remove(path)
+        self.path = path
+        self.con = sqlite3.connect(path)
+        self.con.execute("PRAGMA journal_mode = WAL") # Readers do not block the writer
+        self.con.executescript(TABLES)
+        if last_completed_day is not None:
+            self.con.execute("DELETE FROM assignments WHERE day > ?", (last_completed_day,))
+            self.con.execute("DELETE FROM routes WHERE day > ?", (last_completed_day,))
+        self.con.commit()
+
+
+    def append_day(self,
+                   day: int,
+                   route_dict: dict[int, list[tuple[int, int]]],
+                   audit_dict: dict[int, list[int]]):
+        """
+        Writes the routes and audits of every auditor on a day and commits them.
+        """
+        self.con.executemany("INSERT INTO assignments VALUES (?, ?, ?)",
+                             [(day, int(auditor), int(audit)) for auditor, audits in audit_dict.items() for audit in audits])
+        self.con.executemany("INSERT INTO routes VALUES (?, ?, ?, ?, ?)",
+                             [(day, int(auditor), position, int(i), int(j))
+                              for auditor, route in route_dict.items() for position, (i, j) in enumerate(route)])
+        self.con.commit()
+
+
+    def close(self):
+        """
+        Closes the database. A day, which was not committed, is rolled back.
+        The journal is switched back from WAL, so the finished database is a single file.
+        """
+        try:
+            self.con.rollback()
+            self.con.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            self.con.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+#############
+# Functions #
+#############
+def get_results_path(output_dir: str, output_name: str) -> str:
+    """
+    Returns the path of the results database of a run.
+    """
+    return os.path.join(output_dir, f"results_{output_name}.db")
+
+
+def _read_table(path: str,
+                table: str,
+                first_day: int = None,
+                last_day: int = None,
+                first_auditor: int = None,
+                last_auditor: int = None) -> pd.DataFrame:
+    """
+    Reads the rows of a results table within a range of days and auditors (all if a bound is None).
+    """
+    conditions, parameters = [], []
+    for column, operator, value in [("day", ">=", first_day), ("day", "<=", last_day),
+                                    ("auditor", ">=", first_auditor), ("auditor", "<=", last_auditor)]:
+        if value is not None:
+            conditions.append(f"{column} {operator} ?")
+            parameters.append(int(value))
+    where = f" WHERE {' AND '.join(conditions)}" if len(conditions) > 0 else ""
+    order = "day, auditor, position" if table == "routes" else "day, auditor, rowid"
+    with closing(sqlite3.connect(f"file:{path}?mode=ro", uri = True)) as con:
+        return pd.read_sql(f"SELECT * FROM {table}{where} ORDER BY {order}", con, params = parameters)
+
+
+def read_assignments(path: str,
+                     first_day: int = None,
+                     last_day: int = None,
+                     first_auditor: int = None,
+                     last_auditor: int = None) -> pd.DataFrame:
+    """
+    Returns the audits of each auditor and day within a range of days and auditors.
+    """
+    return _read_table(path, "assignments", first_day, last_day, first_auditor, last_auditor)
+
+
+def read_routes(path: str,
+                first_day: int = None,
+                last_day: int = None,
+                first_auditor: int = None,
+                last_auditor: int = None) -> pd.DataFrame:
+    """
+    Returns the arcs of the route of each auditor and day within a range of days and auditors.
+    """
+    return _read_table(path, "routes", first_day, last_day, first_auditor, last_auditor)
+
+
+def read_results_dict(path: str, first_day: int = None, last_day: int = None) -> dict:
+    """
+    Returns the results of a range of days in the form of the old results dictionary:
+    results_dict[day][auditor] = {"audits": [...], "route": [...]}. Only auditors with audits or a route are included.
+    """
+    results_dict = {}
+    for row in read_assignments(path, first_day, last_day).itertuples(index = False):
+        auditor = results_dict.setdefault(row.day, {}).setdefault(row.auditor, {"audits": [], "route": []})
+        auditor["audits"].append(row.audit_id)
+    for row in read_routes(path, first_day, last_day).itertuples(index = False):
+        auditor = results_dict.setdefault(row.day, {}).setdefault(row.auditor, {"audits": [], "route": []})
+        auditor["route"].append((row.from_node, row.to_node))
+    return results_dict
+
+
+def import_results_dict(pickle_path: str, path: str):
+    """
+    Writes the results dictionary of an old run (results_dict_<output_name>.pkl) to a results database.
+    """
+    with open(pickle_path, "rb") as fp:
+        results_dict = pickle.load(fp)
+    with ResultsSink(path) as sink:
+        for day, auditors in results_dict.items():
+            sink.append_day(day,
+                            {auditor: results.get("route", []) for auditor, results in auditors.items()},
+                            {auditor: results.get("audits", []) for auditor, results in auditors.items()})
@@ -0,0 +1,73 @@
+###########
+# Imports #
+###########
+import sys
+import argparse
+
+# Benchmark
+from modules.benchmark import CASES
+from modules.benchmark import run_benchmark
+from modules.benchmark import load_history
+from modules.benchmark import append_history
+from modules.benchmark import find_run
+from modules.benchmark import compare_runs
+
+################
+# Command line #
+################
+# python run_benchmark.py run --label baseline     times the stages of every case and appends the run to the history
+# python run_benchmark.py compare                  compares the last run with the one before it
+# python run_benchmark.py compare --baseline baseline --current -1
+# compare exits with status 1 if a stage is slower than the baseline, so it can be used in a script or CI.
+history_path = "outputs/benchmarks/history.json"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest = "command", required = True)
+
+    run_parser = subparsers.add_parser("run", help = "Run the benchmark and append the results to the history")
+    run_parser.add_argument("--label", default = None, help = "Name of the run, e.g. baseline")
+    run_parser.add_argument("--cases", nargs = "+", default = [case["name"] for case in CASES], choices = [case["name"] for case in CASES])
+    run_parser.add_argument("--backend", default = "highs", choices = ["gurobi", "highs", "heuristic", "decomposition"])
+    run_parser.add_argument("--time-limit", type = float, default = 10, help = "Seconds per solve")
+    run_parser.add_argument("--repeats", type = int, default = 3, help = "The median of the repeats is recorded")
+    run_parser.add_argument("--seed", type = int, default = 0)
+    run_parser.add_argument("--regenerate", action = "store_true", help = "Generate the instances again")
+
+    compare_parser = subparsers.add_parser("compare", help = "Compare two runs in the history and flag slowdowns")
+    compare_parser.add_argument("--baseline", default = "-2", help = "Label or position of the baseline run")
+    compare_parser.add_argument("--current", default = "-1", help = "Label or position of the current run")
+    compare_parser.add_argument("--threshold", type = float, default = 0.2, help = "Relative slowdown, which is flagged")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        run = run_benchmark(cases = [case for case in CASES if case["name"] in args.cases],
+                            seed = args.seed,
+                            solver_backend = args.backend,
+                            time_limit = args.time_limit,
+                            repeats = args.repeats,
+                            regenerate = args.regenerate,
+                            label = args.label)
+        append_history(history_path, run)
+        for case, results in run["results"].items():
+            print(f"\n{case}: {results['n_audits']} audits, {results['n_auditors']} auditors, {results['n_depots']} depots, "
+                  f"{results['n_scheduled']} scheduled ({results['status']})")
+            for stage, value in results.items():
+                if stage.endswith("_time"):
+                    print(f"\t{stage:<28}{value:>10.4f}")
+        print(f"\nAppended to {history_path}")
+
+    else:
+        history = load_history(history_path)
+        baseline, current = find_run(history, args.baseline), find_run(history, args.current)
+        comparison = compare_runs(baseline, current, args.threshold)
+        print(f"Baseline: {baseline['label']} ({baseline['timestamp']}, {baseline['git_commit']})")
+        print(f"Current:  {current['label']} ({current['timestamp']}, {current['git_commit']})")
+        if baseline["solver_backend"] != current["solver_backend"] or baseline["time_limit"] != current["time_limit"]:
+            print("Warning: the runs use different backends or time limits")
+        print(comparison.round(4).to_string(index = False))
+        slower = comparison[comparison["slower"]]
+        if len(slower) > 0:
+            print(f"\n{len(slower)} stages are more than {args.threshold:.0%} slower than the baseline")
+            sys.exit(1)
+        print("\nNo slowdowns")
@@ -0,0 +1,58 @@
+###########
+# Imports #
+###########
+# Data
+import sqlite3
+import argparse
+from modules.data_retrieval.simulation_context import SimulationContext
+
+# Dates
+from modules.utils.date_utils import convert_date_to_id
+
+# Sweep
+from modules.sweep import get_parameter_grid
+from modules.sweep import run_sweep
+
+##################
+# Parameter grid #
+##################
+# Every combination is simulated in its own process.
+# The names are keyword arguments to run_simulation.
+parameter_grid = {
+    "phi": [6, 15, 50, 100],
+    "epsilon": [0, 5, 10, 15]
+}
+n_workers = None # Defaults to the number of cores divided by threads_per_worker
+threads_per_worker = 2
+checkpoint_every = 10 # Days between checkpoints of each run (None disables them)
+
+if __name__ == "__main__":
+    # python run_sweep.py --resume continues every run after its last checkpoint
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--resume", action = "store_true", help = "Continue every run from its last checkpoint")
+    args = parser.parse_args()
+
+    #######################
+    # Database Connection #
+    #######################
+    con = sqlite3.connect("final_database_master_thesis.db")
+    first_day = convert_date_to_id("2022-01-01", con)
+    last_day = convert_date_to_id("2022-12-31", con)
+
+    # Load the data once and share it with all workers
+    context = SimulationContext(con)
+    con.close()
+
+    #############
+    # Run sweep #
+    #############
+    summary = run_sweep(context,
+                        get_parameter_grid(parameter_grid),
+                        first_day,
+                        last_day,
+                        output_dir = "outputs/sweeps",
+                        n_workers = n_workers,
+                        threads_per_worker = threads_per_worker,
+                        checkpoint_every = checkpoint_every,
+                        resume = args.resume)
+    print(summary)
@@ -4,8 +4,10 @@
 from modules.utils.output_utils import generate_simulation_dataframe
 from modules.utils.date_utils import convert_date_to_id
 from modules.utils.date_utils import convert_id_to_date
+from modules.utils.date_utils import load_calendar
 from modules.visualizations.generate_visualizations import generate_barchart_of_release_dates
 from modules.data_retrieval.retrieve_sets_params import get_all_audits
+from modules.data_retrieval.data_access import create_indexes
 import sqlite3
 import pandas as pd
 import numpy as np
@@ -18,7 +20,9 @@ import plotly.graph_objects as go
 #######################
 print("Connecting to Database")
 con = sqlite3.connect("final_database_master_thesis.db")
+create_indexes(con)
 cur = con.cursor()
+calendar = load_calendar(con) # For converting many date IDs
 
 ###############################
 # Barchart with release dates #
@@ -267,6 +271,9 @@ results_df = pd.read_csv("outputs/results/model_holidays.csv")
 results_df = results_df[results_df["on_site_audit"] == 1]
 results_2022 = results_df[(results_df["release_date_id"] >= first_day) &
                       (results_df["release_date_id"] <= last_day)]
+# The model CSV has no zip codes, so the locations are read from the facilities
+facilities = pd.read_sql("SELECT ID AS facility_id, zip_code, lat, long FROM facilities", con)
+results_2022 = results_2022.drop(columns = ["zip_code", "lat", "long"], errors = "ignore").merge(facilities, on = "facility_id")
 results_2022 = results_2022[~((results_2022["zip_code"] >= 3700) & (results_2022["zip_code"] <= 3799))]
 depots = pd.read_sql("SELECT * FROM facilities WHERE facilities.facility_type_id = 15", con)
 
@@ -398,9 +405,9 @@ print("Getting and cleaning data")
 all_audits = get_all_audits(con)
 all_audits = all_audits.sort_values( "release_date_id").reset_index(drop = True)
 all_audits = all_audits[(all_audits["release_date_id"] >= convert_date_to_id("2020-01-01", con)) & (all_audits["release_date_id"] <= convert_date_to_id("2024-12-31", con))]
-all_audits["release_date"] =  all_audits["release_date_id"].apply(convert_id_to_date, con = con)
+all_audits["release_date"] =  all_audits["release_date_id"].apply(convert_id_to_date, con = calendar)
 all_audits["release_date"] = pd.to_datetime(all_audits["release_date"])
-all_audits["due_date"] =  all_audits["due_date_id"].apply(convert_id_to_date, con = con)
+all_audits["due_date"] =  all_audits["due_date_id"].apply(convert_id_to_date, con = calendar)
 all_audits["due_date"] = pd.to_datetime(all_audits["due_date"])
 
 # Visualize Gant chart
@@ -427,9 +434,9 @@ print("Getting and cleaning data")
 all_audits = get_all_audits(con)
 all_audits = all_audits.sort_values( "release_date_id").reset_index(drop = True)
 all_audits = all_audits[(all_audits["release_date_id"] >= convert_date_to_id("2020-01-01", con)) & (all_audits["release_date_id"] <= convert_date_to_id("2025-12-31", con))]
-all_audits["release_date"] =  all_audits["release_date_id"].apply(convert_id_to_date, con = con)
+all_audits["release_date"] =  all_audits["release_date_id"].apply(convert_id_to_date, con = calendar)
 all_audits["release_date"] = pd.to_datetime(all_audits["release_date"])
-all_audits["due_date"] =  all_audits["due_date_id"].apply(convert_id_to_date, con = con)
+all_audits["due_date"] =  all_audits["due_date_id"].apply(convert_id_to_date, con = calendar)
 all_audits["due_date"] = pd.to_datetime(all_audits["due_date"])
 
 # Get total audit time for each year